@@ -0,0 +1,53 @@
+"""bench_renderers.py
+
+Benchmarks the renderers in pytestgen.generator against each other.
+
+Usage:
+    $ python benchmarks/bench_renderers.py [NUMBER]
+
+Author:
+    Figglewatts <me@figglewatts.co.uk>
+"""
+import sys
+import timeit
+
+from pytestgen import generator
+
+MODULE_FUNC_DATA = {
+    "arguments": ["arg_one", "arg_two", "arg_three"],
+    "name": "test_testable_func",
+    "src_name": "testable_func",
+    "module_path": "package.module",
+    "returns": True
+}
+
+CLASS_FUNC_DATA = {
+    "arguments": ["an_arg"],
+    "name": "test_aclass_testable_func_in_class",
+    "src_name": "testable_func_in_class",
+    "module_path": "package.module",
+    "class_name": "AClass",
+    "init_arguments": ["some", "constructor", "params"],
+    "returns": False
+}
+
+
+def bench_renderer(renderer: generator.Renderer, number: int) -> float:
+    """Time rendering a module and a class test 'number' times."""
+    def render():
+        renderer.render_module_func(MODULE_FUNC_DATA)
+        renderer.render_class_func(CLASS_FUNC_DATA)
+
+    return timeit.timeit(render, number=number)
+
+
+def main(number: int) -> None:
+    for name in generator.RENDERERS:
+        seconds = bench_renderer(generator.get_renderer(name), number)
+        per_test = seconds / (number * 2) * 1e6
+        print(f"{name:>8}: {seconds:.3f}s for {number * 2} tests "
+              f"({per_test:.2f}us per test)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,150 @@
+"""aio.py
+
+An asyncio API for generating tests, so pytestgen can be embedded in tools
+that run an event loop without blocking it.
+
+Author:
+    Figglewatts <me@figglewatts.co.uk>
+"""
+import asyncio
+from concurrent.futures import Executor
+from typing import AsyncIterator, Iterable, List
+
+from pytestgen import generator
+from pytestgen import load
+from pytestgen import parse
+from pytestgen import output
+from pytestgen.sink import OutputSink
+
+DEFAULT_MAX_PENDING = 8
+"""The default number of files that can be in flight at once."""
+
+
+class PyTestGenAsyncResult:
+    """The result of generating tests for a single input file.
+
+    Attributes:
+        input_file (PyTestGenInputFile): The input file tests were generated for.
+        parsed_file (PyTestGenParsedFile): The parsed input file. Will be None
+            if the file was skipped.
+        test_file_path (str): The path of the test file for the input file.
+        skip_reason (str): Why the file was skipped, either 'parse_error' if it
+            couldn't be read or parsed, or 'no_testable_funcs'. None if it
+            wasn't skipped.
+        error (str): The error reading or parsing the file, if it couldn't be.
+    """
+    def __init__(self,
+                 input_file: load.PyTestGenInputFile,
+                 parsed_file: parse.PyTestGenParsedFile,
+                 test_file_path: str,
+                 skip_reason: str = None,
+                 error: str = None) -> None:
+        self.input_file = input_file
+        self.parsed_file = parsed_file
+        self.test_file_path = test_file_path
+        self.skip_reason = skip_reason
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"PyTestGenAsyncResult({self.input_file.__repr__()}, " \
+            f"{self.parsed_file.__repr__()}, \"{self.test_file_path}\", " \
+            f"{self.skip_reason.__repr__()}, {self.error.__repr__()})"
+
+
+async def generate_async(
+        paths: Iterable[str],
+        output_dir: str,
+        include: List[str] = [],
+        sink: OutputSink = None,
+        renderer: generator.Renderer = None,
+        options: generator.GeneratorOptions = None,
+        executor: Executor = None,
+        max_pending: int = DEFAULT_MAX_PENDING
+) -> AsyncIterator[PyTestGenAsyncResult]:
+    """Generate tests for paths, yielding a result for each file as it
+    completes.
+
+    Loading, parsing and writing all happen in 'executor', so the event loop is
+    never blocked. At most 'max_pending' files are in flight at once, and no
+    more are started until the caller consumes a result. If the caller stops
+    iterating or is cancelled, files that haven't started are cancelled.
+
+    Args:
+        paths: The paths to files or directories to generate tests for.
+        output_dir: The path to output tests to.
+        include: The list of function names to generate tests for. If empty,
+            all functions will be used.
+        sink: The sink to write test files to. Defaults to the filesystem.
+        renderer: The renderer to render tests with. Defaults to Jinja.
+        options: The options to generate tests with.
+        executor: The executor to run work in. If None, the event loop's
+            default executor is used.
+        max_pending: The maximum number of files to process at once.
+
+    Returns:
+        AsyncIterator[PyTestGenAsyncResult]: A result for each input file, in
+            order of completion.
+    """
+    loop = asyncio.get_running_loop()
+    pending = set()
+    try:
+        for path_element in paths:
+            input_set = await loop.run_in_executor(executor, load.from_path,
+                                                   path_element, output_dir)
+            for input_file in input_set.input_files:
+                if len(pending) >= max_pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(
+                    loop.run_in_executor(executor, _generate_file, input_file,
+                                         output_dir, include, sink,
+                                         renderer, options))
+
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _generate_file(input_file: load.PyTestGenInputFile, output_dir: str,
+                   include: List[str], sink: OutputSink,
+                   renderer: generator.Renderer,
+                   options: generator.GeneratorOptions) -> PyTestGenAsyncResult:
+    """Parse a single input file and output its tests.
+
+    Args:
+        input_file: The input file to generate tests for.
+        output_dir: The path to output tests to.
+        include: The list of function names to generate tests for. If empty,
+            all functions will be used.
+        sink: The sink to write test files to.
+        renderer: The renderer to render tests with.
+        options: The options to generate tests with.
+
+    Returns:
+        PyTestGenAsyncResult: The result of generating tests for the file.
+    """
+    input_set = load.PyTestGenInputSet(output_dir, [input_file])
+    parsed_set = parse.parse_input_set(input_set)
+    output.output_tests(parsed_set,
+                        include=include,
+                        sink=sink,
+                        renderer=renderer,
+                        options=options)
+    parsed_file = parsed_set.parsed_files[0] \
+        if parsed_set.parsed_files else None
+    error = parsed_set.report.failures.get(input_file.full_path)
+    skip_reason = None
+    if error is not None:
+        skip_reason = "parse_error"
+    elif parsed_file is None:
+        skip_reason = "no_testable_funcs"
+    return PyTestGenAsyncResult(input_file, parsed_file,
+                                input_file.get_test_file_path(output_dir),
+                                skip_reason, error)
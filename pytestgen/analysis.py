@@ -0,0 +1,206 @@
+"""analysis.py
+
+Static analysis of the bodies of functions, to guess which ones are expensive
+to call without running them, i.e. because they read files, start processes,
+sleep, use the network or recurse. Tests of those functions can then be marked
+so the fast tests can be run first.
+
+Author:
+    Figglewatts <me@figglewatts.co.uk>
+"""
+import ast
+from typing import List
+
+from pytestgen import index
+
+IO = "io"
+SUBPROCESS = "subprocess"
+SLEEP = "sleep"
+NETWORK = "network"
+IO_IN_LOOP = "io_in_loop"
+RECURSION = "recursion"
+REASONS = [IO, SUBPROCESS, SLEEP, NETWORK, IO_IN_LOOP, RECURSION]
+"""The reasons a function can be expensive to call for."""
+
+SLOW_CALLS = {
+    "open": IO,
+    "input": IO,
+    "io.open": IO,
+    "os.open": IO,
+    "os.system": SUBPROCESS,
+    "os.popen": SUBPROCESS,
+    "Popen": SUBPROCESS,
+    "check_call": SUBPROCESS,
+    "check_output": SUBPROCESS,
+    "sleep": SLEEP,
+    "time.sleep": SLEEP,
+    "asyncio.sleep": SLEEP,
+    "urlopen": NETWORK,
+    "create_connection": NETWORK
+}
+"""The functions that are expensive to call, by the name they're called with.
+Bare names are what 'from x import y' imports them as."""
+
+SLOW_MODULES = {
+    "shutil": IO,
+    "subprocess": SUBPROCESS,
+    "requests": NETWORK,
+    "httpx": NETWORK,
+    "socket": NETWORK,
+    "http.client": NETWORK,
+    "urllib.request": NETWORK
+}
+"""The modules every function of which is expensive to call."""
+
+SLOW_METHODS = {
+    "read_text": IO,
+    "write_text": IO,
+    "read_bytes": IO,
+    "write_bytes": IO
+}
+"""The methods that are expensive to call on any object, i.e. a Path."""
+
+
+class _CostVisitor(ast.NodeVisitor):
+    """Finds the reasons the body of a function is expensive to run. Nested
+    functions, lambdas and classes are skipped, as defining them doesn't run
+    them."""
+    def __init__(self, function_def: ast.FunctionDef,
+                 is_method: bool) -> None:
+        self.reasons = set()
+        self.io_calls = []
+        self.awaited_io_calls = []
+        self.function_name = function_def.name
+        self.self_name = None
+        if is_method and len(function_def.args.args) > 0:
+            self.self_name = function_def.args.args[0].arg
+        self._loop_depth = 0
+        self._awaited_calls = set()
+
+    def visit_Await(self, node: ast.Await) -> None:
+        if isinstance(node.value, ast.Call):
+            self._awaited_calls.add(id(node.value))
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        reason = None
+        dotted_name = index.get_dotted_name(node.func)
+        if dotted_name is not None:
+            reason = self._get_call_cost(dotted_name)
+            if reason not in (None, RECURSION) \
+                    and dotted_name not in self.io_calls:
+                self.io_calls.append(dotted_name)
+            if reason not in (None, RECURSION) \
+                    and id(node) in self._awaited_calls \
+                    and dotted_name not in self.awaited_io_calls:
+                self.awaited_io_calls.append(dotted_name)
+        if reason is None and isinstance(node.func, ast.Attribute):
+            # what these are called on isn't known, so they can't be mocked
+            reason = SLOW_METHODS.get(node.func.attr)
+
+        if reason is not None:
+            self.reasons.add(reason)
+            if self._loop_depth > 0 and reason != RECURSION:
+                self.reasons.add(IO_IN_LOOP)
+        self.generic_visit(node)
+
+    def _get_call_cost(self, dotted_name: List[str]) -> str:
+        if dotted_name == [self.function_name] and self.self_name is None:
+            return RECURSION
+        if dotted_name == [self.self_name, self.function_name]:
+            return RECURSION
+
+        name = ".".join(dotted_name)
+        if name in SLOW_CALLS:
+            return SLOW_CALLS[name]
+        for i in range(len(dotted_name) - 1, 0, -1):
+            module = ".".join(dotted_name[:i])
+            if module in SLOW_MODULES:
+                return SLOW_MODULES[module]
+        return None
+
+    def _visit_loop(self, node: ast.AST) -> None:
+        self._loop_depth += 1
+        self.generic_visit(node)
+        self._loop_depth -= 1
+
+    visit_For = _visit_loop
+    visit_AsyncFor = _visit_loop
+    visit_While = _visit_loop
+    visit_ListComp = _visit_loop
+    visit_SetComp = _visit_loop
+    visit_DictComp = _visit_loop
+    visit_GeneratorExp = _visit_loop
+
+    def _skip(self, node: ast.AST) -> None:
+        pass
+
+    visit_FunctionDef = _skip
+    visit_AsyncFunctionDef = _skip
+    visit_Lambda = _skip
+    visit_ClassDef = _skip
+
+
+def find_costs(function_def: ast.FunctionDef,
+               is_method: bool = False) -> List[str]:
+    """Find the reasons a function is likely to be expensive to call, by
+    looking for calls to slow functions in its body. Functions from .pyi stubs
+    have no body, so are never found to be expensive.
+
+    Args:
+        function_def: The function def of the function.
+        is_method: Whether the function is a method, so it recurses by calling
+            itself on its first argument, i.e. 'self.func()'.
+
+    Returns:
+        List[str]: The reasons the function is expensive, in the order of
+            REASONS. Empty if it isn't.
+    """
+    visitor = _visit_body(function_def, is_method)
+    return [reason for reason in REASONS if reason in visitor.reasons]
+
+
+def find_io_calls(function_def: ast.FunctionDef,
+                  is_method: bool = False) -> List[List[str]]:
+    """Find the calls to file, subprocess, sleep and network functions in the
+    body of a function, which its tests can replace with mocks. Slow methods
+    like Path.read_text() aren't included, as what they're called on can't be
+    told without running the function.
+
+    Args:
+        function_def: The function def of the function.
+        is_method: Whether the function is a method, so a call to a function
+            with the same name isn't recursion, i.e. 'open()' in a method
+            'open()'.
+
+    Returns:
+        List[List[str]]: The dotted name of each function called, i.e.
+            ['subprocess', 'run'], in the order they're first called.
+    """
+    return _visit_body(function_def, is_method).io_calls
+
+
+def find_awaited_io_calls(function_def: ast.FunctionDef,
+                          is_method: bool = False) -> List[List[str]]:
+    """Find the calls found by find_io_calls() that are awaited somewhere in
+    the body of a function, i.e. 'await asyncio.sleep(1)', so their mocks have
+    to return something that can be awaited.
+
+    Args:
+        function_def: The function def of the function.
+        is_method: Whether the function is a method.
+
+    Returns:
+        List[List[str]]: The dotted name of each function awaited, in the order
+            they're first awaited.
+    """
+    return _visit_body(function_def, is_method).awaited_io_calls
+
+
+def _visit_body(function_def: ast.FunctionDef,
+                is_method: bool) -> _CostVisitor:
+    """Visit every statement in the body of a function."""
+    visitor = _CostVisitor(function_def, is_method)
+    for node in function_def.body:
+        visitor.visit(node)
+    return visitor
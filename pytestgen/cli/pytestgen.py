@@ -5,17 +5,93 @@ This is the CLI of pytestgen.
 Author:
     Figglewatts <me@figglewatts.co.uk>
 """
+import json
 import logging
-from os.path import isdir, exists
+from os.path import exists
+from typing import Any, Dict, Iterator, List, Tuple
 
 import click
 
+from pytestgen import covdata
+from pytestgen import generator
+from pytestgen import guard
+from pytestgen import index
 from pytestgen import load
+from pytestgen import observe
 from pytestgen import parse
 from pytestgen import output
+from pytestgen.sink import ARCHIVE_FORMATS, ArchiveSink, FileSystemSink
 
 CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
 
+TARGET_KEYS = ["output_dir", "include", "renderer", "template_dir"]
+"""The keys that can be given in a --target."""
+
+REPORT_FORMATS = ["json"]
+"""The formats --report can write missing tests in."""
+
+
+def parse_target(spec: str) -> Dict[str, Any]:
+    """Parse a --target of comma separated 'key=value' pairs, i.e.
+    'output_dir=contract_tests,template_dir=contracts,include=foo,include=bar'.
+
+    Args:
+        spec: The target to parse.
+
+    Returns:
+        Dict[str, Any]: The value of each key given. 'include' is a list, as it
+            can be given multiple times.
+
+    Raises:
+        click.BadParameter: If the target was invalid.
+    """
+    target = {"include": []}
+    for pair in spec.split(","):
+        key, separator, value = pair.partition("=")
+        key = key.strip()
+        if separator == "" or key not in TARGET_KEYS:
+            raise click.BadParameter(
+                f"'{pair}' in '{spec}' should be 'key=value', with a key from "
+                f"{TARGET_KEYS}")
+        if key == "include":
+            target["include"].append(value)
+        else:
+            target[key] = value
+    if "output_dir" not in target:
+        raise click.BadParameter(f"'{spec}' should have an output_dir")
+    if target.get("renderer", "jinja") not in generator.RENDERERS:
+        raise click.BadParameter(
+            f"Unknown renderer '{target['renderer']}' in '{spec}', should be "
+            f"one of {list(generator.RENDERERS.keys())}")
+    return target
+
+
+def _parse_targets(ctx: click.Context, param: click.Parameter,
+                   value: Tuple[str]) -> List[Dict[str, Any]]:
+    return [parse_target(spec) for spec in value]
+
+
+def _check_positive(ctx: click.Context, param: click.Parameter,
+                    value: float) -> float:
+    if value is not None and value <= 0:
+        raise click.BadParameter(f"{value} should be more than 0")
+    return value
+
+
+def _check_marker(ctx: click.Context, param: click.Parameter,
+                  value: str) -> str:
+    if value is not None and not value.isidentifier():
+        raise click.BadParameter(f"'{value}' should be a marker name")
+    return value
+
+
+def _create_renderer(renderer: str, template_dir: str,
+                     template_cache_dir: str) -> generator.Renderer:
+    """Create the renderer to render a target's tests with."""
+    if template_dir is not None:
+        return generator.TemplateDirRenderer(template_dir, template_cache_dir)
+    return generator.get_renderer(renderer)
+
 
 @click.command(context_settings=CONTEXT_SETTINGS)
 @click.argument("path", nargs=-1, type=str, required=True)
@@ -34,7 +110,184 @@ CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
     metavar="FUNC",
     help="Function names to generate tests for. You can use this multiple times."
 )
-def cli(path, output_dir, include):
+@click.option(
+    "--archive",
+    type=click.Choice(ARCHIVE_FORMATS),
+    default=None,
+    help="Write tests into an archive of this format on stdout instead of to disk."
+)
+@click.option("--stubs",
+              is_flag=True,
+              default=False,
+              help="Read function signatures from .pyi stubs next to source "
+              "files when they exist.")
+@click.option("--stubs-dir",
+              type=str,
+              default=None,
+              metavar="PATH",
+              help="Read function signatures from .pyi stubs in this "
+              "directory when they exist. Implies --stubs.")
+@click.option("--renderer",
+              type=click.Choice(list(generator.RENDERERS.keys())),
+              default="jinja",
+              show_default=True,
+              help="The backend to render tests with. 'fast' produces the "
+              "same output as 'jinja', faster.")
+@click.option("--template-dir",
+              type=str,
+              default=None,
+              metavar="PATH",
+              help="Render tests with templates from this directory, using "
+              "the built-in templates for any it doesn't have. Overrides "
+              "--renderer.")
+@click.option("--template-cache-dir",
+              type=str,
+              default=None,
+              metavar="PATH",
+              help="Where to cache compiled templates from --template-dir. "
+              "Defaults to a directory in the system temp dir.")
+@click.option("--instance-fixtures",
+              type=click.Choice(generator.FIXTURE_SCOPES),
+              default=None,
+              help="Generate a fixture with this scope for each class, and "
+              "use it in the class' tests instead of creating an instance per "
+              "parameter.")
+@click.option("--layout",
+              type=click.Choice(generator.LAYOUTS),
+              default="module",
+              show_default=True,
+              help="How to split each module's tests across test files: one "
+              "file per 'module', one extra file per 'class', or 'chunk's of "
+              "--shard-size tests.")
+@click.option("--shard-size",
+              type=click.IntRange(min=1),
+              default=generator.DEFAULT_SHARD_SIZE,
+              show_default=True,
+              metavar="N",
+              help="The maximum number of tests in each test file with "
+              "'--layout chunk'.")
+@click.option("--xdist-groups",
+              is_flag=True,
+              default=False,
+              help="Mark tests with pytest-xdist groups, so each class' tests "
+              "run on the same worker when distributing by loadgroup.")
+@click.option("--benchmark",
+              type=click.Choice(generator.BENCHMARK_MODES),
+              default=None,
+              help="Generate pytest-benchmark tests named 'test__benchmark_*' "
+              "'also' alongside the normal tests, or 'only' instead of them.")
+@click.option("--mark-slow",
+              type=str,
+              default=None,
+              callback=_check_marker,
+              metavar="MARKER",
+              help="Mark tests of functions that look expensive to call, i.e. "
+              "ones that open files, start processes, sleep, use the network "
+              "or recurse, with '@pytest.mark.MARKER', so the fast tests can "
+              "be run first with -m 'not MARKER'.")
+@click.option("--mock-io",
+              is_flag=True,
+              default=False,
+              help="Replace the calls each function makes to file, "
+              "subprocess, sleep and network functions with mocks in its "
+              "tests, so they run in-process without doing real I/O.")
+@click.option("--defer-imports-over",
+              type=click.FloatRange(min=0),
+              default=None,
+              metavar="SECONDS",
+              help="Measure how long each module takes to import, and import "
+              "modules slower than this inside their tests so collecting them "
+              "stays fast.")
+@click.option("--progress",
+              is_flag=True,
+              default=False,
+              help="Show how many files have been parsed, and how fast, on "
+              "stderr.")
+@click.option("--metrics-file",
+              type=str,
+              default=None,
+              metavar="PATH",
+              help="Write counters and timings of the run to this file in the "
+              "Prometheus text format, i.e. for node_exporter's textfile "
+              "collector.")
+@click.option("--verbose",
+              "-v",
+              is_flag=True,
+              default=False,
+              help="Log each test as it's generated.")
+@click.option("--uncovered-only",
+              is_flag=True,
+              default=False,
+              help="Only generate tests for functions that weren't run when "
+              "coverage was measured, skipping fully covered files.")
+@click.option("--coverage-file",
+              type=str,
+              default=covdata.DEFAULT_COVERAGE_FILE,
+              show_default=True,
+              metavar="PATH",
+              help="The coverage.py data file to read for --uncovered-only.")
+@click.option("--target",
+              "targets",
+              multiple=True,
+              callback=_parse_targets,
+              metavar="KEY=VALUE,...",
+              help="Also output tests to another target, sharing one parse "
+              "of the sources. Give its output_dir, and optionally include "
+              "(multiple times), renderer and template_dir. You can use this "
+              "multiple times.")
+@click.option("--max-file-size",
+              type=click.IntRange(min=0),
+              default=0,
+              metavar="BYTES",
+              help="Skip files bigger than this without parsing them. By "
+              "default there's no limit.")
+@click.option("--max-defs",
+              type=click.IntRange(min=0),
+              default=0,
+              metavar="N",
+              help="Skip files with more functions than this without parsing "
+              "them. By default there's no limit.")
+@click.option("--skip-generated",
+              is_flag=True,
+              default=False,
+              help="Skip files with a code generator's header, i.e. from the "
+              "protocol buffer compiler, without parsing them.")
+@click.option("--jobs",
+              "-j",
+              type=click.IntRange(min=1),
+              default=1,
+              show_default=True,
+              metavar="N",
+              help="Parse files in this many worker processes.")
+@click.option("--parse-timeout",
+              type=float,
+              default=None,
+              callback=_check_positive,
+              metavar="SECONDS",
+              help="Give up on files that take longer than this to parse. "
+              "Files are parsed in worker processes when this is given.")
+@click.option("--fail-on-error",
+              is_flag=True,
+              default=False,
+              help="Exit with status 1 if any file couldn't be parsed. Other "
+              "files still have tests generated.")
+@click.option("--check",
+              is_flag=True,
+              default=False,
+              help="Don't write anything, and exit with status 1 as soon as a "
+              "function without a test is found.")
+@click.option("--report",
+              "report_format",
+              type=click.Choice(REPORT_FORMATS),
+              default=None,
+              help="Like --check, but find every missing test, and write "
+              "them for each file to stdout in this format.")
+def cli(path, output_dir, include, archive, stubs, stubs_dir, renderer,
+        template_dir, template_cache_dir, instance_fixtures, layout,
+        shard_size, xdist_groups, benchmark, mark_slow, mock_io,
+        defer_imports_over, progress, metrics_file, verbose, uncovered_only,
+        coverage_file, targets, max_file_size, max_defs, skip_generated,
+        jobs, parse_timeout, fail_on_error, check, report_format):
     """Generate pytest unit tests from your Python source code.
 
     \b
@@ -53,24 +306,234 @@ def cli(path, output_dir, include):
     \b
         # generate tests for functions 'foo' and 'bar' in 'functionality.py'
         $ pytestgen functionality.py -i foo -i bar
+
+    \b
+        # generate tests for the modules in a wheel, sdist or zip
+        $ pytestgen vendored-1.0-py3-none-any.whl
+
+    \b
+        # generate tests for a list of paths given on stdin or in a file
+        $ git diff --name-only -z | pytestgen -
+        $ pytestgen @changed_files.txt
+
+    \b
+        # generate tests for 'my_package' into a zip archive
+        $ pytestgen my_package --archive zip > tests.zip
+
+    \b
+        # split tests into files of at most 50 tests for pytest-xdist
+        $ pytestgen my_package --layout chunk --shard-size 50 --xdist-groups
+
+    \b
+        # generate pytest-benchmark tests for 'hot_path.py' as well as tests
+        $ pytestgen hot_path.py --benchmark also
+
+    \b
+        # mark tests of functions that do I/O or recurse as slow
+        $ pytestgen my_package --mark-slow slow
+
+    \b
+        # mock the file, subprocess and network calls of each function
+        $ pytestgen my_package --mock-io
+
+    \b
+        # import modules that take over 0.5s to import inside their tests
+        $ pytestgen my_package --defer-imports-over 0.5
+
+    \b
+        # show progress, and export metrics for node_exporter
+        $ pytestgen my_package --progress --metrics-file metrics/pytestgen.prom
+
+    \b
+        # only generate tests for functions the existing tests don't run
+        $ coverage run -m pytest && pytestgen my_package --uncovered-only
+
+    \b
+        # also generate contract tests for 'foo' with other templates
+        $ pytestgen my_package --target \\
+            output_dir=contract_tests,template_dir=contracts,include=foo
+
+    \b
+        # skip files over 1MB, and generated files
+        $ pytestgen my_package --max-file-size 1048576 --skip-generated
+
+    \b
+        # parse in 8 processes, giving up on files that take over 10s
+        $ pytestgen my_package -j 8 --parse-timeout 10
+
+    \b
+        # fail if any function in 'my_package' doesn't have a test
+        $ pytestgen my_package --check
+        $ pytestgen my_package --report json > missing_tests.json
     """
-    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.basicConfig(level=logging.DEBUG if verbose else logging.INFO,
+                        format="%(message)s")
 
-    for path_element in path:
-        if not exists(path_element):
-            logging.error(f"ERROR: path '{path_element}' did not exist")
+    check = check or report_format is not None
+    if check and archive is not None:
+        raise click.UsageError("--archive can't be used with --check")
 
-        input_set = None
-        if isdir(path_element):
-            input_set = load.directory(path_element, output_dir)
-        else:
-            try:
-                input_set = load.filename(path_element, output_dir)
-            except ValueError as err:
-                logging.error("ERROR: " + str(err))
-                raise SystemExit(1)
-        parsed_set = parse.parse_input_set(input_set)
-        output.output_tests(parsed_set, include=include)
+    if archive is not None:
+        sink = ArchiveSink(click.get_binary_stream("stdout"), archive)
+    else:
+        sink = FileSystemSink()
+
+    output_targets = [
+        output.OutputTarget(
+            output_dir, include,
+            _create_renderer(renderer, template_dir, template_cache_dir))
+    ] + [
+        output.OutputTarget(
+            target["output_dir"], target["include"],
+            _create_renderer(target.get("renderer", "jinja"),
+                             target.get("template_dir"), template_cache_dir))
+        for target in targets
+    ]
+    options = generator.GeneratorOptions(
+        fixture_scope=instance_fixtures,
+        layout=layout,
+        shard_size=shard_size,
+        xdist_groups=xdist_groups,
+        benchmark=benchmark,
+        import_time_threshold=defer_imports_over,
+        slow_marker=mark_slow,
+        mock_io=mock_io)
+    guards = guard.InputGuards(max_file_size=max_file_size or None,
+                               max_defs=max_defs or None,
+                               skip_generated=skip_generated)
+    coverage_data = None
+    if uncovered_only:
+        try:
+            coverage_data = covdata.read_coverage_data(coverage_file)
+        except ValueError as err:
+            logging.error("ERROR: " + str(err))
+            raise SystemExit(1)
+
+    observers = []
+    if progress:
+        observers.append(observe.ProgressObserver())
+    if metrics_file is not None:
+        observers.append(observe.PrometheusTextfileExporter(metrics_file))
+    for observer in observers:
+        observe.register(observer)
+
+    report = parse.PyTestGenParseReport()
+    # shared by every path, so each module is only indexed once per run
+    symbol_index = index.SymbolIndex()
+    # and each distinct source is only parsed once per run
+    parsed_sources = {}
+    missing_tests = []
+    stdin = click.get_text_stream("stdin")
+    try:
+        with sink:
+            # the files listed on stdin or in @files are batched together
+            for input_set in _load_input_sets(load.expand_paths(path, stdin),
+                                              output_dir):
+                if stubs or stubs_dir is not None:
+                    load.use_stubs(input_set, stubs_dir)
+                guard.skip_guarded_files(input_set, guards, report)
+                if coverage_data is not None:
+                    covdata.skip_covered_files(input_set, coverage_data)
+                if check:
+                    missing_tests += _check_input_set(
+                        input_set, output_targets, sink, options, report,
+                        symbol_index, parsed_sources, coverage_data, jobs,
+                        parse_timeout, report_format is None)
+                    if report_format is None and len(missing_tests) > 0:
+                        break
+                    continue
+                parsed_set = parse.parse_input_set(input_set, symbol_index,
+                                                   jobs, parse_timeout,
+                                                   parsed_sources)
+                report.merge(parsed_set.report)
+                if coverage_data is not None:
+                    covdata.skip_covered_funcs(parsed_set, coverage_data)
+                output.output_targets(parsed_set,
+                                      output_targets,
+                                      sink=sink,
+                                      options=options)
+    finally:
+        for observer in observers:
+            observe.unregister(observer)
+
+    for line in report.summary():
+        logging.info(line)
+    if check:
+        _report_missing_tests(missing_tests, report_format)
+        guarded = sum(report.skipped.get(reason, 0) for reason in guard.REASONS)
+        if guarded > 0:
+            logging.warning("%d file(s) skipped by the guards weren't checked "
+                            "for missing tests", guarded)
+    if (check and len(missing_tests) > 0) \
+            or (fail_on_error and len(report.failures) > 0):
+        raise SystemExit(1)
+
+
+def _load_input_sets(paths: Iterator[str],
+                     output_dir: str) -> Iterator[load.PyTestGenInputSet]:
+    """Load the input sets of the paths given on the command line, exiting if
+    one of them can't be loaded."""
+    def check_exists(paths: Iterator[str]) -> Iterator[str]:
+        for path_element in paths:
+            if not exists(path_element):
+                logging.error(f"ERROR: path '{path_element}' did not exist")
+            yield path_element
+
+    try:
+        yield from load.from_paths(check_exists(paths), output_dir)
+    except ValueError as err:
+        logging.error("ERROR: " + str(err))
+        raise SystemExit(1)
+
+
+def _check_input_set(input_set: load.PyTestGenInputSet,
+                     targets: List[output.OutputTarget], sink: FileSystemSink,
+                     options: generator.GeneratorOptions,
+                     report: parse.PyTestGenParseReport,
+                     symbol_index: index.SymbolIndex,
+                     parsed_sources: Dict[bytes, Any],
+                     coverage_data: covdata.CoverageData, jobs: int,
+                     parse_timeout: float,
+                     fail_fast: bool) -> List[output.MissingTests]:
+    """Find the missing tests of an input set, parsing one file at a time so
+    that with 'fail_fast' nothing after the first file missing tests is
+    parsed."""
+    missing_tests = []
+    for parsed_file in parse.iter_parsed_files(input_set, report,
+                                               symbol_index, jobs,
+                                               parse_timeout, parsed_sources):
+        parsed_set = parse.PyTestGenParsedSet([parsed_file], input_set,
+                                              report)
+        if coverage_data is not None:
+            covdata.skip_covered_funcs(parsed_set, coverage_data)
+        missing_tests += output.check_targets(parsed_set, targets, sink,
+                                              options, fail_fast)
+        if fail_fast and len(missing_tests) > 0:
+            break
+    return missing_tests
+
+
+def _report_missing_tests(missing_tests: List[output.MissingTests],
+                          report_format: str) -> None:
+    """Log the missing tests found by --check, or write them to stdout in the
+    format given to --report."""
+    if report_format == "json":
+        click.echo(
+            json.dumps(
+                {
+                    "missing_tests": [{
+                        "source_file": missing.input_file.full_path,
+                        "test_file": missing.test_file_path,
+                        "tests": missing.test_names
+                    } for missing in missing_tests]
+                },
+                indent=2))
+        return
+
+    for missing in missing_tests:
+        logging.error(f"ERROR: '{missing.input_file.full_path}' is missing "
+                      f"tests in '{missing.test_file_path}': "
+                      f"{', '.join(missing.test_names)}")
 
 
 if __name__ == "__main__":
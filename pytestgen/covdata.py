@@ -0,0 +1,340 @@
+"""covdata.py
+
+Used for reading coverage.py data files, so tests are only generated for
+functions that aren't run by the existing tests.
+
+Author:
+    Figglewatts <me@figglewatts.co.uk>
+"""
+import ast
+import logging
+from os import path
+import re
+import sqlite3
+from typing import Dict, Iterable, List, Set, Tuple
+
+from pytestgen import load
+from pytestgen import observe
+from pytestgen import parse
+
+DEFAULT_COVERAGE_FILE = ".coverage"
+"""The default path of the coverage.py data file."""
+
+BLOCK_PATTERN = re.compile(r"^\s*(?:async\s+)?(def|class)\s+(\w+)")
+"""Matches the first line of a function or class definition."""
+
+DEF_LINE_PATTERN = re.compile(r"^\s*(?:async\s+)?def\s", re.MULTILINE)
+"""Matches every line that looks like the start of a function definition."""
+
+
+class CoverageData:
+    """The lines of each source file that were run while measuring coverage.
+
+    Attributes:
+        data_file (str): The path of the data file this was read from.
+        executed_lines (Dict[str, Set[int]]): The line numbers that were run
+            in each measured file, by normalised absolute path.
+    """
+    def __init__(self, data_file: str,
+                 executed_lines: Dict[str, Set[int]]) -> None:
+        self.data_file = data_file
+        self.executed_lines = executed_lines
+
+    def get_executed_lines(self, file_path: str) -> Set[int]:
+        """Get the line numbers of a file that were run. Returns None if the
+        file wasn't measured at all."""
+        return self.executed_lines.get(_normalise_path(file_path))
+
+    def __repr__(self) -> str:
+        return f"CoverageData(\"{self.data_file}\", " \
+            f"{len(self.executed_lines)} files)"
+
+
+def read_coverage_data(data_file: str = DEFAULT_COVERAGE_FILE) -> CoverageData:
+    """Read the executed lines of each file from a coverage.py SQLite data
+    file. Both line and branch coverage data can be read.
+
+    Args:
+        data_file: The path of the data file.
+
+    Returns:
+        CoverageData: The executed lines of each measured file.
+
+    Raises:
+        ValueError: If the data file didn't exist or couldn't be read.
+    """
+    if not path.isfile(data_file):
+        raise ValueError(f"Coverage data file '{data_file}' did not exist")
+
+    # relative paths are stored relative to the data file's directory when
+    # coverage.py is run with 'relative_files'
+    base_dir = path.dirname(path.abspath(data_file))
+    executed_lines = {}
+    connection = sqlite3.connect(data_file)
+    try:
+        tables = [
+            row[0] for row in connection.execute(
+                "select name from sqlite_master where type = 'table'")
+        ]
+        if "line_bits" in tables:
+            for file_path, numbits in connection.execute(
+                    "select file.path, line_bits.numbits from line_bits "
+                    "join file on file.id = line_bits.file_id"):
+                _get_lines(executed_lines, base_dir,
+                           file_path).update(_numbits_to_lines(numbits))
+        if "arc" in tables:
+            for file_path, from_line, to_line in connection.execute(
+                    "select file.path, arc.fromno, arc.tono from arc "
+                    "join file on file.id = arc.file_id"):
+                # negative line numbers are entries to and exits from code
+                _get_lines(executed_lines, base_dir, file_path).update(
+                    [line for line in (from_line, to_line) if line > 0])
+    except sqlite3.DatabaseError as err:
+        raise ValueError(
+            f"Could not read coverage data file '{data_file}': {err}")
+    finally:
+        connection.close()
+    return CoverageData(data_file, executed_lines)
+
+
+def skip_covered_files(input_set: load.PyTestGenInputSet,
+                       coverage_data: CoverageData) -> load.PyTestGenInputSet:
+    """Remove the files of an input set whose functions have all been run, so
+    they aren't parsed. Only looks at the source text, and keeps any file it
+    isn't sure about.
+
+    Args:
+        input_set: The input set to remove files from.
+        coverage_data: The lines that were run.
+
+    Returns:
+        PyTestGenInputSet: The input set.
+    """
+    input_files = []
+    for input_file in input_set.input_files:
+        executed_lines = _get_input_file_lines(input_file, coverage_data)
+        if executed_lines is not None and is_source_covered(
+                input_file.read_source().decode("utf-8", errors="replace"),
+                executed_lines):
+            logging.debug("Skipping '%s', it is fully covered",
+                          input_file.full_path)
+            if observe.OBSERVERS:
+                observe.notify(observe.FILE_SKIPPED, input_file, "covered")
+            continue
+        input_files.append(input_file)
+    input_set.input_files = input_files
+    return input_set
+
+
+def skip_covered_funcs(parsed_set: parse.PyTestGenParsedSet,
+                       coverage_data: CoverageData) -> parse.PyTestGenParsedSet:
+    """Remove the testable functions of a parsed set that have been run, and
+    any parsed files left without testable functions.
+
+    Args:
+        parsed_set: The parsed set to remove functions from.
+        coverage_data: The lines that were run.
+
+    Returns:
+        PyTestGenParsedSet: The parsed set.
+    """
+    parsed_files = []
+    for parsed_file in parsed_set.parsed_files:
+        input_file = parsed_file.input_file
+        executed_lines = _get_input_file_lines(input_file, coverage_data)
+        if executed_lines is None:
+            parsed_files.append(parsed_file)
+            continue
+
+        # functions parsed from a stub have the stub's line numbers, so find
+        # their lines in the source instead
+        source_ranges = None
+        if input_file.stub_path is not None:
+            source_ranges = get_func_ranges(input_file.read_source().decode(
+                "utf-8", errors="replace"))
+
+        parsed_file.testable_funcs = [
+            testable_func for testable_func in parsed_file.testable_funcs
+            if not _is_testable_func_covered(testable_func, executed_lines,
+                                             source_ranges)
+        ]
+        if len(parsed_file.testable_funcs) == 0:
+            if observe.OBSERVERS:
+                observe.notify(observe.FILE_SKIPPED, input_file, "covered")
+            continue
+        parsed_files.append(parsed_file)
+    parsed_set.parsed_files = parsed_files
+    return parsed_set
+
+
+def is_func_covered(function_def, executed_lines: Set[int]) -> bool:
+    """Check whether a function has been run, i.e. any line of its body was
+    executed. The def line itself runs when the module is imported, so a
+    function with its body on the same line is never counted as covered.
+
+    Args:
+        function_def (ast.FunctionDef): The function def of the function.
+        executed_lines: The line numbers of its file that were run.
+
+    Returns:
+        bool: Whether the function has been run.
+    """
+    body_start = max(function_def.body[0].lineno, function_def.lineno + 1)
+    return _any_executed(range(body_start, _get_end_lineno(function_def) + 1),
+                         executed_lines)
+
+
+def is_source_covered(source: str, executed_lines: Set[int]) -> bool:
+    """Check whether every function in some source code has been run, without
+    parsing it. Source without any functions isn't counted as covered.
+
+    Args:
+        source: The source code.
+        executed_lines: The line numbers of the source that were run.
+
+    Returns:
+        bool: Whether every function has been run.
+    """
+    func_ranges = get_func_ranges(source)
+    # if the scan didn't find every function it can't be trusted
+    if len(func_ranges) == 0 \
+            or len(func_ranges) != len(DEF_LINE_PATTERN.findall(source)):
+        return False
+    return all([
+        func_range is not None and _any_executed(
+            range(func_range[0], func_range[1] + 1), executed_lines)
+        for func_range in func_ranges.values()
+    ])
+
+
+def get_func_ranges(source: str) -> Dict[str, Tuple[int, int]]:
+    """Find the line range of each function's body in some source code from its
+    indentation, without parsing it.
+
+    The scan is conservative: anything it gets wrong, i.e. a multi-line string
+    that is less indented than its function, only makes a function's range
+    smaller or its name unknown, which makes it look less covered.
+
+    Args:
+        source: The source code.
+
+    Returns:
+        Dict[str, Tuple[int, int]]: The first and last line of the body of each
+            function, by qualified name, i.e. 'AClass.a_method'. The range is
+            None for functions with their body on the def line.
+    """
+    func_ranges = {}
+    lines = source.splitlines()
+    # each open block is [indent, name, kind, first body line]
+    blocks = []
+    bracket_depth = 0
+    for line_number, line in enumerate(lines, start=1):
+        code = line.split("#", 1)[0].rstrip()
+        if len(code.strip()) == 0:
+            continue
+
+        # lines continuing a def's signature don't open or close blocks
+        if bracket_depth > 0:
+            bracket_depth += _bracket_depth(code)
+            if bracket_depth <= 0:
+                bracket_depth = 0
+                blocks[-1][3] = line_number + 1 if code.endswith(":") else None
+            continue
+
+        indent = len(code) - len(code.lstrip())
+        while len(blocks) > 0 and indent <= blocks[-1][0]:
+            _close_block(func_ranges, blocks, line_number - 1)
+
+        match = BLOCK_PATTERN.match(code)
+        if match is None:
+            continue
+        kind, name = match.group(1), match.group(2)
+        qualname = ".".join([block[1] for block in blocks] + [name])
+        bracket_depth = max(_bracket_depth(code), 0)
+        body_start = line_number + 1 \
+            if bracket_depth > 0 or code.endswith(":") else None
+        blocks.append([indent, qualname, kind, body_start])
+
+    while len(blocks) > 0:
+        _close_block(func_ranges, blocks, len(lines))
+    return func_ranges
+
+
+def _close_block(func_ranges: Dict[str, Tuple[int, int]], blocks: List[list],
+                 end_line: int) -> None:
+    """Close the innermost open block, recording its range if it's a
+    function."""
+    _, qualname, kind, body_start = blocks.pop()
+    if kind != "def":
+        return
+    if body_start is None or body_start > end_line:
+        func_ranges[qualname] = None
+    else:
+        func_ranges[qualname] = (body_start, end_line)
+
+
+def _bracket_depth(code: str) -> int:
+    """Get how many more brackets a line of code opens than it closes."""
+    return sum([code.count(bracket) for bracket in "([{"]) - \
+        sum([code.count(bracket) for bracket in ")]}"])
+
+
+def _is_testable_func_covered(testable_func: parse.TestableFunc,
+                              executed_lines: Set[int],
+                              source_ranges: Dict[str, Tuple[int, int]] = None
+                              ) -> bool:
+    """Check whether a testable function has been run, looking it up by name in
+    'source_ranges' if given."""
+    if source_ranges is None:
+        return is_func_covered(testable_func.function_def, executed_lines)
+
+    qualname = testable_func.function_def.name
+    if isinstance(testable_func, parse.ClassTestableFunc):
+        qualname = f"{testable_func.class_def.name}.{qualname}"
+    func_range = source_ranges.get(qualname)
+    return func_range is not None and _any_executed(
+        range(func_range[0], func_range[1] + 1), executed_lines)
+
+
+def _get_end_lineno(function_def) -> int:
+    """Get the last line of a function that has a statement or expression on
+    it. FunctionDef.end_lineno doesn't exist before Python 3.8."""
+    return max([
+        node.lineno for node in ast.walk(function_def)
+        if hasattr(node, "lineno")
+    ])
+
+
+def _any_executed(line_numbers: Iterable[int],
+                  executed_lines: Set[int]) -> bool:
+    return any([line_number in executed_lines for line_number in line_numbers])
+
+
+def _get_input_file_lines(input_file: load.PyTestGenInputFile,
+                          coverage_data: CoverageData) -> Set[int]:
+    """Get the executed lines of an input file. Files read from archives were
+    never measured, so always return None."""
+    if isinstance(input_file, load.PyTestGenArchiveInputFile):
+        return None
+    return coverage_data.get_executed_lines(input_file.full_path)
+
+
+def _get_lines(executed_lines: Dict[str, Set[int]], base_dir: str,
+               file_path: str) -> Set[int]:
+    """Get the set of executed lines of a file, creating it if needed."""
+    return executed_lines.setdefault(
+        _normalise_path(path.join(base_dir, file_path)), set())
+
+
+def _normalise_path(file_path: str) -> str:
+    """Normalise a path so the same file always has the same path."""
+    return path.normcase(path.realpath(path.abspath(file_path)))
+
+
+def _numbits_to_lines(numbits: bytes) -> List[int]:
+    """Decode coverage.py's 'numbits' format, where bit 'n' of the blob being
+    set means line 'n' was run."""
+    return [
+        byte_index * 8 + bit_index for byte_index, byte in enumerate(numbits)
+        for bit_index in range(8) if byte & (1 << bit_index)
+    ]
@@ -1,69 +1,652 @@
+"""generator.py
+
+Used for generating the code of tests from testable functions.
+
+Author:
+    Figglewatts <me@figglewatts.co.uk>
+"""
+from abc import ABC, abstractmethod
+import builtins
 import logging
-from typing import List
+import os
+from typing import Any, Dict, List
+import unittest.mock
 
-from jinja2 import Template
+from jinja2 import (ChoiceLoader, DictLoader, Environment,
+                    FileSystemBytecodeCache, FileSystemLoader, Template)
 
+from . import analysis
+from . import importtime
+from . import observe
 from . import parse
 
-MODULE_TEST_FUNC_TEMPLATE = Template(\
+MODULE_TEST_FUNC_SOURCE = \
 """
 
 
-@pytest.mark.parametrize(
+{% for marker in data.markers %}@pytest.mark.{{ marker }}
+{% endfor %}@pytest.mark.parametrize(
     "{% for arg in data.arguments %}{{ arg }},{% endfor %}expected",
     [
         # TODO: fill in test data for {{ data.name }}
         # pytest.param({% for arg in data.arguments %}, {% endfor %}id="")
     ]
 )
-def {{ data.name }}({% for arg in data.arguments %}{{ arg }}, {% endfor %}expected):
-    {% if data.returns -%}
-    # result = {{ data.module_path }}.{{ data.src_name }}({% for arg in data.arguments %}{{ arg }}{{ ", " if not loop.last }}{% endfor %})
+def {{ data.name }}({% if data.mocks %}monkeypatch, {% endif %}{% if data.event_loop %}{{ data.event_loop }}, {% endif %}{% for arg in data.arguments %}{{ arg }}, {% endfor %}expected):
+{% for module in data.imports %}    import {{ module }}
+{% endfor %}{% if data.mocks %}    # TODO: set what the mocked I/O returns
+{% endif %}{% for mock in data.mocks %}    {{ mock.name }} = unittest.mock.{{ mock.type }}()
+    monkeypatch.setattr("{{ mock.target }}", {{ mock.name }}{% if mock.builtin %}, raising=False{% endif %})
+{% endfor %}    {% if data.returns -%}
+    # result = {% if data.event_loop %}{{ data.event_loop }}.run_until_complete({% endif %}{{ data.module_path }}.{{ data.src_name }}({% for arg in data.arguments %}{{ arg }}{{ ", " if not loop.last }}{% endfor %}){% if data.event_loop %}){% endif %}
     # assert result == expected
     {% else -%}
     # TODO: create assertions for {{ data.name }}
-    # {{ data.module_path }}.{{ data.src_name }}({% for arg in data.arguments %}{{ arg }}{{ ", " if not loop.last }}{% endfor %})
+    # {% if data.event_loop %}{{ data.event_loop }}.run_until_complete({% endif %}{{ data.module_path }}.{{ data.src_name }}({% for arg in data.arguments %}{{ arg }}{{ ", " if not loop.last }}{% endfor %}){% if data.event_loop %}){% endif %}
     {% endif -%}
     pass
-""")
+"""
+MODULE_TEST_FUNC_TEMPLATE = Template(MODULE_TEST_FUNC_SOURCE)
 
-CLASS_TEST_FUNC_TEMPLATE = Template(\
+CLASS_TEST_FUNC_SOURCE = \
 """
 
 
-@pytest.mark.parametrize(
+{% for marker in data.markers %}@pytest.mark.{{ marker }}
+{% endfor %}@pytest.mark.parametrize(
     "instance,{% for arg in data.arguments %}{{ arg }},{% endfor %}expected",
     [
         # TODO: fill in test data for {{ data.name }}
         # pytest.param({{ data.module_path }}.{{ data.class_name }}({% for arg in data.init_arguments %}{{ arg }}{{", " if not loop.last }}{% endfor %}), {% for arg in data.arguments %}, {% endfor %}expected, id="")
     ]
 )
-def {{ data.name }}(instance, {% for arg in data.arguments %}{{ arg }}, {% endfor %}expected):
-    # TODO: write test for {{ data.name }}
-    {% if data.returns -%}
-    # result = instance.{{ data.src_name }}({% for arg in data.arguments %}{{ arg }}{{ ", " if not loop.last }}{% endfor %})
+def {{ data.name }}(instance, {% if data.mocks %}monkeypatch, {% endif %}{% if data.event_loop %}{{ data.event_loop }}, {% endif %}{% for arg in data.arguments %}{{ arg }}, {% endfor %}expected):
+{% for module in data.imports %}    import {{ module }}
+{% endfor %}    # TODO: write test for {{ data.name }}
+{% if data.mocks %}    # TODO: set what the mocked I/O returns
+{% endif %}{% for mock in data.mocks %}    {{ mock.name }} = unittest.mock.{{ mock.type }}()
+    monkeypatch.setattr("{{ mock.target }}", {{ mock.name }}{% if mock.builtin %}, raising=False{% endif %})
+{% endfor %}    {% if data.returns -%}
+    # result = {% if data.event_loop %}{{ data.event_loop }}.run_until_complete({% endif %}instance.{{ data.src_name }}({% for arg in data.arguments %}{{ arg }}{{ ", " if not loop.last }}{% endfor %}){% if data.event_loop %}){% endif %}
     # assert result == expected
     {% else -%}
     # TODO: create assertions for {{ data.name }}
-    # instance.{{ data.src_name }}({% for arg in data.arguments %}{{ arg }}{{ ", " if not loop.last }}{% endfor %})
+    # {% if data.event_loop %}{{ data.event_loop }}.run_until_complete({% endif %}instance.{{ data.src_name }}({% for arg in data.arguments %}{{ arg }}{{ ", " if not loop.last }}{% endfor %}){% if data.event_loop %}){% endif %}
     {% endif -%}
     pass
-""")
+"""
+CLASS_TEST_FUNC_TEMPLATE = Template(CLASS_TEST_FUNC_SOURCE)
+
+CLASS_FIXTURE_SOURCE = \
+"""
+
+
+@pytest.fixture(scope="{{ data.scope }}")
+def {{ data.name }}():
+{% for module in data.imports %}    import {{ module }}
+{% endfor %}    # TODO: create the instance of {{ data.class_name }} to test
+    # return {{ data.module_path }}.{{ data.class_name }}({% for arg in data.init_arguments %}{{ arg }}{{ ", " if not loop.last }}{% endfor %})
+    pass
+"""
+
+CLASS_FIXTURE_TEST_FUNC_SOURCE = \
+"""
+
+
+{% for marker in data.markers %}@pytest.mark.{{ marker }}
+{% endfor %}@pytest.mark.parametrize(
+    "{% for arg in data.arguments %}{{ arg }},{% endfor %}expected",
+    [
+        # TODO: fill in test data for {{ data.name }}
+        # pytest.param({% for arg in data.arguments %}, {% endfor %}expected, id="")
+    ]
+)
+def {{ data.name }}({{ data.fixture_name }}, {% if data.mocks %}monkeypatch, {% endif %}{% if data.event_loop %}{{ data.event_loop }}, {% endif %}{% for arg in data.arguments %}{{ arg }}, {% endfor %}expected):
+{% for module in data.imports %}    import {{ module }}
+{% endfor %}    # TODO: write test for {{ data.name }}
+{% if data.mocks %}    # TODO: set what the mocked I/O returns
+{% endif %}{% for mock in data.mocks %}    {{ mock.name }} = unittest.mock.{{ mock.type }}()
+    monkeypatch.setattr("{{ mock.target }}", {{ mock.name }}{% if mock.builtin %}, raising=False{% endif %})
+{% endfor %}    {% if data.returns -%}
+    # result = {% if data.event_loop %}{{ data.event_loop }}.run_until_complete({% endif %}{{ data.fixture_name }}.{{ data.src_name }}({% for arg in data.arguments %}{{ arg }}{{ ", " if not loop.last }}{% endfor %}){% if data.event_loop %}){% endif %}
+    # assert result == expected
+    {% else -%}
+    # TODO: create assertions for {{ data.name }}
+    # {% if data.event_loop %}{{ data.event_loop }}.run_until_complete({% endif %}{{ data.fixture_name }}.{{ data.src_name }}({% for arg in data.arguments %}{{ arg }}{{ ", " if not loop.last }}{% endfor %}){% if data.event_loop %}){% endif %}
+    {% endif -%}
+    pass
+"""
+
+BENCHMARK_FUNC_SOURCE = \
+"""
+
+
+{% for marker in data.markers %}@pytest.mark.{{ marker }}
+{% endfor %}{% if data.arguments %}@pytest.mark.parametrize(
+    "{{ data.arguments|join(",") }}",
+    [
+        # TODO: fill in benchmark inputs for {{ data.name }}
+        # pytest.param({{ data.placeholders|join(", ") }}, id="")
+    ]
+)
+{% endif %}def {{ data.name }}({{ data.fixtures|join(", ") }}{% for arg in data.arguments %}, {{ arg }}{% endfor %}):
+{% for module in data.imports %}    import {{ module }}
+{% endfor %}    # TODO: make sure the inputs of {{ data.name }} are representative
+    benchmark({{ data.target }}{% for arg in data.call_arguments %}, {{ arg }}{% endfor %})
+"""
+
+EVENT_LOOP_FIXTURE_SOURCE = \
+"""
+
+
+@pytest.fixture(scope="session")
+def {{ data.name }}():
+    # one event loop shared by every test of an async function
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+"""
+
+TEST_FILE_SOURCE = \
+"""{% for module in modules %}{{ "\n" if not loop.first }}import {{ module }}{% endfor %}
+{%- if test_module %}
+
+import {{ test_module }}{% endif %}
+"""
+TEST_FILE_TEMPLATE = Template(TEST_FILE_SOURCE)
+
+# renders all of a file's test functions in one go by including the template
+# for each kind of test function
+TEST_FUNCS_SOURCE = \
+"""{% for data in funcs %}{% include data.kind + ".py.j2" %}{% endfor %}
+"""
+
+BUILTIN_TEMPLATES = {
+    "module_test_func.py.j2": MODULE_TEST_FUNC_SOURCE,
+    "class_test_func.py.j2": CLASS_TEST_FUNC_SOURCE,
+    "class_fixture.py.j2": CLASS_FIXTURE_SOURCE,
+    "class_fixture_test_func.py.j2": CLASS_FIXTURE_TEST_FUNC_SOURCE,
+    "benchmark_func.py.j2": BENCHMARK_FUNC_SOURCE,
+    "event_loop_fixture.py.j2": EVENT_LOOP_FIXTURE_SOURCE,
+    "test_file.py.j2": TEST_FILE_SOURCE,
+    "test_funcs.py.j2": TEST_FUNCS_SOURCE
+}
+"""The built-in templates by name, which can be overridden by templates in a
+template directory."""
+
+
+# these format strings produce the same output as the templates above, but
+# without the overhead of rendering a template
+MODULE_TEST_FUNC_FORMAT = \
+"""
+
+
+{markers}@pytest.mark.parametrize(
+    "{param_names}expected",
+    [
+        # TODO: fill in test data for {name}
+        # pytest.param({param_placeholders}id="")
+    ]
+)
+def {name}({func_args}expected):
+{imports}{mocks}{body}    pass"""
+
+CLASS_TEST_FUNC_FORMAT = \
+"""
+
+
+{markers}@pytest.mark.parametrize(
+    "instance,{param_names}expected",
+    [
+        # TODO: fill in test data for {name}
+        # pytest.param({module_path}.{class_name}({init_args}), {param_placeholders}expected, id="")
+    ]
+)
+def {name}(instance, {func_args}expected):
+{imports}    # TODO: write test for {name}
+{mocks}{body}    pass"""
+
+CLASS_FIXTURE_FORMAT = \
+"""
+
+
+@pytest.fixture(scope="{scope}")
+def {name}():
+{imports}    # TODO: create the instance of {class_name} to test
+    # return {module_path}.{class_name}({init_args})
+    pass"""
+
+CLASS_FIXTURE_TEST_FUNC_FORMAT = \
+"""
+
+
+{markers}@pytest.mark.parametrize(
+    "{param_names}expected",
+    [
+        # TODO: fill in test data for {name}
+        # pytest.param({param_placeholders}expected, id="")
+    ]
+)
+def {name}({fixture_name}, {func_args}expected):
+{imports}    # TODO: write test for {name}
+{mocks}{body}    pass"""
+
+BENCHMARK_FUNC_FORMAT = \
+"""
+
+
+{markers}{parametrize}def {name}({fixtures}{func_args}):
+{imports}    # TODO: make sure the inputs of {name} are representative
+    benchmark({target}{call_args})"""
+
+EVENT_LOOP_FIXTURE_FORMAT = \
+"""
+
+
+@pytest.fixture(scope="session")
+def {name}():
+    # one event loop shared by every test of an async function
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()"""
+
+BENCHMARK_PARAMETRIZE_FORMAT = \
+"""@pytest.mark.parametrize(
+    "{param_names}",
+    [
+        # TODO: fill in benchmark inputs for {name}
+        # pytest.param({param_placeholders}, id="")
+    ]
+)
+"""
+
+MOCKS_FORMAT = """    # TODO: set what the mocked I/O returns
+"""
+
+MOCK_FORMAT = """    {name} = unittest.mock.{type}()
+    monkeypatch.setattr("{target}", {name}{raising})
+"""
+
+RETURNS_BODY_FORMAT = """    # result = {call}
+    # assert result == expected
+"""
+
+NO_RETURNS_BODY_FORMAT = """    # TODO: create assertions for {name}
+    # {call}
+"""
+
+
+FIXTURE_SCOPES = ["function", "module", "session"]
+"""The scopes instance fixtures can be generated with."""
+
+LAYOUTS = ["module", "class", "chunk"]
+"""The ways tests for a module can be laid out across test files."""
+
+DEFAULT_SHARD_SIZE = 100
+"""The default number of tests per file when using the 'chunk' layout."""
+
+BENCHMARK_MODES = ["also", "only"]
+"""Whether benchmarks are generated as well as, or instead of, tests."""
+
+EVENT_LOOP_FIXTURE = "session_event_loop"
+"""The name of the session fixture that tests of async functions run their
+coroutines in."""
+
+MOCK_MODULE = "unittest.mock"
+"""The module tests import to create the mocks that replace I/O calls."""
+
+
+class GeneratorOptions:
+    """Options that change the tests that are generated.
+
+    Attributes:
+        fixture_scope (str): If set, each class gets a fixture with this scope
+            that creates its instance, and tests of its methods use the fixture
+            instead of creating an instance per parameter.
+        layout (str): How a module's tests are split across test files. One of
+            'module' (one test file per module), 'class' (a test file per class,
+            with module functions in the module's test file) or 'chunk' (test
+            files of up to 'shard_size' tests each).
+        shard_size (int): The maximum number of tests per file when using the
+            'chunk' layout.
+        xdist_groups (bool): Whether to mark tests with xdist_group markers, so
+            pytest-xdist keeps each class' tests on the same worker when run
+            with '--dist loadgroup'.
+        benchmark (str): If set, pytest-benchmark tests are generated 'also'
+            alongside tests, or 'only' instead of them.
+        import_time_threshold (float): If set, the import time of each module
+            is measured, and modules that take longer than this many seconds
+            to import are imported inside their tests instead of at the top of
+            the test file.
+        import_times (ImportTimes): The import time of each module measured
+            with these options, so each module is only measured once.
+        slow_marker (str): If set, tests of functions that look expensive to
+            call are marked with this marker, i.e. 'slow' for
+            '@pytest.mark.slow'. See analysis.find_costs().
+        mock_io (bool): Whether tests replace the calls to file, subprocess,
+            sleep and network functions the function makes with mocks, so they
+            don't do real I/O. See analysis.find_io_calls().
+    """
+    def __init__(self,
+                 fixture_scope: str = None,
+                 layout: str = "module",
+                 shard_size: int = DEFAULT_SHARD_SIZE,
+                 xdist_groups: bool = False,
+                 benchmark: str = None,
+                 import_time_threshold: float = None,
+                 slow_marker: str = None,
+                 mock_io: bool = False) -> None:
+        if fixture_scope is not None and fixture_scope not in FIXTURE_SCOPES:
+            raise ValueError(f"Unknown fixture scope '{fixture_scope}', "
+                             f"should be one of {FIXTURE_SCOPES}")
+        if benchmark is not None and benchmark not in BENCHMARK_MODES:
+            raise ValueError(f"Unknown benchmark mode '{benchmark}', "
+                             f"should be one of {BENCHMARK_MODES}")
+        if layout not in LAYOUTS:
+            raise ValueError(
+                f"Unknown layout '{layout}', should be one of {LAYOUTS}")
+        if shard_size < 1:
+            raise ValueError(
+                f"Shard size should be at least 1, was {shard_size}")
+        if import_time_threshold is not None and import_time_threshold < 0:
+            raise ValueError(f"Import time threshold should not be negative, "
+                             f"was {import_time_threshold}")
+        if slow_marker is not None and not slow_marker.isidentifier():
+            raise ValueError(
+                f"Slow marker should be a marker name, was '{slow_marker}'")
+        self.fixture_scope = fixture_scope
+        self.layout = layout
+        self.shard_size = shard_size
+        self.xdist_groups = xdist_groups
+        self.benchmark = benchmark
+        self.import_time_threshold = import_time_threshold
+        self.import_times = importtime.ImportTimes()
+        self.slow_marker = slow_marker
+        self.mock_io = mock_io
+
+    def __repr__(self) -> str:
+        return f"GeneratorOptions({self.__dict__})"
 
-TEST_FILE_TEMPLATE = Template(\
-"""{% for module in modules %}import {{ module }}
-{% endfor %}
-import {{ test_module }}
-""")
+
+DEFAULT_OPTIONS = GeneratorOptions()
+"""The options used when none are given."""
+
+
+class Renderer(ABC):
+    """A Renderer turns the data of a testable function into the code of its
+    test.
+
+    Every piece of data has a 'kind', which is the name of the template used to
+    render it (without the .py.j2 extension). See get_module_func_data(),
+    get_class_func_data(), get_class_fixture_data(), get_benchmark_func_data()
+    and get_event_loop_fixture_data() for what each kind of data contains. Test
+    data has a list of 'markers' to decorate the test with, i.e. 'slow' for
+    '@pytest.mark.slow', the 'event_loop' fixture to run an async function's
+    coroutine in, or None, and the 'mocks' to replace its I/O calls with (see
+    get_mocks()).
+    """
+    def render_test_funcs(self, funcs: List[Dict[str, Any]]) -> str:
+        """Render the tests of all of a file's functions."""
+        return "".join([self.render(data["kind"], data) for data in funcs])
+
+    def render_module_func(self, data: Dict[str, Any]) -> str:
+        return self.render("module_test_func", data)
+
+    def render_class_func(self, data: Dict[str, Any]) -> str:
+        return self.render("class_test_func", data)
+
+    @abstractmethod
+    def render(self, kind: str, data: Dict[str, Any]) -> str:
+        """Render a single piece of data with the template for 'kind'."""
+        raise NotImplementedError("Cannot call abstract method")
+
+    @abstractmethod
+    def render_test_file(self, modules: List[str], test_module: str) -> str:
+        raise NotImplementedError("Cannot call abstract method")
+
+
+class JinjaRenderer(Renderer):
+    """Renders tests using the built-in Jinja templates, rendering each file's
+    tests in a single call."""
+    def __init__(self) -> None:
+        self._environment = self._create_environment()
+
+    def render_test_funcs(self, funcs: List[Dict[str, Any]]) -> str:
+        return self._environment.get_template("test_funcs.py.j2").render(
+            funcs=funcs)
+
+    def render(self, kind: str, data: Dict[str, Any]) -> str:
+        return self._environment.get_template(f"{kind}.py.j2").render(
+            data=data)
+
+    def render_test_file(self, modules: List[str], test_module: str) -> str:
+        return self._environment.get_template("test_file.py.j2").render(
+            modules=modules, test_module=test_module)
+
+    def _create_environment(self) -> Environment:
+        return Environment(loader=DictLoader(BUILTIN_TEMPLATES))
+
+    def __repr__(self) -> str:
+        return "JinjaRenderer()"
+
+
+class FastRenderer(Renderer):
+    """Renders tests using plain format strings. Produces the same output as
+    JinjaRenderer, but much faster."""
+    def __init__(self) -> None:
+        self._renderers = {
+            "module_test_func": self._render_module_func,
+            "class_test_func": self._render_class_func,
+            "class_fixture": self._render_class_fixture,
+            "class_fixture_test_func": self._render_class_fixture_test_func,
+            "benchmark_func": self._render_benchmark_func,
+            "event_loop_fixture": self._render_event_loop_fixture
+        }
+
+    def render(self, kind: str, data: Dict[str, Any]) -> str:
+        return self._renderers[kind](data)
+
+    def render_test_file(self, modules: List[str], test_module: str) -> str:
+        imports = "\n".join([f"import {module}" for module in modules])
+        if test_module is None:
+            return imports
+        return f"{imports}\n\nimport {test_module}"
+
+    def _render_module_func(self, data: Dict[str, Any]) -> str:
+        call = f"{data['module_path']}.{data['src_name']}" \
+            f"({', '.join(data['arguments'])})"
+        return MODULE_TEST_FUNC_FORMAT.format(
+            markers=self._render_markers(data),
+            name=data["name"],
+            param_names="".join([f"{arg}," for arg in data["arguments"]]),
+            param_placeholders=", " * len(data["arguments"]),
+            func_args=self._render_func_args(data),
+            imports=self._render_imports(data),
+            mocks=self._render_mocks(data),
+            body=self._render_body(data, call))
+
+    def _render_class_func(self, data: Dict[str, Any]) -> str:
+        call = f"instance.{data['src_name']}({', '.join(data['arguments'])})"
+        return CLASS_TEST_FUNC_FORMAT.format(
+            markers=self._render_markers(data),
+            name=data["name"],
+            module_path=data["module_path"],
+            class_name=data["class_name"],
+            init_args=", ".join(data["init_arguments"]),
+            param_names="".join([f"{arg}," for arg in data["arguments"]]),
+            param_placeholders=", " * len(data["arguments"]),
+            func_args=self._render_func_args(data),
+            imports=self._render_imports(data),
+            mocks=self._render_mocks(data),
+            body=self._render_body(data, call))
+
+    def _render_class_fixture(self, data: Dict[str, Any]) -> str:
+        return CLASS_FIXTURE_FORMAT.format(
+            name=data["name"],
+            scope=data["scope"],
+            imports=self._render_imports(data),
+            module_path=data["module_path"],
+            class_name=data["class_name"],
+            init_args=", ".join(data["init_arguments"]))
+
+    def _render_class_fixture_test_func(self, data: Dict[str, Any]) -> str:
+        call = f"{data['fixture_name']}.{data['src_name']}" \
+            f"({', '.join(data['arguments'])})"
+        return CLASS_FIXTURE_TEST_FUNC_FORMAT.format(
+            markers=self._render_markers(data),
+            name=data["name"],
+            fixture_name=data["fixture_name"],
+            param_names="".join([f"{arg}," for arg in data["arguments"]]),
+            param_placeholders=", " * len(data["arguments"]),
+            func_args=self._render_func_args(data),
+            imports=self._render_imports(data),
+            mocks=self._render_mocks(data),
+            body=self._render_body(data, call))
+
+    def _render_benchmark_func(self, data: Dict[str, Any]) -> str:
+        parametrize = ""
+        if data["arguments"]:
+            parametrize = BENCHMARK_PARAMETRIZE_FORMAT.format(
+                name=data["name"],
+                param_names=",".join(data["arguments"]),
+                param_placeholders=", ".join(data["placeholders"]))
+        return BENCHMARK_FUNC_FORMAT.format(
+            markers=self._render_markers(data),
+            parametrize=parametrize,
+            name=data["name"],
+            fixtures=", ".join(data["fixtures"]),
+            func_args="".join([f", {arg}" for arg in data["arguments"]]),
+            imports=self._render_imports(data),
+            target=data["target"],
+            call_args="".join([f", {arg}" for arg in data["call_arguments"]]))
+
+    def _render_event_loop_fixture(self, data: Dict[str, Any]) -> str:
+        return EVENT_LOOP_FIXTURE_FORMAT.format(name=data["name"])
+
+    def _render_func_args(self, data: Dict[str, Any]) -> str:
+        func_args = "".join([f"{arg}, " for arg in data["arguments"]])
+        if data.get("event_loop"):
+            func_args = f"{data['event_loop']}, {func_args}"
+        if data.get("mocks"):
+            func_args = f"monkeypatch, {func_args}"
+        return func_args
+
+    def _render_imports(self, data: Dict[str, Any]) -> str:
+        return "".join(
+            [f"    import {module}\n" for module in data.get("imports", [])])
+
+    def _render_mocks(self, data: Dict[str, Any]) -> str:
+        if not data.get("mocks"):
+            return ""
+        return MOCKS_FORMAT + "".join([
+            MOCK_FORMAT.format(
+                name=mock["name"],
+                type=mock["type"],
+                target=mock["target"],
+                raising=", raising=False" if mock["builtin"] else "")
+            for mock in data["mocks"]
+        ])
+
+    def _render_markers(self, data: Dict[str, Any]) -> str:
+        return "".join(
+            [f"@pytest.mark.{marker}\n" for marker in data.get("markers", [])])
+
+    def _render_body(self, data: Dict[str, Any], call: str) -> str:
+        if data.get("event_loop"):
+            call = f"{data['event_loop']}.run_until_complete({call})"
+        if data["returns"]:
+            return RETURNS_BODY_FORMAT.format(call=call)
+        return NO_RETURNS_BODY_FORMAT.format(name=data["name"], call=call)
+
+    def __repr__(self) -> str:
+        return "FastRenderer()"
+
+
+class TemplateDirRenderer(JinjaRenderer):
+    """Renders tests using templates from a directory, falling back to the
+    built-in templates for any not in it (see BUILTIN_TEMPLATES). Compiled
+    templates are cached on disk, so they're only compiled again when they
+    change.
+
+    Attributes:
+        template_dir (str): The directory to load templates from.
+        cache_dir (str): The directory compiled templates are cached in. If
+            None, a directory in the system's temp dir is used.
+    """
+    def __init__(self, template_dir: str, cache_dir: str = None) -> None:
+        self.template_dir = template_dir
+        self.cache_dir = cache_dir
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        super().__init__()
+
+    def _create_environment(self) -> Environment:
+        return Environment(loader=ChoiceLoader([
+            FileSystemLoader(self.template_dir),
+            DictLoader(BUILTIN_TEMPLATES)
+        ]),
+                           bytecode_cache=FileSystemBytecodeCache(
+                               self.cache_dir))
+
+    def __repr__(self) -> str:
+        return f"TemplateDirRenderer(\"{self.template_dir}\", " \
+            f"{self.cache_dir.__repr__()})"
+
+
+RENDERERS = {"jinja": JinjaRenderer, "fast": FastRenderer}
+"""The renderers that can be selected by name."""
+
+DEFAULT_RENDERER = JinjaRenderer()
+"""The renderer used when one isn't given."""
+
+
+def get_renderer(name: str) -> Renderer:
+    """Get a renderer by name.
+
+    Args:
+        name (str): The name of the renderer, one of the keys of RENDERERS.
+
+    Returns:
+        Renderer: The renderer.
+
+    Raises:
+        ValueError: If there wasn't a renderer called 'name'.
+    """
+    if name not in RENDERERS:
+        raise ValueError(f"Unknown renderer '{name}', should be one of "
+                         f"{list(RENDERERS.keys())}")
+    return RENDERERS[name]()
 
 
 def generate_class_func(testable_func: parse.ClassTestableFunc,
-                        module_path: str) -> str:
+                        module_path: str,
+                        renderer: Renderer = None) -> str:
+    data = get_class_func_data(testable_func, module_path)
     # don't generate a test if we can't create an instance of the class
-    if testable_func.init_function_def is None:
+    if data is None:
         return ""
+    renderer = DEFAULT_RENDERER if renderer is None else renderer
+    return renderer.render_class_func(data)
+
 
-    data = {
+def generate_module_func(testable_func: parse.ModuleTestableFunc,
+                         module_path: str,
+                         renderer: Renderer = None) -> str:
+    data = get_module_func_data(testable_func, module_path)
+    renderer = DEFAULT_RENDERER if renderer is None else renderer
+    return renderer.render_module_func(data)
+
+
+def get_class_func_data(testable_func: parse.ClassTestableFunc,
+                        module_path: str) -> Dict[str, Any]:
+    """Get the data to render the test of a class function with. Returns None
+    if the class has no __init__(), as we can't create an instance of it."""
+    if testable_func.init_function_def is None:
+        return None
+
+    return {
+        "kind":
+        "class_test_func",
         "arguments": [
             arg.arg for arg in testable_func.function_def.args.args
             if arg.arg != "self"
@@ -81,21 +664,187 @@ def generate_class_func(testable_func: parse.ClassTestableFunc,
             if arg.arg != "self"
         ],
         "returns":
-        testable_func.function_def.returns is not None
+        testable_func.function_def.returns is not None,
+        "event_loop":
+        get_event_loop(testable_func),
+        "mocks": [],
+        "markers": [],
+        "imports": []
     }
-    return CLASS_TEST_FUNC_TEMPLATE.render(data=data)
 
 
-def generate_module_func(testable_func: parse.ModuleTestableFunc,
-                         module_path: str) -> str:
-    data = {
+def get_module_func_data(testable_func: parse.ModuleTestableFunc,
+                         module_path: str) -> Dict[str, Any]:
+    """Get the data to render the test of a module function with."""
+    return {
+        "kind": "module_test_func",
         "arguments": [arg.arg for arg in testable_func.function_def.args.args],
         "name": testable_func.get_test_name(),
         "src_name": testable_func.function_def.name,
         "module_path": module_path,
-        "returns": testable_func.function_def.returns is not None
+        "returns": testable_func.function_def.returns is not None,
+        "event_loop": get_event_loop(testable_func),
+        "mocks": [],
+        "markers": [],
+        "imports": []
     }
-    return MODULE_TEST_FUNC_TEMPLATE.render(data=data)
+
+
+def get_class_fixture_data(testable_func: parse.ClassTestableFunc,
+                           module_path: str, scope: str) -> Dict[str, Any]:
+    """Get the data to render the fixture that creates the instance of a class
+    function's class with."""
+    return {
+        "kind":
+        "class_fixture",
+        "name":
+        get_class_fixture_name(testable_func),
+        "scope":
+        scope,
+        "module_path":
+        module_path,
+        "class_name":
+        testable_func.class_def.name,
+        "init_arguments": [
+            arg.arg for arg in testable_func.init_function_def.args.args
+            if arg.arg != "self"
+        ],
+        "imports": []
+    }
+
+
+def get_benchmark_func_data(testable_func: parse.TestableFunc,
+                            module_path: str,
+                            fixture_name: str = None) -> Dict[str, Any]:
+    """Get the data to render the pytest-benchmark test of a function with.
+    Class functions use the fixture 'fixture_name' for their instance if it's
+    given, and are otherwise parametrized with it. Returns None for class
+    functions if the class has no __init__(), as we can't create an instance of
+    it."""
+    call_arguments = [
+        arg.arg for arg in testable_func.function_def.args.args
+        if arg.arg != "self"
+    ]
+    arguments = list(call_arguments)
+    placeholders = ["" for _ in call_arguments]
+    fixtures = ["benchmark"]
+    target = f"{module_path}.{testable_func.function_def.name}"
+    if isinstance(testable_func, parse.ClassTestableFunc):
+        if fixture_name is not None:
+            fixtures.append(fixture_name)
+            target = f"{fixture_name}.{testable_func.function_def.name}"
+        elif testable_func.init_function_def is None:
+            return None
+        else:
+            init_arguments = [
+                arg.arg for arg in testable_func.init_function_def.args.args
+                if arg.arg != "self"
+            ]
+            arguments.insert(0, "instance")
+            placeholders.insert(
+                0, f"{module_path}.{testable_func.class_def.name}"
+                f"({', '.join(init_arguments)})")
+            target = f"instance.{testable_func.function_def.name}"
+
+    if testable_func.is_async():
+        # benchmark each call to the coroutine function run to completion
+        fixtures.append(EVENT_LOOP_FIXTURE)
+        target = f"lambda: {EVENT_LOOP_FIXTURE}.run_until_complete(" \
+            f"{target}({', '.join(call_arguments)}))"
+        call_arguments = []
+
+    return {
+        "kind": "benchmark_func",
+        "name": testable_func.get_benchmark_name(),
+        "src_name": testable_func.function_def.name,
+        "module_path": module_path,
+        "arguments": arguments,
+        "placeholders": placeholders,
+        "fixtures": fixtures,
+        "target": target,
+        "call_arguments": call_arguments,
+        "markers": [],
+        "imports": []
+    }
+
+
+def get_event_loop_fixture_data() -> Dict[str, Any]:
+    """Get the data to render the session fixture that tests of async functions
+    run their coroutines in with."""
+    return {"kind": "event_loop_fixture", "name": EVENT_LOOP_FIXTURE}
+
+
+def get_event_loop(testable_func: parse.TestableFunc) -> str:
+    """Get the name of the event loop fixture to run a testable function's
+    coroutine in, or None if it isn't an async function."""
+    return EVENT_LOOP_FIXTURE if testable_func.is_async() else None
+
+
+def get_mocks(testable_func: parse.TestableFunc,
+              module_path: str) -> List[Dict[str, Any]]:
+    """Get the mocks a testable function's test replaces its I/O calls with.
+    Each has the 'name' of its variable, the 'type' of unittest.mock mock to
+    create, the 'target' to monkeypatch, i.e. 'module.subprocess.run', and
+    whether the target is a 'builtin' like open(), which the module doesn't
+    have an attribute for.
+
+    Awaited calls like 'await asyncio.sleep(1)' are replaced with an AsyncMock,
+    as awaiting what a MagicMock returns raises a TypeError. Python 3.7 doesn't
+    have AsyncMock, so they aren't mocked there."""
+    is_method = isinstance(testable_func, parse.ClassTestableFunc)
+    awaited = analysis.find_awaited_io_calls(testable_func.function_def,
+                                             is_method)
+    mocks = []
+    for dotted_name in analysis.find_io_calls(testable_func.function_def,
+                                              is_method):
+        mock_type = "MagicMock"
+        if dotted_name in awaited:
+            if not hasattr(unittest.mock, "AsyncMock"):
+                continue
+            mock_type = "AsyncMock"
+        mocks.append({
+            "name":
+            "mock_" + "_".join(dotted_name).lower(),
+            "type":
+            mock_type,
+            "target":
+            ".".join([module_path] + dotted_name),
+            "builtin":
+            len(dotted_name) == 1 and hasattr(builtins, dotted_name[0])
+        })
+    return mocks
+
+
+def get_class_fixture_name(testable_func: parse.ClassTestableFunc) -> str:
+    """Get the name of the fixture that creates the instance of a class
+    function's class, i.e. 'aclass_instance' for a class 'AClass'."""
+    return f"{testable_func.class_def.name.lower().strip('_')}_instance"
+
+
+def get_xdist_group(testable_func: parse.TestableFunc,
+                    module_path: str) -> str:
+    """Get the xdist group of a testable function, which is its class for class
+    functions and its module for module functions."""
+    if isinstance(testable_func, parse.ClassTestableFunc):
+        return f"{module_path}.{testable_func.class_def.name}"
+    return module_path
+
+
+def get_test_names(testable_func: parse.TestableFunc,
+                   options: GeneratorOptions = None) -> List[str]:
+    """Get the names of the tests that will be generated for a testable
+    function with 'options'. Methods of a class without an __init__() don't
+    get any, see get_class_func_data()."""
+    if isinstance(testable_func, parse.ClassTestableFunc) \
+            and testable_func.init_function_def is None:
+        return []
+    options = DEFAULT_OPTIONS if options is None else options
+    test_names = []
+    if options.benchmark != "only":
+        test_names.append(testable_func.get_test_name())
+    if options.benchmark is not None:
+        test_names.append(testable_func.get_benchmark_name())
+    return test_names
 
 
 TESTABLE_FUNC_TEMPLATE_MAP = {
@@ -103,15 +852,146 @@ TESTABLE_FUNC_TEMPLATE_MAP = {
     parse.ModuleTestableFunc: generate_module_func
 }
 
+TESTABLE_FUNC_DATA_MAP = {
+    parse.ClassTestableFunc: get_class_func_data,
+    parse.ModuleTestableFunc: get_module_func_data
+}
+
 
 def generate_test_func(testable_func: parse.TestableFunc,
-                       module_path: str) -> str:
-    logging.info(
-        f"Generating '{testable_func.get_test_name()}' from module '{module_path}'"
-    )
+                       module_path: str,
+                       renderer: Renderer = None) -> str:
+    logging.debug("Generating '%s' from module '%s'",
+                  testable_func.get_test_name(), module_path)
     return TESTABLE_FUNC_TEMPLATE_MAP[type(testable_func)](testable_func,
+                                                           module_path,
+                                                           renderer)
+
+
+def generate_test_funcs(testable_funcs: List[parse.TestableFunc],
+                        module_path: str,
+                        renderer: Renderer = None,
+                        options: GeneratorOptions = None,
+                        existing_functions: List[str] = [],
+                        defer_import: bool = False) -> str:
+    """Generate the tests of a list of testable functions from the same module
+    in one go, letting the renderer batch them.
+
+    If 'defer_import' is set the module is imported inside each test (or
+    fixture) instead of at the top of the test file, so collecting the tests
+    doesn't import it. Class tests then always use an instance fixture, as
+    their instances would otherwise be created during collection.
+
+    Args:
+        testable_funcs: The functions to generate tests for.
+        module_path: The module the functions are in.
+        renderer: The renderer to render tests with. Defaults to Jinja.
+        options: The options to generate tests with.
+        existing_functions: The names of functions that already exist, so
+            tests and fixtures aren't generated twice.
+        defer_import: Whether to import the module inside tests.
+
+    Returns:
+        str: The code of the tests.
+    """
+    options = DEFAULT_OPTIONS if options is None else options
+    existing = set(existing_functions)
+    funcs = []
+    for testable_func in testable_funcs:
+        logging.debug("Generating '%s' from module '%s'",
+                      testable_func.get_test_name(), module_path)
+        data = TESTABLE_FUNC_DATA_MAP[type(testable_func)](testable_func,
                                                            module_path)
+        if data is None:
+            continue
+
+        fixture_data = None
+        fixture_scope = options.fixture_scope
+        if defer_import and fixture_scope is None:
+            fixture_scope = "function"
+        if fixture_scope is not None \
+                and isinstance(testable_func, parse.ClassTestableFunc):
+            fixture_data = get_class_fixture_data(testable_func, module_path,
+                                                  fixture_scope)
+            data["kind"] = "class_fixture_test_func"
+            data["fixture_name"] = fixture_data["name"]
+
+        if options.mock_io:
+            # benchmarks should measure the real I/O, so only tests use mocks
+            data["mocks"] = get_mocks(testable_func, module_path)
+            if len(data["mocks"]) > 0:
+                data["imports"].append(MOCK_MODULE)
+
+        tests = []
+        if options.benchmark != "only":
+            tests.append(data)
+        if options.benchmark is not None:
+            tests.append(
+                get_benchmark_func_data(
+                    testable_func, module_path,
+                    None if fixture_data is None else fixture_data["name"]))
+        tests = [test for test in tests if test["name"] not in existing]
+        if len(tests) == 0:
+            continue
+
+        if options.slow_marker is not None:
+            _mark_slow(testable_func, tests, options.slow_marker)
+
+        if defer_import:
+            # class tests get their instance from the fixture, so only the
+            # fixture needs to import the module
+            for func in tests if fixture_data is None else [fixture_data]:
+                func["imports"].append(module_path)
+
+        # generate each class' fixture before its first test
+        if fixture_data is not None and fixture_data["name"] not in existing:
+            existing.add(fixture_data["name"])
+            funcs.append(fixture_data)
+
+        for test in tests:
+            if options.xdist_groups:
+                xdist_group = get_xdist_group(testable_func, module_path)
+                test["markers"].append(f"xdist_group(name=\"{xdist_group}\")")
+            funcs.append(test)
+            if observe.OBSERVERS:
+                observe.notify(observe.TEST_EMITTED, test["name"], module_path)
+
+    if len(funcs) == 0:
+        return ""
+    renderer = DEFAULT_RENDERER if renderer is None else renderer
+    return renderer.render_test_funcs(funcs)
+
+
+def generate_event_loop_fixture(renderer: Renderer = None) -> str:
+    """Generate the session fixture that tests of async functions run their
+    coroutines in, i.e. for a conftest.py. It needs asyncio and pytest to be
+    imported."""
+    renderer = DEFAULT_RENDERER if renderer is None else renderer
+    return renderer.render("event_loop_fixture",
+                           get_event_loop_fixture_data())
+
+
+def generate_test_file(modules: List[str],
+                       test_module: str,
+                       renderer: Renderer = None) -> str:
+    """Generate the header of a test file, importing 'modules' and then
+    'test_module'. If 'test_module' is None it isn't imported, i.e. when its
+    import is deferred to the tests."""
+    renderer = DEFAULT_RENDERER if renderer is None else renderer
+    return renderer.render_test_file(modules, test_module)
 
 
-def generate_test_file(modules: List[str], test_module: str) -> str:
-    return TEST_FILE_TEMPLATE.render(modules=modules, test_module=test_module)
\ No newline at end of file
+def _mark_slow(testable_func: parse.TestableFunc,
+               tests: List[Dict[str, Any]], slow_marker: str) -> None:
+    """Mark the tests of a testable function with 'slow_marker' if it looks
+    expensive to call."""
+    costs = analysis.find_costs(
+        testable_func.function_def,
+        isinstance(testable_func, parse.ClassTestableFunc))
+    if len(costs) == 0:
+        return
+    logging.debug("Marking tests of '%s' as %s (%s)",
+                  testable_func.function_def.name, slow_marker,
+                  ", ".join(costs))
+    for test in tests:
+        test["markers"].append(slow_marker)
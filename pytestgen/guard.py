@@ -0,0 +1,177 @@
+"""guard.py
+
+Guards keep pathological input files, i.e. huge data tables or generated
+protobuf modules, from being parsed. They only look at the size and text of a
+file, so they're much cheaper than parsing it.
+
+Author:
+    Figglewatts <me@figglewatts.co.uk>
+"""
+import logging
+from os import path
+import re
+
+from pytestgen import load
+from pytestgen import observe
+from pytestgen import parse
+
+DEF_PATTERN = re.compile(rb"^[ \t]*(?:async[ \t]+)?def[ \t]", re.MULTILINE)
+"""Matches every line that looks like the start of a function definition."""
+
+GENERATED_PATTERN = re.compile(
+    rb"^(?:#\s*)?@generated\b"
+    rb"|^#\s*generated by (?:the protocol buffer compiler"
+    rb"|the grpc python protocol compiler plugin|django \d)"
+    rb"|^#\s*autogenerated by thrift compiler\b"
+    rb"|^#\s*code generated by .+\bdo not edit\.?$",
+    re.IGNORECASE)
+"""Matches the headers code generators put at the top of generated files,
+i.e. '# Generated by the protocol buffer compiler.  DO NOT EDIT!'. Only known
+headers are matched, as a hand-written comment can say not to edit something
+too."""
+
+GENERATED_HEADER_LINES = 10
+"""How many lines at the top of a file to look for a generated comment in."""
+
+TOO_LARGE = "too_large"
+TOO_MANY_DEFS = "too_many_defs"
+GENERATED = "generated"
+REASONS = [TOO_LARGE, TOO_MANY_DEFS, GENERATED]
+"""The reasons a guard can skip a file for."""
+
+
+class InputGuards:
+    """Limits on the files to parse. Files are checked against the source code
+    that would be parsed, so the .pyi stub of a file if it has one.
+
+    Attributes:
+        max_file_size (int): The maximum size of a file in bytes. If None, any
+            size is parsed.
+        max_defs (int): The maximum number of lines that look like function
+            definitions a file can have. If None, any number is parsed.
+        skip_generated (bool): Whether to skip files with a comment saying
+            they were generated near the top.
+    """
+    def __init__(self,
+                 max_file_size: int = None,
+                 max_defs: int = None,
+                 skip_generated: bool = False) -> None:
+        if max_file_size is not None and max_file_size <= 0:
+            raise ValueError(
+                f"Max file size must be positive, was {max_file_size}")
+        if max_defs is not None and max_defs <= 0:
+            raise ValueError(f"Max defs must be positive, was {max_defs}")
+        self.max_file_size = max_file_size
+        self.max_defs = max_defs
+        self.skip_generated = skip_generated
+
+    def check(self, input_file: load.PyTestGenInputFile) -> str:
+        """Check whether an input file should be skipped.
+
+        Args:
+            input_file: The input file to check.
+
+        Returns:
+            str: The reason to skip the file, one of REASONS, or None if it
+                should be parsed.
+        """
+        if self.max_file_size is not None and _get_signature_source_size(
+                input_file) > self.max_file_size:
+            return TOO_LARGE
+        if self.max_defs is None and not self.skip_generated:
+            return None
+
+        source = input_file.read_signature_source()
+        if self.skip_generated and is_generated(source):
+            return GENERATED
+        if self.max_defs is not None \
+                and _count_defs(source, self.max_defs + 1) > self.max_defs:
+            return TOO_MANY_DEFS
+        return None
+
+    def __repr__(self) -> str:
+        return f"InputGuards({self.max_file_size}, {self.max_defs}, " \
+            f"{self.skip_generated})"
+
+
+def skip_guarded_files(input_set: load.PyTestGenInputSet,
+                       guards: InputGuards,
+                       report: parse.PyTestGenParseReport = None
+                       ) -> load.PyTestGenInputSet:
+    """Remove the files of an input set that a guard says to skip, so they
+    aren't parsed.
+
+    Args:
+        input_set: The input set to remove files from.
+        guards: The guards to check files against.
+        report: If given, the number of files skipped for each reason is added
+            to it, and the error of each file that couldn't be read.
+
+    Returns:
+        PyTestGenInputSet: The input set.
+    """
+    input_files = []
+    for input_file in input_set.input_files:
+        try:
+            reason = guards.check(input_file)
+        except OSError as err:
+            # i.e. a dangling symlink, it can't be parsed either
+            message = f"{type(err).__name__}: {err}"
+            logging.warning("Could not read '%s': %s", input_file.full_path,
+                            message)
+            if report is not None:
+                report.failures[input_file.full_path] = message
+            if observe.OBSERVERS:
+                observe.notify(observe.FILE_SKIPPED, input_file, "read_error")
+            continue
+        if reason is None:
+            input_files.append(input_file)
+            continue
+
+        logging.info("Skipping '%s' without parsing it (%s)",
+                     input_file.full_path, reason)
+        if report is not None:
+            report.skipped[reason] = report.skipped.get(reason, 0) + 1
+        if observe.OBSERVERS:
+            observe.notify(observe.FILE_SKIPPED, input_file, reason)
+    input_set.input_files = input_files
+    return input_set
+
+
+def is_generated(source: bytes) -> bool:
+    """Check whether source code has a comment near the top saying it was
+    generated.
+
+    Args:
+        source: The source code.
+
+    Returns:
+        bool: Whether the source code was generated.
+    """
+    header = source.split(b"\n", GENERATED_HEADER_LINES)
+    for line in header[:GENERATED_HEADER_LINES]:
+        line = line.strip()
+        # mypy-protobuf stubs start their docstring with '@generated' instead
+        if (line.startswith(b"#") or line.startswith(b"@")) \
+                and GENERATED_PATTERN.search(line):
+            return True
+    return False
+
+
+def _count_defs(source: bytes, limit: int) -> int:
+    """Count the lines of source code that look like function definitions,
+    stopping at 'limit'."""
+    count = 0
+    for _ in DEF_PATTERN.finditer(source):
+        count += 1
+        if count >= limit:
+            break
+    return count
+
+
+def _get_signature_source_size(input_file: load.PyTestGenInputFile) -> int:
+    """Get the size of the source code of an input file that would be parsed,
+    without reading it."""
+    if input_file.stub_path is None:
+        return input_file.get_source_size()
+    return path.getsize(input_file.stub_path)
@@ -0,0 +1,92 @@
+"""importtime.py
+
+Used for measuring how long modules take to import, so the imports of slow
+modules can be kept out of test collection.
+
+Author:
+    Figglewatts <me@figglewatts.co.uk>
+"""
+import logging
+import subprocess
+import sys
+import threading
+
+DEFAULT_TIMEOUT = 30.0
+"""The default number of seconds to wait for a module to import."""
+
+# run in a fresh interpreter, so modules imported by pytestgen (or by modules
+# measured before) don't make the import look faster than it is
+MEASURE_SOURCE = """import importlib, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print(time.perf_counter() - start)"""
+
+
+def measure_import_time(module_name: str,
+                        cwd: str = None,
+                        timeout: float = DEFAULT_TIMEOUT) -> float:
+    """Measure how long it takes to import a module in an isolated subprocess.
+
+    Args:
+        module_name: The dotted name of the module to import.
+        cwd: The directory to import the module from. Defaults to the current
+            working directory.
+        timeout: The number of seconds to wait for the import.
+
+    Returns:
+        float: The number of seconds the import took. If it timed out this is
+            'timeout', and if the module couldn't be imported it's None.
+    """
+    try:
+        result = subprocess.run(
+            [sys.executable, "-c", MEASURE_SOURCE, module_name],
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            timeout=timeout)
+    except subprocess.TimeoutExpired:
+        logging.warning(f"Importing module '{module_name}' took longer than "
+                        f"{timeout}s")
+        return timeout
+
+    if result.returncode != 0:
+        logging.warning(f"Could not import module '{module_name}' to measure "
+                        f"its import time")
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+class ImportTimes:
+    """Remembers the import time of each module once it's been measured, so a
+    module is only imported once however many times it's asked about. Safe to
+    use from several threads at once.
+
+    Attributes:
+        cwd (str): The directory to import modules from. Defaults to the
+            current working directory.
+        timeout (float): The number of seconds to wait for each import.
+    """
+    def __init__(self, cwd: str = None,
+                 timeout: float = DEFAULT_TIMEOUT) -> None:
+        self.cwd = cwd
+        self.timeout = timeout
+        self._import_times = {}
+        self._module_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, module_name: str) -> float:
+        """Get the import time of a module, measuring it if it hasn't been
+        already. See measure_import_time()."""
+        with self._lock:
+            module_lock = self._module_locks.setdefault(module_name,
+                                                        threading.Lock())
+        # other modules can be measured while this one is
+        with module_lock:
+            if module_name not in self._import_times:
+                self._import_times[module_name] = measure_import_time(
+                    module_name, self.cwd, self.timeout)
+            return self._import_times[module_name]
+
+    def __repr__(self) -> str:
+        return f"ImportTimes({self.cwd.__repr__()}, {self.timeout})"
@@ -0,0 +1,268 @@
+"""index.py
+
+A project-wide index of the classes in each module, used for finding the
+__init__() a class inherits from its base classes, even across modules.
+
+Author:
+    Figglewatts <me@figglewatts.co.uk>
+"""
+import ast
+import logging
+from os import path
+from typing import Dict, List, Tuple
+
+MAX_IMPORT_DEPTH = 16
+"""How many re-exports to follow when resolving an imported name."""
+
+SOURCE_DIRS = ["src"]
+"""The dirs a project can keep its packages in instead of its root dir, i.e.
+'src/pkg/mod.py', which is imported as 'pkg.mod'."""
+
+
+class ModuleSymbols:
+    """The classes defined in a module, and the names it imports.
+
+    Attributes:
+        module_name (str): The dotted name of the module.
+        classes (Dict[str, ast.ClassDef]): The classes defined at the top level
+            of the module, by name.
+        imported_names (Dict[str, str]): The names imported from other modules
+            by 'from x import y', i.e. 'y' -> 'x.y'.
+        imported_modules (Dict[str, str]): The modules imported by 'import x',
+            by the name they're bound to.
+        is_package (bool): Whether the module is a package's __init__.py.
+    """
+    def __init__(self,
+                 module_name: str,
+                 syntax_tree: ast.Module,
+                 is_package: bool = False) -> None:
+        self.module_name = module_name
+        self.is_package = is_package
+        self.classes = {}
+        self.imported_names = {}
+        self.imported_modules = {}
+        # the nodes the symbols came from, to get the symbols of a copy
+        self._nodes = []
+        for node in ast.iter_child_nodes(syntax_tree):
+            if isinstance(node, (ast.ClassDef, ast.Import, ast.ImportFrom)):
+                self._nodes.append(node)
+            if isinstance(node, ast.ClassDef):
+                self.classes[node.name] = node
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname is not None:
+                        self.imported_modules[alias.asname] = alias.name
+                    else:
+                        self.imported_modules[alias.name] = alias.name
+            elif isinstance(node, ast.ImportFrom):
+                from_module = self._get_from_module(node)
+                for alias in node.names:
+                    self.imported_names[alias.asname or alias.name] = \
+                        f"{from_module}.{alias.name}"
+
+    @staticmethod
+    def from_module(module_name: str,
+                    syntax_tree: ast.Module) -> "ModuleSymbols":
+        """Get the symbols of a module that was parsed with the given name,
+        i.e. 'pkg.__init__' for a package."""
+        return ModuleSymbols(module_name, syntax_tree,
+                             module_name.endswith(".__init__"))
+
+    def for_module(self, module_name: str) -> "ModuleSymbols":
+        """Get the symbols of another module with the same source, i.e. a
+        vendored copy of this one, without parsing it. Relative imports are
+        relative to the other module."""
+        return ModuleSymbols.from_module(module_name,
+                                         ast.Module(body=self._nodes,
+                                                    type_ignores=[]))
+
+    def _get_from_module(self, node: ast.ImportFrom) -> str:
+        """Get the absolute name of the module of a 'from x import y'."""
+        if node.level == 0:
+            return node.module
+        # relative imports are relative to the package this module is in
+        package = self.module_name.split(".")
+        if not self.is_package or package[-1] == "__init__":
+            package = package[:-1]
+        package = package[:len(package) - (node.level - 1)]
+        if node.module is not None:
+            package.append(node.module)
+        return ".".join(package)
+
+    def __repr__(self) -> str:
+        return f"ModuleSymbols(\"{self.module_name}\", " \
+            f"{list(self.classes.keys())})"
+
+
+class SymbolIndex:
+    """An index of the modules of a project, built once per run. Modules are
+    either added as they're parsed, or read from the project dir the first time
+    they're needed, so no file is parsed twice. The __init__() of each class is
+    cached once it has been resolved, so looking it up again is O(1). Classes
+    without one are only cached until a module that couldn't be found is
+    added, as the __init__() might be in it.
+
+    Attributes:
+        root_dir (str): The dir modules are imported relative to.
+    """
+    def __init__(self, root_dir: str = ".") -> None:
+        self.root_dir = root_dir
+        self._modules: Dict[str, ModuleSymbols] = {}
+        self._inits: Dict[Tuple[str, str], ast.FunctionDef] = {}
+        # class -> the generation its __init__() couldn't be found in
+        self._missing_inits: Dict[Tuple[str, str], int] = {}
+        # incremented when a module that couldn't be found is added
+        self._generation = 0
+
+    def add_module(self, module_name: str, syntax_tree: ast.Module) -> None:
+        """Add a module that has already been parsed to the index."""
+        self.add_module_symbols(
+            ModuleSymbols.from_module(module_name, syntax_tree))
+
+    def add_module_symbols(self, module: ModuleSymbols) -> None:
+        """Add the symbols of a module that has already been parsed to the
+        index, i.e. by another process."""
+        module_names = [module.module_name]
+        if module.is_package and module.module_name.endswith(".__init__"):
+            # other modules import the package by its own name
+            module_names.append(module.module_name[:-len(".__init__")])
+        for module_name in list(module_names):
+            source_dir, _, imported_name = module_name.partition(".")
+            if source_dir in SOURCE_DIRS and imported_name != "" \
+                    and self._modules.get(imported_name) is None:
+                # and modules in 'src/' by their name without it
+                module_names.append(imported_name)
+        for module_name in module_names:
+            if module_name in self._modules \
+                    and self._modules[module_name] is None:
+                self._generation += 1
+            self._modules[module_name] = module
+
+    def get_module(self, module_name: str) -> ModuleSymbols:
+        """Get the symbols of a module, reading it from the project dir if it
+        isn't in the index yet. Returns None if the module couldn't be found,
+        i.e. it's from the standard library or another package."""
+        if module_name not in self._modules:
+            self._modules[module_name] = self._read_module(module_name)
+        return self._modules[module_name]
+
+    def get_init(self, module_name: str,
+                 class_name: str) -> ast.FunctionDef:
+        """Get the __init__() of a class, either its own or the first one found
+        in its base classes, depth first from left to right.
+
+        Args:
+            module_name: The module the class is defined in.
+            class_name: The name of the class.
+
+        Returns:
+            ast.FunctionDef: The function def of the __init__(), or None if
+                neither the class nor any base class in the project had one.
+        """
+        key = (module_name, class_name)
+        if key in self._inits:
+            return self._inits[key]
+        if self._missing_inits.get(key) == self._generation:
+            return None
+        # mark the class as in progress, so an inheritance cycle stops
+        self._missing_inits[key] = self._generation
+        init_function_def = self._resolve_init(module_name, class_name)
+        if init_function_def is not None:
+            self._inits[key] = init_function_def
+            del self._missing_inits[key]
+        return init_function_def
+
+    def _resolve_init(self, module_name: str,
+                      class_name: str) -> ast.FunctionDef:
+        module = self.get_module(module_name)
+        if module is None or class_name not in module.classes:
+            return None
+
+        class_def = module.classes[class_name]
+        for node in class_def.body:
+            if isinstance(node, ast.FunctionDef) and node.name == "__init__":
+                return node
+
+        for base in class_def.bases:
+            base_class = self._resolve_base(module, base)
+            if base_class is None:
+                continue
+            init_function_def = self.get_init(*base_class)
+            if init_function_def is not None:
+                return init_function_def
+        return None
+
+    def _resolve_base(self, module: ModuleSymbols,
+                      base: ast.expr) -> Tuple[str, str]:
+        """Get the module and name of the class a base class expression refers
+        to, or None if it isn't a class in the project."""
+        dotted_name = get_dotted_name(base)
+        if dotted_name is None:
+            return None
+
+        if len(dotted_name) == 1:
+            return self._resolve_name(module.module_name, dotted_name[0])
+
+        # i.e. 'pkg.mod.Base' after 'import pkg.mod', or 'mod.Base' after
+        # 'from pkg import mod'
+        for i in range(len(dotted_name) - 1, 0, -1):
+            prefix = ".".join(dotted_name[:i])
+            imported_module = module.imported_modules.get(
+                prefix, module.imported_names.get(prefix))
+            if imported_module is not None:
+                return self._resolve_name(
+                    ".".join([imported_module] + dotted_name[i:-1]),
+                    dotted_name[-1])
+        return None
+
+    def _resolve_name(self, module_name: str, name: str,
+                      depth: int = 0) -> Tuple[str, str]:
+        """Find where a class accessible as 'name' in a module is defined,
+        following imports (and re-exports in packages)."""
+        module = self.get_module(module_name)
+        if module is None or depth > MAX_IMPORT_DEPTH:
+            return None
+        if name in module.classes:
+            return (module_name, name)
+        if name in module.imported_names:
+            imported_module, _, imported_name = \
+                module.imported_names[name].rpartition(".")
+            return self._resolve_name(imported_module, imported_name,
+                                      depth + 1)
+        return None
+
+    def _read_module(self, module_name: str) -> ModuleSymbols:
+        """Read and parse a module from the project dir, or from one of its
+        SOURCE_DIRS."""
+        file_paths = []
+        for source_dir in [""] + SOURCE_DIRS:
+            module_path = path.join(self.root_dir, source_dir,
+                                    *module_name.split("."))
+            file_paths += [(module_path + ".py", False),
+                           (path.join(module_path, "__init__.py"), True)]
+        for file_path, is_package in file_paths:
+            if not path.isfile(file_path):
+                continue
+            try:
+                with open(file_path, "rb") as src_file:
+                    syntax_tree = ast.parse(src_file.read())
+            except (SyntaxError, ValueError) as err:
+                logging.warning(f"Could not index module '{module_name}': "
+                                f"{err}")
+                return None
+            return ModuleSymbols(module_name, syntax_tree, is_package)
+        return None
+
+    def __repr__(self) -> str:
+        return f"SymbolIndex(\"{self.root_dir}\")"
+
+
+def get_dotted_name(node: ast.expr) -> List[str]:
+    """Get the parts of a dotted name like 'a.b.C', or None if 'node' isn't
+    one, i.e. 'Generic[T]'."""
+    if isinstance(node, ast.Name):
+        return [node.id]
+    if isinstance(node, ast.Attribute):
+        value = get_dotted_name(node.value)
+        return None if value is None else value + [node.attr]
+    return None
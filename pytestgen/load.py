@@ -6,11 +6,32 @@ Author:
     Figglewatts <me@figglewatts.co.uk>
 """
 from importlib.machinery import FileFinder
+import glob
 import logging
 import os
 from os import path
 import pkgutil
-from typing import List
+import posixpath
+import sys
+import tarfile
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Set, TextIO
+import weakref
+import zipfile
+
+from pytestgen import observe
+
+PATH_LIST_CHUNK_SIZE = 64 * 1024
+"""How many characters to read at a time from a path list."""
+
+FILE_BATCH_SIZE = 1000
+"""How many paths to single files from_paths() loads into one input set."""
+
+ARCHIVE_EXTENSIONS = [".whl", ".zip", ".tar.gz", ".tgz"]
+"""Extensions of archives we can load python files from."""
+
+WHEEL_DATA_DIRS = ["purelib", "platlib"]
+"""Directories in a wheel's .data directory that contain importable code."""
 
 
 class PyTestGenInputFile:
@@ -20,18 +41,56 @@ class PyTestGenInputFile:
         name (str): The filename of the source file.
         path (str): The directory (relative to project dir) of the source file.
         full_path (str): The full path to the input file.
+        stub_path (str): The path to a .pyi stub to read signatures from instead
+            of the source file. Will be None if there isn't one.
     """
     def __init__(self, name: str, file_path: str) -> None:
         self.name = name
         self.path = file_path
         self.full_path = path.join(file_path, name)
+        self.stub_path = None
+
+    def read_source(self) -> bytes:
+        """Read the source code of this file."""
+        with open(self.full_path, "rb") as src_file:
+            return src_file.read()
+
+    def read_signature_source(self) -> bytes:
+        """Read the source code to get function signatures from. This is the
+        .pyi stub if the file has one, and the source code otherwise."""
+        if self.stub_path is None:
+            return self.read_source()
+        with open(self.stub_path, "rb") as stub_file:
+            return stub_file.read()
+
+    def get_source_size(self) -> int:
+        """Get the size of the source code of this file in bytes."""
+        return path.getsize(self.full_path)
 
     def get_module(self) -> str:
         return self.full_path.replace(os.sep, ".")[:-3]
 
-    def get_test_file_path(self, output_dir: str) -> str:
-        return path.join(output_dir, self.path,
-                         f"test_{self.name[:-3].strip('_')}.py")
+    def get_test_file_path(self, output_dir: str, shard: str = None) -> str:
+        """Get the path of the test file for this file. If 'shard' is given,
+        this is the path of one of the files its tests are split across, i.e.
+        'test_module__shard.py'."""
+        test_name = f"test_{self.name[:-3].strip('_')}"
+        if shard is not None:
+            test_name += f"__{shard}"
+        return path.join(output_dir, self.path, f"{test_name}.py")
+
+    def get_test_file_shard_pattern(self, output_dir: str) -> str:
+        """Get a glob pattern matching all the files this file's tests are split
+        across, excluding the unsplit test file."""
+        test_name = f"test_{self.name[:-3].strip('_')}"
+        return path.join(glob.escape(path.join(output_dir, self.path)),
+                         f"{glob.escape(test_name)}__*.py")
+
+    def get_test_file_shard(self, test_file_path: str) -> str:
+        """Get the shard of a test file matching get_test_file_shard_pattern(),
+        i.e. 'myclass' for 'test_module__myclass.py'."""
+        test_name = f"test_{self.name[:-3].strip('_')}__"
+        return path.basename(test_file_path)[len(test_name):-3]
 
     def has_test_file(self, output_dir: str) -> bool:
         return path.exists(self.get_test_file_path(output_dir))
@@ -47,6 +106,145 @@ class PyTestGenInputFile:
         return f"PyTestGenInputFile(\"{self.name}\", \"{self.path}\")"
 
 
+class ArchiveReader:
+    """Reads the files of an archive for the input files loaded from it. The
+    archive is kept open between reads, so reading every file only reads its
+    index once.
+
+    Tar archives are compressed as a whole, so they're read as a stream: files
+    read in archive order (as they are when parsing) are read in a single pass,
+    and only reading an earlier file than the last one starts the stream
+    again.
+
+    Readers can be pickled to send input files to worker processes. Each
+    worker keeps the reader of the last archive it read from, see
+    _get_archive_reader().
+
+    Attributes:
+        archive_path (str): The path to the archive to read.
+    """
+    def __init__(self, archive_path: str) -> None:
+        self.archive_path = archive_path
+        self._lock = threading.Lock()
+        self._archive = None
+        # the names of the members the tar stream has already passed
+        self._passed = set()
+        # the last member read, as a file is often read again straight away
+        self._last_read = (None, None)
+
+    def read(self, member_name: str) -> bytes:
+        """Read the contents of a file in the archive.
+
+        Raises:
+            KeyError: If the archive doesn't have the file.
+        """
+        with self._lock:
+            if self.archive_path.endswith((".whl", ".zip")):
+                if self._archive is None:
+                    self._open(zipfile.ZipFile(self.archive_path))
+                return self._archive.read(member_name)
+            return self._read_tar_member(member_name)
+
+    def _read_tar_member(self, member_name: str) -> bytes:
+        if self._last_read[0] == member_name:
+            return self._last_read[1]
+        if self._archive is None or member_name in self._passed:
+            self.close()
+            self._open(tarfile.open(self.archive_path, mode="r|*"))
+        while True:
+            member = self._archive.next()
+            if member is None:
+                raise KeyError(f"There is no file '{member_name}' in "
+                               f"archive '{self.archive_path}'")
+            self._passed.add(member.name)
+            if member.name == member_name:
+                source = self._archive.extractfile(member).read()
+                self._last_read = (member_name, source)
+                return source
+
+    def _open(self, archive: Any) -> None:
+        self._archive = archive
+        # closed when the reader is garbage collected, or at exit
+        self._close_archive = weakref.finalize(self, archive.close)
+
+    def close(self) -> None:
+        """Close the archive, if it's open."""
+        if self._archive is not None:
+            self._close_archive()
+        self._archive = None
+        self._passed = set()
+        self._last_read = (None, None)
+
+    def __reduce__(self) -> tuple:
+        return _get_archive_reader, (self.archive_path, )
+
+    def __repr__(self) -> str:
+        return f"ArchiveReader(\"{self.archive_path}\")"
+
+
+_archive_reader = None
+"""The reader of the last archive unpickled in this process."""
+
+_archive_reader_lock = threading.Lock()
+
+
+def _get_archive_reader(archive_path: str) -> ArchiveReader:
+    """Get the reader of an archive when unpickling one, so a worker process
+    sent many files of the same archive keeps it open between them."""
+    global _archive_reader
+    with _archive_reader_lock:
+        if _archive_reader is None \
+                or _archive_reader.archive_path != archive_path:
+            _archive_reader = ArchiveReader(archive_path)
+        return _archive_reader
+
+
+class PyTestGenArchiveInputFile(PyTestGenInputFile):
+    """An input source file inside an archive. Its source code is only read
+    from the archive when it's needed.
+
+    Attributes:
+        name (str): The filename of the source file.
+        path (str): The directory of the source file, relative to the root
+            package directory in the archive.
+        full_path (str): The path to the file, relative to the root package
+            directory in the archive.
+        archive_path (str): The path to the archive the file came from.
+        member_name (str): The name of the file in the archive.
+        source_size (int): The size of the source code in bytes.
+        reader (ArchiveReader): The reader to read the source code with, shared
+            by the files of the same archive.
+    """
+    def __init__(self,
+                 name: str,
+                 file_path: str,
+                 archive_path: str,
+                 member_name: str,
+                 source_size: int,
+                 reader: ArchiveReader = None) -> None:
+        super().__init__(name, file_path)
+        self.archive_path = archive_path
+        self.member_name = member_name
+        self.source_size = source_size
+        self.reader = ArchiveReader(archive_path) if reader is None else reader
+
+    def read_source(self) -> bytes:
+        return self.reader.read(self.member_name)
+
+    def get_source_size(self) -> int:
+        return self.source_size
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PyTestGenArchiveInputFile):
+            return super().__eq__(other) and \
+                self.archive_path == other.archive_path
+        return False
+
+    def __repr__(self) -> str:
+        return f"PyTestGenArchiveInputFile(\"{self.name}\", \"{self.path}\", " \
+            f"\"{self.archive_path}\")"
+
+
 class PyTestGenInputSet:
     """A set of input files for generating tests from.
 
@@ -107,6 +305,327 @@ def filename(file: str, output_dir: str) -> PyTestGenInputSet:
     return PyTestGenInputSet(output_dir, input_files)
 
 
+def archive(archive_path: str, output_dir: str) -> PyTestGenInputSet:
+    """Create an input set from the python files in a wheel, sdist or zip
+    archive. Files are read straight from the archive without extracting it.
+
+    Module paths are relative to the root package directory in the archive. For
+    sdists and zips this skips a top-level 'name-version/' directory and a
+    'src/' directory, and for wheels this skips '.data/purelib/' directories.
+    Files of sdists and zips that aren't in a package or 'src/' directory, i.e.
+    'tests/' or 'docs/', are skipped. Files are only read when they're needed,
+    see ArchiveReader.
+
+    Args:
+        archive_path (str): The path to the archive to use.
+        output_dir (str): The path to output tests to.
+
+    Returns:
+        PyTestGenInputSet: An input set containing the archive's python files.
+
+    Raises:
+        ValueError: If 'archive_path' was not an archive we could load.
+    """
+    if not is_archive(archive_path):
+        raise ValueError(f"File '{archive_path}' should have one of "
+                         f"extensions {ARCHIVE_EXTENSIONS}")
+
+    # wheels are always laid out relative to site-packages
+    is_wheel = archive_path.endswith(".whl")
+    member_sizes = _read_archive_python_file_sizes(archive_path)
+    member_names = list(member_sizes)
+    root_dir = "" if is_wheel else _get_archive_root_dir(member_names)
+    packages = _get_archive_packages(member_names, root_dir)
+
+    module_paths = {}
+    for member_name in member_names:
+        if not is_wheel and not _is_archive_package_member(
+                member_name, root_dir, packages):
+            continue
+        module_path = _get_archive_module_path(member_name, root_dir)
+        if module_path is not None:
+            module_paths[member_name] = module_path
+
+    reader = ArchiveReader(archive_path)
+    input_files = []
+    for member_name, module_path in module_paths.items():
+        file_path, file_name = posixpath.split(module_path)
+        input_files.append(
+            PyTestGenArchiveInputFile(file_name,
+                                      file_path.replace("/", os.sep),
+                                      archive_path, member_name,
+                                      member_sizes[member_name], reader))
+    return PyTestGenInputSet(output_dir, input_files)
+
+
+def is_archive(file: str) -> bool:
+    """Check whether a file is an archive we can load python files from."""
+    return any(file.endswith(ext) for ext in ARCHIVE_EXTENSIONS)
+
+
+def from_path(path_element: str, output_dir: str) -> PyTestGenInputSet:
+    """Create an input set from a path to either a directory, an archive or a
+    file.
+
+    Args:
+        path_element (str): The path to the directory or file to use.
+        output_dir (str): The path to output tests to.
+
+    Returns:
+        PyTestGenInputSet: An input set containing the file(s).
+
+    Raises:
+        ValueError: If 'path_element' was a file without .py extension.
+    """
+    if path.isdir(path_element):
+        input_set = directory(path_element, output_dir)
+    elif is_archive(path_element):
+        input_set = archive(path_element, output_dir)
+    else:
+        input_set = filename(path_element, output_dir)
+
+    if observe.OBSERVERS:
+        for input_file in input_set.input_files:
+            observe.notify(observe.FILE_DISCOVERED, input_file)
+    return input_set
+
+
+def from_paths(paths: Iterable[str],
+               output_dir: str,
+               batch_size: int = FILE_BATCH_SIZE) -> Iterator[PyTestGenInputSet]:
+    """Create input sets from paths, as from_path() does for each. Consecutive
+    paths to single files are batched into one input set of up to 'batch_size'
+    files, so a long list of files (i.e. from expand_paths()) is parsed in
+    large input sets instead of one input set per file.
+
+    Args:
+        paths (Iterable[str]): The paths to the directories, archives or files
+            to use. Read as they're needed.
+        output_dir (str): The path to output tests to.
+        batch_size (int): The maximum number of files to batch together.
+
+    Returns:
+        Iterator[PyTestGenInputSet]: The input sets, in the order of 'paths'.
+
+    Raises:
+        ValueError: If one of 'paths' was a file without .py extension, or
+            'batch_size' wasn't positive.
+    """
+    if batch_size < 1:
+        raise ValueError(f"Batch size must be at least 1, was {batch_size}")
+    batch = []
+    for path_element in paths:
+        input_set = from_path(path_element, output_dir)
+        if path.isdir(path_element) or is_archive(path_element):
+            if len(batch) > 0:
+                yield PyTestGenInputSet(output_dir, batch)
+                batch = []
+            yield input_set
+            continue
+
+        batch += input_set.input_files
+        if len(batch) >= batch_size:
+            yield PyTestGenInputSet(output_dir, batch)
+            batch = []
+    if len(batch) > 0:
+        yield PyTestGenInputSet(output_dir, batch)
+
+
+def expand_paths(paths: Iterable[str],
+                 stdin: TextIO = None) -> Iterator[str]:
+    """Expand path arguments, reading path lists where they were given.
+
+    A path of '-' reads a list of paths from stdin, and a path of '@file' reads
+    a list of paths from 'file'. Path lists are separated by newlines, or by
+    NUL characters if the list contains any (i.e. 'find -print0'). Lists are
+    read as a stream, so paths are yielded as soon as they are read.
+
+    Args:
+        paths (Iterable[str]): The path arguments to expand.
+        stdin (TextIO): The stream to read '-' from. Defaults to sys.stdin.
+
+    Returns:
+        Iterator[str]: The expanded paths.
+    """
+    for path_element in paths:
+        if path_element == "-":
+            yield from _read_path_list(sys.stdin if stdin is None else stdin)
+        elif path_element.startswith("@") and len(path_element) > 1:
+            with open(path_element[1:], "r", encoding="utf-8") as path_list:
+                yield from _read_path_list(path_list)
+        else:
+            yield path_element
+
+
+def _read_path_list(stream: TextIO) -> Iterator[str]:
+    """Read a newline or NUL separated list of paths from a stream.
+
+    Args:
+        stream (TextIO): The stream to read from.
+
+    Returns:
+        Iterator[str]: The paths in the list, skipping empty entries.
+    """
+    separator = None
+    buffer = ""
+    while True:
+        chunk = stream.read(PATH_LIST_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+
+        # decide on the separator the first time we see one
+        if separator is None:
+            if "\0" in buffer:
+                separator = "\0"
+            elif "\n" in buffer:
+                separator = "\n"
+            else:
+                continue
+
+        *complete, buffer = buffer.split(separator)
+        yield from _clean_path_list_entries(complete, separator)
+    yield from _clean_path_list_entries([buffer], separator)
+
+
+def _clean_path_list_entries(entries: List[str],
+                             separator: str) -> Iterator[str]:
+    """Strip line endings from path list entries and drop empty ones."""
+    for entry in entries:
+        if separator != "\0":
+            entry = entry.rstrip("\r\n")
+        if entry:
+            yield entry
+
+
+def use_stubs(input_set: PyTestGenInputSet,
+              stubs_dir: str = None) -> PyTestGenInputSet:
+    """Make the files in an input set read their function signatures from .pyi
+    stubs where they exist. Files without a stub still use their source.
+
+    Args:
+        input_set (PyTestGenInputSet): The input set to find stubs for.
+        stubs_dir (str): A directory of stubs mirroring the input file paths,
+            i.e. 'stubs/pkg/mod.pyi' for 'pkg/mod.py'. If None, stubs are looked
+            for next to each input file.
+
+    Returns:
+        PyTestGenInputSet: The input set.
+    """
+    for input_file in input_set.input_files:
+        # files read from archives don't have stubs on disk
+        if isinstance(input_file, PyTestGenArchiveInputFile):
+            continue
+        stub_dir = input_file.path if stubs_dir is None \
+            else path.join(stubs_dir, input_file.path)
+        stub_path = path.join(stub_dir, input_file.name[:-3] + ".pyi")
+        if path.isfile(stub_path):
+            input_file.stub_path = stub_path
+    return input_set
+
+
+def _read_archive_python_file_sizes(archive_path: str) -> Dict[str, int]:
+    """Get the names and sizes of the python files in an archive in a single
+    pass, without reading them.
+
+    Args:
+        archive_path (str): The path to the archive to read.
+
+    Returns:
+        Dict[str, int]: The size of each file by name, in archive order.
+    """
+    if archive_path.endswith((".whl", ".zip")):
+        with zipfile.ZipFile(archive_path) as zip_archive:
+            return {
+                member.filename: member.file_size
+                for member in zip_archive.infolist()
+                if not member.is_dir() and member.filename.endswith(".py")
+            }
+    with tarfile.open(archive_path, mode="r|*") as tar_archive:
+        return {
+            member.name: member.size
+            for member in tar_archive
+            if member.isfile() and member.name.endswith(".py")
+        }
+
+
+def _get_archive_root_dir(member_names: List[str]) -> str:
+    """Get the top-level directory all of an archive's files are in, if it
+    isn't a package itself (i.e. the 'name-version/' directory of an sdist).
+
+    Args:
+        member_names (List[str]): The names of the python files in the archive.
+
+    Returns:
+        str: The root directory, or an empty string if there wasn't one.
+    """
+    top_level_dirs = set(name.split("/", 1)[0] for name in member_names)
+    if len(top_level_dirs) != 1 or any("/" not in n for n in member_names):
+        return ""
+    root_dir = top_level_dirs.pop()
+    if f"{root_dir}/__init__.py" in member_names:
+        return ""
+    return root_dir
+
+
+def _get_archive_packages(member_names: List[str], root_dir: str) -> Set[str]:
+    """Get the top-level directories of an archive (under its root directory)
+    that are packages, i.e. have an __init__.py."""
+    prefix = f"{root_dir}/" if root_dir else ""
+    packages = set()
+    for member_name in member_names:
+        parts = member_name[len(prefix):].split("/")
+        if len(parts) == 2 and parts[1] == "__init__.py":
+            packages.add(parts[0])
+    return packages
+
+
+def _is_archive_package_member(member_name: str, root_dir: str,
+                               packages: Set[str]) -> bool:
+    """Check whether a file in an sdist or zip archive is part of an importable
+    package, so it isn't in a directory of tests, docs or examples.
+
+    Args:
+        member_name (str): The name of the file in the archive.
+        root_dir (str): The top-level directory of the archive.
+        packages (Set[str]): The top-level directories that are packages.
+
+    Returns:
+        bool: Whether the file is a top-level module, in a package or in a
+            'src/' directory, which only has importable code in it.
+    """
+    parts = member_name.split("/")
+    if root_dir:
+        parts = parts[1:]
+    return len(parts) == 1 or parts[0] == "src" or parts[0] in packages
+
+
+def _get_archive_module_path(member_name: str, root_dir: str) -> str:
+    """Get the path of a file in an archive relative to its root package
+    directory.
+
+    Args:
+        member_name (str): The name of the file in the archive.
+        root_dir (str): The top-level directory of the archive.
+
+    Returns:
+        str: The path relative to the root package directory, or None if the
+            file isn't part of an importable package (i.e. wheel metadata).
+    """
+    parts = member_name.split("/")
+    if root_dir:
+        parts = parts[1:]
+    if parts[0].endswith(".dist-info"):
+        return None
+    if parts[0].endswith(".data"):
+        if len(parts) < 3 or parts[1] not in WHEEL_DATA_DIRS:
+            return None
+        parts = parts[2:]
+    if parts[0] == "src" and len(parts) > 1:
+        parts = parts[1:]
+    return "/".join(parts)
+
+
 def _get_python_files_from_dir(directory_path: str,
                                output_dir: str) -> List[PyTestGenInputFile]:
     """Get all the python files under a directory as input files.
@@ -0,0 +1,304 @@
+"""observe.py
+
+Observers get told about events as pytestgen generates tests, i.e. to count
+them, time them or show progress.
+
+Events are only built and sent when an observer is registered, so call sites
+check OBSERVERS before doing any work for an event:
+
+    if observe.OBSERVERS:
+        observe.notify(observe.FILE_PARSED, input_file, duration)
+
+Author:
+    Figglewatts <me@figglewatts.co.uk>
+"""
+import os
+from os import path
+import sys
+import threading
+import time
+from typing import Any, Dict, List, TextIO
+
+FILE_DISCOVERED = "file_discovered"
+"""A source file was found. Sent with the input file."""
+
+FILE_PARSED = "file_parsed"
+"""A source file was parsed. Sent with the input file and how long it took in
+seconds."""
+
+FILE_SKIPPED = "file_skipped"
+"""A source file won't have tests generated for it. Sent with the input file
+and the reason."""
+
+TEST_EMITTED = "test_emitted"
+"""A test was generated. Sent with the name of the test and its module."""
+
+FILE_WRITTEN = "file_written"
+"""A test file was written. Sent with its path and how long rendering and
+writing it took in seconds."""
+
+EVENTS = [
+    FILE_DISCOVERED, FILE_PARSED, FILE_SKIPPED, TEST_EMITTED, FILE_WRITTEN
+]
+"""All of the events observers can be told about."""
+
+METRIC_NAMES = {
+    FILE_DISCOVERED: "pytestgen_files_discovered_total",
+    FILE_PARSED: "pytestgen_files_parsed_total",
+    FILE_SKIPPED: "pytestgen_files_skipped_total",
+    TEST_EMITTED: "pytestgen_tests_emitted_total",
+    FILE_WRITTEN: "pytestgen_files_written_total"
+}
+"""The name of the Prometheus counter of each event."""
+
+DEFAULT_DURATION_BUCKETS = [
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0
+]
+"""The default upper bounds of the buckets of a duration histogram, in
+seconds."""
+
+
+class Observer:
+    """An Observer is told about events by having its 'on_<event>' method
+    called. All methods do nothing by default, so observers only need to
+    override the ones they're interested in.
+
+    Events can come from several threads at once.
+    """
+    def on_file_discovered(self, input_file) -> None:
+        pass
+
+    def on_file_parsed(self, input_file, duration: float) -> None:
+        pass
+
+    def on_file_skipped(self, input_file, reason: str) -> None:
+        pass
+
+    def on_test_emitted(self, test_name: str, module_path: str) -> None:
+        pass
+
+    def on_file_written(self, file_path: str, duration: float) -> None:
+        pass
+
+    def close(self) -> None:
+        """Called when there are no more events."""
+
+
+OBSERVERS: List[Observer] = []
+"""The registered observers. Empty unless something has been registered."""
+
+
+def register(observer: Observer) -> None:
+    """Register an observer, so it will be told about events."""
+    OBSERVERS.append(observer)
+
+
+def unregister(observer: Observer) -> None:
+    """Unregister an observer, and close it."""
+    OBSERVERS.remove(observer)
+    observer.close()
+
+
+def notify(event: str, *args: Any) -> None:
+    """Tell all registered observers about an event.
+
+    Args:
+        event: The event, one of EVENTS.
+        args: The arguments of the event.
+    """
+    for observer in OBSERVERS:
+        getattr(observer, f"on_{event}")(*args)
+
+
+class Histogram:
+    """A cumulative histogram of observed values, like a Prometheus
+    histogram.
+
+    Attributes:
+        buckets (List[float]): The upper bounds of the buckets.
+        counts (List[int]): The number of values observed in each bucket. The
+            last is the '+Inf' bucket of values bigger than every bound.
+        sum (float): The sum of all observed values.
+        count (int): The number of observed values.
+    """
+    def __init__(self, buckets: List[float] = None) -> None:
+        self.buckets = DEFAULT_DURATION_BUCKETS if buckets is None else buckets
+        self.counts = [0 for _ in range(len(self.buckets) + 1)]
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Add a value to the histogram."""
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> List[int]:
+        """Get the number of values less than or equal to each bucket's bound,
+        ending with the '+Inf' bucket."""
+        result = []
+        total = 0
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+    def __repr__(self) -> str:
+        return f"Histogram({self.buckets})"
+
+
+class MetricsObserver(Observer):
+    """Counts every event, and keeps histograms of how long parsing and writing
+    files takes.
+
+    Attributes:
+        counters (Dict[str, int]): The number of times each event happened.
+        skipped (Dict[str, int]): The number of files skipped for each reason.
+        parse_durations (Histogram): How long parsing files took.
+        write_durations (Histogram): How long writing test files took.
+    """
+    def __init__(self, buckets: List[float] = None) -> None:
+        self.counters: Dict[str, int] = {event: 0 for event in EVENTS}
+        self.skipped: Dict[str, int] = {}
+        self.parse_durations = Histogram(buckets)
+        self.write_durations = Histogram(buckets)
+        self._lock = threading.Lock()
+
+    def on_file_discovered(self, input_file) -> None:
+        with self._lock:
+            self.counters[FILE_DISCOVERED] += 1
+
+    def on_file_parsed(self, input_file, duration: float) -> None:
+        with self._lock:
+            self.counters[FILE_PARSED] += 1
+            self.parse_durations.observe(duration)
+
+    def on_file_skipped(self, input_file, reason: str) -> None:
+        with self._lock:
+            self.counters[FILE_SKIPPED] += 1
+            self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def on_test_emitted(self, test_name: str, module_path: str) -> None:
+        with self._lock:
+            self.counters[TEST_EMITTED] += 1
+
+    def on_file_written(self, file_path: str, duration: float) -> None:
+        with self._lock:
+            self.counters[FILE_WRITTEN] += 1
+            self.write_durations.observe(duration)
+
+    def __repr__(self) -> str:
+        return f"MetricsObserver({self.counters})"
+
+
+class PrometheusTextfileExporter(MetricsObserver):
+    """Collects metrics, and writes them in the Prometheus text format when
+    closed, i.e. for node_exporter's textfile collector. The file is written
+    atomically, so a half-written file is never collected.
+
+    Attributes:
+        file_path (str): The path of the file to write metrics to.
+    """
+    def __init__(self, file_path: str, buckets: List[float] = None) -> None:
+        super().__init__(buckets)
+        self.file_path = file_path
+
+    def close(self) -> None:
+        self.write()
+
+    def write(self) -> None:
+        """Write the current metrics to the file."""
+        dir_path = path.dirname(self.file_path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        temp_path = f"{self.file_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(format_prometheus(self))
+        os.replace(temp_path, self.file_path)
+
+    def __repr__(self) -> str:
+        return f"PrometheusTextfileExporter(\"{self.file_path}\")"
+
+
+def format_prometheus(metrics: MetricsObserver) -> str:
+    """Format collected metrics in the Prometheus text exposition format.
+
+    Args:
+        metrics: The metrics to format.
+
+    Returns:
+        str: The metrics, one sample per line.
+    """
+    lines = []
+    for event in EVENTS:
+        name = METRIC_NAMES[event]
+        lines.append(f"# TYPE {name} counter")
+        if event == FILE_SKIPPED:
+            for reason, count in sorted(metrics.skipped.items()):
+                lines.append(f"{name}{{reason=\"{reason}\"}} {count}")
+        else:
+            lines.append(f"{name} {metrics.counters[event]}")
+
+    for name, histogram in [
+        ("pytestgen_parse_duration_seconds", metrics.parse_durations),
+        ("pytestgen_write_duration_seconds", metrics.write_durations)
+    ]:
+        lines.append(f"# TYPE {name} histogram")
+        bounds = [str(bound) for bound in histogram.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, histogram.cumulative_counts()):
+            lines.append(f"{name}_bucket{{le=\"{bound}\"}} {count}")
+        lines.append(f"{name}_sum {histogram.sum}")
+        lines.append(f"{name}_count {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+class ProgressObserver(Observer):
+    """Shows a live count of parsed files and how many are parsed per second,
+    rewriting a single line of a stream.
+
+    Attributes:
+        stream (TextIO): The stream to show progress on.
+        interval (float): The minimum number of seconds between updates.
+    """
+    def __init__(self, stream: TextIO = None, interval: float = 0.2) -> None:
+        self.stream = sys.stderr if stream is None else stream
+        self.interval = interval
+        self._files = 0
+        self._tests = 0
+        self._start = time.perf_counter()
+        self._last_update = None
+        self._lock = threading.Lock()
+
+    def on_file_parsed(self, input_file, duration: float) -> None:
+        with self._lock:
+            self._files += 1
+            now = time.perf_counter()
+            if self._last_update is None \
+                    or now - self._last_update >= self.interval:
+                self._last_update = now
+                self._show(now)
+
+    def on_test_emitted(self, test_name: str, module_path: str) -> None:
+        with self._lock:
+            self._tests += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._show(time.perf_counter())
+            self.stream.write("\n")
+            self.stream.flush()
+
+    def _show(self, now: float) -> None:
+        elapsed = now - self._start
+        rate = self._files / elapsed if elapsed > 0 else 0.0
+        self.stream.write(f"\r{self._files} files, {self._tests} tests "
+                          f"({rate:.1f} files/s)")
+        self.stream.flush()
+
+    def __repr__(self) -> str:
+        return f"ProgressObserver({self.stream}, {self.interval})"
@@ -5,12 +5,18 @@ Used for getting/organising outputs for pytestgen.
 Author:
     Figglewatts <me@figglewatts.co.uk>
 """
-import os
+from concurrent.futures import ThreadPoolExecutor
+import logging
 from os import path
-from typing import List
+import threading
+import time
+from typing import Dict, List
+import weakref
 
+from pytestgen import observe
 from pytestgen import parse
 from pytestgen import load
+from pytestgen.sink import OutputSink, FileSystemSink
 
 from . import generator
 
@@ -20,26 +26,224 @@ UNTESTABLE_FUNCTIONS = ["__init__"]
 TEST_FILE_MODULES = ["pytest"]
 """List of modules we should import at the top of a generated test file."""
 
+CONFTEST_FILE = "conftest.py"
+"""The name of the file fixtures shared by every test file are output to."""
+
+CONFTEST_MODULES = ["asyncio", "pytest"]
+"""List of modules the fixtures in a generated conftest.py need imported."""
+
+_written_conftests = weakref.WeakKeyDictionary()
+"""The paths of the conftest.py files the event loop fixture has been written
+to, by sink. Archive sinks can't tell what has already been written to them,
+so without these a conftest.py would be written once per input set."""
+
+_written_conftests_lock = threading.Lock()
+
+
+class OutputTarget:
+    """Somewhere to output the tests of a parsed set to, and how.
+
+    Attributes:
+        output_dir (str): The path of the dir to output test files in.
+        include (List[str]): The list of function names to generate tests for.
+            If empty, all functions will be used.
+        renderer (Renderer): The renderer to render tests with. If None, Jinja
+            is used.
+        options (GeneratorOptions): The options to generate tests with. If
+            None, the options given to output_targets() are used.
+    """
+    def __init__(self,
+                 output_dir: str,
+                 include: List[str] = [],
+                 renderer: generator.Renderer = None,
+                 options: generator.GeneratorOptions = None) -> None:
+        self.output_dir = output_dir
+        self.include = include
+        self.renderer = renderer
+        self.options = options
+
+    def __repr__(self) -> str:
+        return f"OutputTarget(\"{self.output_dir}\", {self.include}, " \
+            f"{self.renderer.__repr__()}, {self.options.__repr__()})"
+
+
+class MissingTests:
+    """The tests of a source file that aren't in its existing test files.
+
+    Attributes:
+        input_file (PyTestGenInputFile): The source file.
+        test_file_path (str): The path of the source file's test file. If its
+            tests are split across several files, this is the unsplit one.
+        test_names (List[str]): The names of the missing tests.
+    """
+    def __init__(self, input_file: load.PyTestGenInputFile,
+                 test_file_path: str, test_names: List[str]) -> None:
+        self.input_file = input_file
+        self.test_file_path = test_file_path
+        self.test_names = test_names
+
+    def __repr__(self) -> str:
+        return f"MissingTests({self.input_file.__repr__()}, " \
+            f"\"{self.test_file_path}\", {self.test_names})"
+
 
 def output_tests(parsed_set: parse.PyTestGenParsedSet,
-                 include: List[str] = []) -> None:
+                 include: List[str] = [],
+                 sink: OutputSink = None,
+                 renderer: generator.Renderer = None,
+                 options: generator.GeneratorOptions = None,
+                 output_dir: str = None) -> None:
     """Output the parsed test files in a parsed set.
 
     Args:
         parsed_set: The set of parsed files to output.
         include: The list of function names to generate tests for. If empty,
             all functions will be used.
+        sink: The sink to write test files to. Defaults to the filesystem.
+        renderer: The renderer to render tests with. Defaults to Jinja.
+        options: The options to generate tests with.
+        output_dir: The path of the dir to output test files in. Defaults to
+            the output dir of the parsed set's input set.
+    """
+    sink = FileSystemSink() if sink is None else sink
+    output_dir = parsed_set.input_set.output_dir \
+        if output_dir is None else output_dir
+    if any([
+            testable_func.is_async()
+            for parsed_file in parsed_set.parsed_files
+            for testable_func in _get_funcs_to_output(parsed_file, include)
+    ]):
+        _output_event_loop_fixture(output_dir, sink, renderer)
+    for parsed_file in parsed_set.parsed_files:
+        _output_parsed_file(parsed_file, output_dir, include, sink, renderer,
+                            options)
+
+
+def output_targets(parsed_set: parse.PyTestGenParsedSet,
+                   targets: List[OutputTarget],
+                   sink: OutputSink = None,
+                   options: generator.GeneratorOptions = None) -> None:
+    """Output the parsed test files in a parsed set to several targets, so the
+    files only have to be loaded and parsed once. Targets are output
+    concurrently, each in its own thread. Rendering holds the GIL, so only
+    writing the test files of one target overlaps with rendering another's.
+
+    Args:
+        parsed_set: The set of parsed files to output.
+        targets: The targets to output to.
+        sink: The sink to write test files to. Defaults to the filesystem.
+        options: The options to generate tests with, for targets without their
+            own.
+    """
+    sink = FileSystemSink() if sink is None else sink
+    if len(targets) == 1:
+        _output_target(parsed_set, targets[0], sink, options)
+        return
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        futures = [
+            executor.submit(_output_target, parsed_set, target, sink, options)
+            for target in targets
+        ]
+        # raise the first error any of the targets had
+        for future in futures:
+            future.result()
+
+
+def check_targets(parsed_set: parse.PyTestGenParsedSet,
+                  targets: List[OutputTarget],
+                  sink: OutputSink = None,
+                  options: generator.GeneratorOptions = None,
+                  fail_fast: bool = False) -> List[MissingTests]:
+    """Find the tests that outputting a parsed set to some targets would
+    generate, without rendering or writing anything.
+
+    Args:
+        parsed_set: The set of parsed files to check.
+        targets: The targets to check.
+        sink: The sink to read existing test files from. Defaults to the
+            filesystem.
+        options: The options tests would be generated with, for targets
+            without their own.
+        fail_fast: Whether to stop at the first file with missing tests.
+
+    Returns:
+        List[MissingTests]: The missing tests of each file of each target that
+            had any.
     """
+    sink = FileSystemSink() if sink is None else sink
+    result = []
     for parsed_file in parsed_set.parsed_files:
-        _output_parsed_file(parsed_file, parsed_set.input_set.output_dir,
-                            include)
+        for target in targets:
+            test_names = find_missing_tests(
+                parsed_file, target.output_dir, target.include, sink,
+                options if target.options is None else target.options)
+            if len(test_names) == 0:
+                continue
+            result.append(
+                MissingTests(
+                    parsed_file.input_file,
+                    parsed_file.input_file.get_test_file_path(
+                        target.output_dir), test_names))
+            if fail_fast:
+                return result
+    return result
+
+
+def find_missing_tests(parsed_file: parse.PyTestGenParsedFile,
+                       output_dir: str,
+                       include: List[str] = [],
+                       sink: OutputSink = None,
+                       options: generator.GeneratorOptions = None
+                       ) -> List[str]:
+    """Get the names of the tests of a parsed file that aren't in any of its
+    existing test files, i.e. the tests outputting it would generate.
+
+    Args:
+        parsed_file: The parsed file to check.
+        output_dir: The path to the dir test files are in.
+        include: The list of function names to check tests for. If empty, all
+            functions will be used.
+        sink: The sink to read existing test files from. Defaults to the
+            filesystem.
+        options: The options tests would be generated with.
+
+    Returns:
+        List[str]: The names of the missing tests.
+    """
+    sink = FileSystemSink() if sink is None else sink
+    options = generator.DEFAULT_OPTIONS if options is None else options
+    existing_tests = set(
+        _get_existing_tests(
+            _get_existing_functions(parsed_file, output_dir, sink)))
+    return [
+        test_name
+        for testable_func in _get_funcs_to_output(parsed_file, include)
+        for test_name in generator.get_test_names(testable_func, options)
+        if test_name not in existing_tests
+    ]
+
+
+def _output_target(parsed_set: parse.PyTestGenParsedSet, target: OutputTarget,
+                   sink: OutputSink,
+                   options: generator.GeneratorOptions) -> None:
+    """Output the parsed test files in a parsed set to a single target."""
+    output_tests(parsed_set,
+                 include=target.include,
+                 sink=sink,
+                 renderer=target.renderer,
+                 options=options if target.options is None else target.options,
+                 output_dir=target.output_dir)
 
 
 def _output_parsed_file(parsed_file: parse.PyTestGenParsedFile,
                         output_dir: str,
-                        include: List[str] = []) -> None:
-    """Output the tests of a parsed file to a directory. Checks to see if a
-    test file already existed for the parsed file, and handles not overwriting
+                        include: List[str] = [],
+                        sink: OutputSink = None,
+                        renderer: generator.Renderer = None,
+                        options: generator.GeneratorOptions = None) -> None:
+    """Output the tests of a parsed file to a directory. Checks to see if test
+    files already existed for the parsed file, and handles not overwriting
     existing tests.
 
     Args:
@@ -47,80 +251,311 @@ def _output_parsed_file(parsed_file: parse.PyTestGenParsedFile,
         output_dir: The path to the dir to output test files in.
         include: The list of function names to generate tests for. If empty,
             all functions will be used.
+        sink: The sink to write test files to. Defaults to the filesystem.
+        renderer: The renderer to render tests with. Defaults to Jinja.
+        options: The options to generate tests with.
     """
-    # check if we were able to find an existing test file for this src file
-    if parsed_file.input_file.has_test_file(output_dir):
-        _output_to_existing(parsed_file, output_dir, include)
-    else:
-        _output_to_new(parsed_file, output_dir, include)
+    sink = FileSystemSink() if sink is None else sink
+    options = generator.DEFAULT_OPTIONS if options is None else options
+    input_file = parsed_file.input_file
+    module_name = input_file.get_module()
 
+    # check if we were able to find existing test files for this src file, it
+    # could have been split across several if we used a different layout
+    existing_functions = _get_existing_functions(parsed_file, output_dir,
+                                                 sink)
+    existing_tests = _get_existing_tests(existing_functions)
+    tests_to_generate = [
+        testable_func
+        for testable_func in _get_funcs_to_output(parsed_file, include) if any([
+            test_name not in existing_tests
+            for test_name in generator.get_test_names(testable_func, options)
+        ])
+    ]
 
-def _output_to_existing(parsed_file: parse.PyTestGenParsedFile,
-                        output_dir: str,
-                        include: List[str] = []) -> None:
-    """Output the tests in 'parsed_file' to an existing file, optionally
-    only including a whitelist of functions to output tests for. This function
-    will ensure tests that already existed in the existing file are not
-    overwritten by newly generated tests.
+    shards = _get_shards(tests_to_generate, input_file, output_dir, options,
+                         existing_functions)
+    defer_import = len(shards) > 0 and _should_defer_import(input_file, options)
+    for test_file_path, testable_funcs in shards.items():
+        with sink.lock(test_file_path):
+            # another run may have written to the test file since it was read,
+            # so read it again now nothing else can
+            if sink.exists(test_file_path):
+                _output_to_existing(
+                    test_file_path, module_name, testable_funcs,
+                    parse.get_defined_functions(sink.read(test_file_path)) +
+                    existing_tests, sink, renderer, options, defer_import)
+            else:
+                _output_to_new(test_file_path, module_name, testable_funcs,
+                               existing_tests, sink, renderer, options,
+                               defer_import)
+
+
+def _output_to_existing(test_file_path: str,
+                        module_name: str,
+                        testable_funcs: List[parse.TestableFunc],
+                        existing_functions: List[str],
+                        sink: OutputSink,
+                        renderer: generator.Renderer = None,
+                        options: generator.GeneratorOptions = None,
+                        defer_import: bool = False) -> None:
+    """Output the tests of testable functions to the end of an existing test
+    file.
 
     Args:
-        parsed_file: The parsed file to output.
-        output_dir: The path to the dir to output test files in.
-        include: The list of function names to generate tests for. If empty,
-            all functions will be used.
+        test_file_path: The path of the test file.
+        module_name: The module the testable functions are in.
+        testable_funcs: The functions to output tests for.
+        existing_functions: The functions already defined in the test file,
+            and the tests already defined in any of the module's test files.
+        sink: The sink to write test files to.
+        renderer: The renderer to render tests with. Defaults to Jinja.
+        options: The options to generate tests with.
+        defer_import: Whether to import the module inside the tests.
     """
-    test_file_path = parsed_file.input_file.get_test_file_path(output_dir)
-    module_name = parsed_file.input_file.get_module()
-    existing_functions = parse.get_existing_test_functions(test_file_path)
-    tests_to_generate = []
-    for testable_func in parsed_file.testable_funcs:
-        if testable_func.function_def.name in UNTESTABLE_FUNCTIONS:
-            continue
+    start = time.perf_counter() if observe.OBSERVERS else None
+    sink.append(
+        test_file_path,
+        generator.generate_test_funcs(testable_funcs, module_name, renderer,
+                                      options, existing_functions,
+                                      defer_import))
+    if observe.OBSERVERS:
+        observe.notify(observe.FILE_WRITTEN, test_file_path,
+                       time.perf_counter() - start)
 
-        # skip the function if it isn't in the include list (if we have one)
-        if any(include) and testable_func.function_def.name not in include:
-            continue
 
-        if testable_func.get_test_name() not in existing_functions:
-            tests_to_generate.append(testable_func)
+def _output_to_new(test_file_path: str,
+                   module_name: str,
+                   testable_funcs: List[parse.TestableFunc],
+                   existing_tests: List[str],
+                   sink: OutputSink,
+                   renderer: generator.Renderer = None,
+                   options: generator.GeneratorOptions = None,
+                   defer_import: bool = False) -> None:
+    """Output the tests of testable functions to a new test file.
 
-    with open(test_file_path, "a", encoding="utf-8") as test_file:
-        for test_func in tests_to_generate:
-            test_file.write(
-                generator.generate_test_func(test_func, module_name))
+    Args:
+        test_file_path: The path of the test file.
+        module_name: The module the testable functions are in.
+        testable_funcs: The functions to output tests for.
+        existing_tests: The tests already defined in any of the module's test
+            files.
+        sink: The sink to write test files to.
+        renderer: The renderer to render tests with. Defaults to Jinja.
+        options: The options to generate tests with.
+        defer_import: Whether to import the module inside the tests instead of
+            at the top of the test file.
+    """
+    start = time.perf_counter() if observe.OBSERVERS else None
+    test_file_content = generator.generate_test_file(
+        TEST_FILE_MODULES, None if defer_import else module_name, renderer)
+    test_file_content += generator.generate_test_funcs(
+        testable_funcs, module_name, renderer, options, existing_tests,
+        defer_import)
+    sink.write(test_file_path, test_file_content)
+    if observe.OBSERVERS:
+        observe.notify(observe.FILE_WRITTEN, test_file_path,
+                       time.perf_counter() - start)
 
 
-def _output_to_new(parsed_file: parse.PyTestGenParsedFile,
-                   output_dir: str,
-                   include: List[str] = []) -> None:
-    """Output the tests in 'parsed_file' to an output directory, optionally
-    only including a whitelist of functions to output tests for.
+def _output_event_loop_fixture(output_dir: str,
+                               sink: OutputSink,
+                               renderer: generator.Renderer = None) -> None:
+    """Make sure the conftest.py of an output dir has the event loop fixture
+    that tests of async functions share, so there's only one loop for the
+    whole test session.
 
     Args:
-        parsed_file: The parsed file to output.
+        output_dir: The path of the dir test files are output in.
+        sink: The sink to write the conftest.py to.
+        renderer: The renderer to render the fixture with. Defaults to Jinja.
+    """
+    conftest_path = path.join(output_dir, CONFTEST_FILE)
+    with _written_conftests_lock:
+        written = _written_conftests.setdefault(sink, set())
+        if conftest_path in written:
+            return
+        written.add(conftest_path)
+    with sink.lock(conftest_path):
+        if sink.exists(conftest_path) and generator.EVENT_LOOP_FIXTURE \
+                in parse.get_defined_functions(sink.read(conftest_path)):
+            return
+        fixture = generator.generate_test_file(
+            CONFTEST_MODULES, None,
+            renderer) + generator.generate_event_loop_fixture(renderer) + "\n"
+        if sink.exists(conftest_path):
+            sink.append(conftest_path, "\n" + fixture)
+        else:
+            sink.write(conftest_path, fixture)
+
+
+def _should_defer_import(input_file: load.PyTestGenInputFile,
+                         options: generator.GeneratorOptions) -> bool:
+    """Check whether an input file's module takes longer to import than the
+    import time threshold in 'options'. Modules in archives can't be imported,
+    so are never deferred.
+
+    Args:
+        input_file: The input file to check.
+        options: The options to generate tests with.
+
+    Returns:
+        bool: Whether the module should be imported inside its tests.
+    """
+    if options.import_time_threshold is None \
+            or isinstance(input_file, load.PyTestGenArchiveInputFile):
+        return False
+
+    module_name = input_file.get_module()
+    import_time = options.import_times.get(module_name)
+    if import_time is None:
+        return False
+    if import_time > options.import_time_threshold:
+        logging.info(f"Deferring import of module '{module_name}', it took "
+                     f"{import_time:.3f}s to import")
+        return True
+    return False
+
+
+def _get_existing_functions(parsed_file: parse.PyTestGenParsedFile,
+                            output_dir: str,
+                            sink: OutputSink) -> Dict[str, List[str]]:
+    """Get the functions defined in each of the existing test files of a parsed
+    file.
+
+    Args:
+        parsed_file: The parsed file to get existing test files for.
+        output_dir: The path to the dir test files are in.
+        sink: The sink test files are in.
+
+    Returns:
+        Dict[str, List[str]]: The functions defined in each test file, by path.
+    """
+    input_file = parsed_file.input_file
+    # the unsplit test file of module 'a__b.py' matches the pattern of 'a.py'
+    shards = _get_class_shards(parsed_file)
+    test_file_paths = [input_file.get_test_file_path(output_dir)] + [
+        test_file_path for test_file_path in sink.glob(
+            input_file.get_test_file_shard_pattern(output_dir))
+        if _is_shard(input_file.get_test_file_shard(test_file_path), shards)
+    ]
+    return {
+        test_file_path: parse.get_defined_functions(sink.read(test_file_path))
+        for test_file_path in test_file_paths if sink.exists(test_file_path)
+    }
+
+
+def _get_class_shards(parsed_file: parse.PyTestGenParsedFile) -> List[str]:
+    """Get the shards the tests of a parsed file's classes go in with the
+    'class' layout."""
+    return [
+        _get_class_shard(testable_func)
+        for testable_func in parsed_file.testable_funcs
+        if isinstance(testable_func, parse.ClassTestableFunc)
+    ]
+
+
+def _get_class_shard(testable_func: parse.ClassTestableFunc) -> str:
+    """Get the shard the tests of a method go in with the 'class' layout."""
+    return testable_func.class_def.name.lower().strip("_")
+
+
+def _is_shard(shard: str, class_shards: List[str]) -> bool:
+    """Check whether a shard is a chunk (see _get_chunk_shard()) or one of
+    'class_shards'."""
+    return (shard.isdigit() and shard[0] != "0") or shard in class_shards
+
+
+def _get_existing_tests(existing_functions: Dict[str, List[str]]) -> List[str]:
+    """Get the tests defined in any of the existing test files of an input
+    file, from the functions defined in each."""
+    return [
+        name for names in existing_functions.values() for name in names
+        if name.startswith("test_")
+    ]
+
+
+def _get_shards(testable_funcs: List[parse.TestableFunc],
+                input_file: load.PyTestGenInputFile, output_dir: str,
+                options: generator.GeneratorOptions,
+                existing_functions: Dict[str, List[str]]
+                ) -> Dict[str, List[parse.TestableFunc]]:
+    """Split testable functions across test files according to the layout in
+    'options'.
+
+    Args:
+        testable_funcs: The functions to output tests for.
+        input_file: The input file the functions are in.
         output_dir: The path to the dir to output test files in.
-        include: The list of function names to generate tests for. If empty,
-            all functions will be used.
+        options: The options to generate tests with.
+        existing_functions: The functions defined in each existing test file.
+
+    Returns:
+        Dict[str, List[TestableFunc]]: The functions to output to each test
+            file, by path.
     """
-    test_file_path = parsed_file.input_file.get_test_file_path(output_dir)
-    module_name = parsed_file.input_file.get_module()
-    _ensure_dir(test_file_path)
-    with open(test_file_path, "w", encoding="utf-8") as test_file:
-        test_file.write(
-            generator.generate_test_file(TEST_FILE_MODULES, module_name))
-
-        for testable_func in parsed_file.testable_funcs:
-            if testable_func.function_def.name in UNTESTABLE_FUNCTIONS:
-                continue
+    shards = {}
+    if options.layout == "chunk":
+        # carry on filling the last chunk that exists
+        index = 0
+        while input_file.get_test_file_path(
+                output_dir, _get_chunk_shard(index + 1)) in existing_functions:
+            index += 1
+        last_chunk_path = input_file.get_test_file_path(
+            output_dir, _get_chunk_shard(index))
+        count = len([
+            name for name in existing_functions.get(last_chunk_path, [])
+            if name.startswith("test_")
+        ])
+
+        for testable_func in testable_funcs:
+            test_count = len(generator.get_test_names(testable_func, options))
+            if count > 0 and count + test_count > options.shard_size:
+                index += 1
+                count = 0
+            test_file_path = input_file.get_test_file_path(
+                output_dir, _get_chunk_shard(index))
+            shards.setdefault(test_file_path, []).append(testable_func)
+            count += test_count
+        return shards
+
+    for testable_func in testable_funcs:
+        shard = None
+        if options.layout == "class" \
+                and isinstance(testable_func, parse.ClassTestableFunc):
+            shard = _get_class_shard(testable_func)
+        test_file_path = input_file.get_test_file_path(output_dir, shard)
+        shards.setdefault(test_file_path, []).append(testable_func)
+    return shards
+
+
+def _get_chunk_shard(index: int) -> str:
+    """Get the shard of the chunk at 'index'. The first chunk is the unsplit
+    test file."""
+    return None if index == 0 else str(index)
 
-            # skip the function if it isn't in the include list (if we have one)
-            if any(include) and testable_func.function_def.name not in include:
-                continue
 
-            test_file.write(
-                generator.generate_test_func(testable_func, module_name))
+def _get_funcs_to_output(parsed_file: parse.PyTestGenParsedFile,
+                         include: List[str] = []) -> List[parse.TestableFunc]:
+    """Get the testable functions of a parsed file that should have tests
+    output for them.
 
+    Args:
+        parsed_file: The parsed file to get functions from.
+        include: The list of function names to generate tests for. If empty,
+            all functions will be used.
+
+    Returns:
+        List[TestableFunc]: The testable functions to output tests for.
+    """
+    result = []
+    for testable_func in parsed_file.testable_funcs:
+        if testable_func.function_def.name in UNTESTABLE_FUNCTIONS:
+            continue
+
+        # skip the function if it isn't in the include list (if we have one)
+        if any(include) and testable_func.function_def.name not in include:
+            continue
 
-def _ensure_dir(file_path: str) -> None:
-    """Ensures that a directory 'file_path' exists."""
-    os.makedirs(path.dirname(file_path), exist_ok=True)
\ No newline at end of file
+        result.append(testable_func)
+    return result
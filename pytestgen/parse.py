@@ -11,10 +11,18 @@ Author:
 """
 from abc import ABC, abstractmethod
 import ast
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import copy
+import hashlib
 import logging
-from typing import List
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 
+from pytestgen import index
 from pytestgen import load
+from pytestgen import observe
 
 
 class TestableFunc(ABC):
@@ -22,7 +30,8 @@ class TestableFunc(ABC):
     should have a test generated for it.
 
     Attributes:
-        function_def (ast.FunctionDef): The function def of this function.
+        function_def (ast.FunctionDef): The function def of this function, an
+            ast.AsyncFunctionDef for 'async def' functions.
     """
     @abstractmethod
     def __init__(self, function_def: ast.FunctionDef) -> None:
@@ -32,6 +41,22 @@ class TestableFunc(ABC):
     def get_test_name(self) -> str:
         raise NotImplementedError("Cannot call abstract method")
 
+    def get_benchmark_name(self) -> str:
+        """Get the name of the benchmark of this function, which is its test
+        name with a '_benchmark' prefix. Test names never have an underscore
+        after 'test_', so a benchmark can't have the name of another test, i.e.
+        the test of 'benchmark_do_cool_stuff()'.
+
+        For example, a function 'do_cool_stuff()' would have benchmark name
+        'test__benchmark_do_cool_stuff()'.
+        """
+        return "test__benchmark_" + self.get_test_name()[len("test_"):]
+
+    def is_async(self) -> bool:
+        """Check whether this function is an 'async def', so calling it returns
+        a coroutine."""
+        return isinstance(self.function_def, ast.AsyncFunctionDef)
+
 
 class ModuleTestableFunc(TestableFunc):
     """ModuleTestableFunc is used to store information about a testable
@@ -68,16 +93,14 @@ class ClassTestableFunc(TestableFunc):
         function_def (ast.FunctionDef): The function def of this function.
         class_def (ast.ClassDef): The class def this function is contained in.
         init_function_def (ast.FunctionDef): The function def of the class' __init__ function.
-            Will be None if the class didn't have one.
+            Will be None if the class didn't have one, unless one was inherited
+            and resolved with a SymbolIndex.
     """
     def __init__(self, function_def: ast.FunctionDef,
                  class_def: ast.ClassDef) -> None:
         super().__init__(function_def)
         self.class_def = class_def
         self._find_init_function()
-        if self.init_function_def is None:
-            logging.warning("ClassTestableFunc could not find class __init__()"
-                            ", did the class have a constructor?")
 
     def _find_init_function(self):
         for node in self.class_def.body:
@@ -102,6 +125,18 @@ class ClassTestableFunc(TestableFunc):
         return f"ClassTestableFunc({self.function_def}, {self.class_def})"
 
 
+class ParseTimeoutError(TimeoutError):
+    """Raised when a worker process takes too long to parse a file."""
+
+
+class WorkerCrashedError(RuntimeError):
+    """Raised when a worker process crashes while parsing a file."""
+
+
+PARSE_ERRORS = (SyntaxError, ValueError, RecursionError, MemoryError, OSError)
+"""The errors that can be raised parsing a file, which only fail that file."""
+
+
 class PyTestGenParsedFile:
     """Used to store the list of testable functions for a given input file.
 
@@ -119,46 +154,502 @@ class PyTestGenParsedFile:
         return f"PyTestGenParsedFile([{testable_funcs}], {self.input_file.__repr__()})"
 
 
+class PyTestGenParseReport:
+    """Used to store statistics about parsing a set of files.
+
+    Attributes:
+        files_parsed (int): The number of files that were parsed.
+        bytes_parsed (int): The number of bytes of source that were parsed.
+        stub_files (int): The number of files parsed from .pyi stubs.
+        stub_bytes_saved (int): The number of bytes of source that didn't need
+            parsing because a stub was parsed instead.
+        skipped (Dict[str, int]): The number of files skipped without being
+            parsed for each reason.
+        failures (Dict[str, str]): The error of each file that couldn't be
+            parsed, by path.
+        files_reused (int): The number of files that weren't parsed, as
+            another file with the same source already had been.
+        bytes_reused (int): The number of bytes of source that didn't need
+            parsing because another file had the same source.
+    """
+    def __init__(self) -> None:
+        self.files_parsed = 0
+        self.bytes_parsed = 0
+        self.stub_files = 0
+        self.stub_bytes_saved = 0
+        self.skipped = {}
+        self.failures = {}
+        self.files_reused = 0
+        self.bytes_reused = 0
+
+    def merge(self, other: "PyTestGenParseReport") -> None:
+        """Add the statistics of another report to this one."""
+        self.files_parsed += other.files_parsed
+        self.bytes_parsed += other.bytes_parsed
+        self.stub_files += other.stub_files
+        self.stub_bytes_saved += other.stub_bytes_saved
+        for reason, count in other.skipped.items():
+            self.skipped[reason] = self.skipped.get(reason, 0) + count
+        self.failures.update(other.failures)
+        self.files_reused += other.files_reused
+        self.bytes_reused += other.bytes_reused
+
+    def summary(self) -> List[str]:
+        """Get a human readable summary of the report, one line per item."""
+        result = []
+        if self.stub_files > 0:
+            total = self.bytes_parsed + self.stub_bytes_saved
+            result.append(
+                f"Parsed {self.stub_files} file(s) from .pyi stubs, parsing "
+                f"{self.bytes_parsed} of {total} bytes (saved "
+                f"{self.stub_bytes_saved} bytes, "
+                f"{_percentage(self.stub_bytes_saved, total)}%)")
+        if self.files_reused > 0:
+            result.append(
+                f"Reused the parse of {self.files_reused} file(s) with the "
+                f"same source as another file, saving parsing "
+                f"{self.bytes_reused} bytes")
+        if len(self.skipped) > 0:
+            reasons = ", ".join([
+                f"{count} {reason}"
+                for reason, count in sorted(self.skipped.items())
+            ])
+            result.append(f"Skipped {sum(self.skipped.values())} file(s) "
+                          f"without parsing them ({reasons})")
+        if len(self.failures) > 0:
+            result.append(f"Failed to parse {len(self.failures)} file(s):")
+            result += [
+                f"  {file_path}: {message}"
+                for file_path, message in sorted(self.failures.items())
+            ]
+        return result
+
+    def __repr__(self) -> str:
+        return f"PyTestGenParseReport({self.__dict__})"
+
+
 class PyTestGenParsedSet:
     """Used to store the parsed set of files for a given input set.
 
     Attributes:
         parsed_files (List[PyTestGenParsedFile]): The list of parsed files.
         input_set (PyTestGenInputSet): The input set used to generate this.
+        report (PyTestGenParseReport): Statistics about parsing the input set.
     """
-    def __init__(self, parsed_files: List[PyTestGenParsedFile],
-                 input_set: load.PyTestGenInputSet) -> None:
+    def __init__(self,
+                 parsed_files: List[PyTestGenParsedFile],
+                 input_set: load.PyTestGenInputSet,
+                 report: PyTestGenParseReport = None) -> None:
         self.parsed_files = parsed_files
         self.input_set = input_set
+        self.report = PyTestGenParseReport() if report is None else report
 
     def __repr__(self) -> str:
         parsed_files = ", ".join([f.__repr__() for f in self.parsed_files])
         return f"PyTestGenParsedSet([{parsed_files}], {self.input_set.__repr__()})"
 
 
-def parse_input_set(input_set: load.PyTestGenInputSet) -> PyTestGenParsedSet:
+def parse_input_set(input_set: load.PyTestGenInputSet,
+                    symbol_index: index.SymbolIndex = None,
+                    jobs: int = 1,
+                    timeout: float = None,
+                    parsed_sources: Dict[bytes, Any] = None
+                    ) -> PyTestGenParsedSet:
     """Parse the files in an input set to get the testable functions from them.
+    Files that can't be parsed are left out, and recorded in the report.
+
+    Args:
+        input_set: The input set to parse.
+        symbol_index: If given, parsed files are added to it, and it's used to
+            find the __init__() inherited by classes without their own.
+        jobs: The number of worker processes to parse files in.
+        timeout: The number of seconds a worker process can spend parsing a
+            single file.
+        parsed_sources: What parsing each source gave, by its digest. Share
+            one dict between calls to only parse each source once across
+            input sets.
+
+    Returns:
+        PyTestGenParsedSet: The parsed set.
     """
-    parsed_files = []
-    for src_file in input_set.input_files:
-        parsed_file = _parse_source_file(src_file)
-        if len(parsed_file.testable_funcs) == 0:
+    report = PyTestGenParseReport()
+    parsed_files = list(
+        iter_parsed_files(input_set, report, symbol_index, jobs, timeout,
+                          parsed_sources))
+    return PyTestGenParsedSet(parsed_files, input_set, report)
+
+
+def iter_parsed_files(input_set: load.PyTestGenInputSet,
+                      report: PyTestGenParseReport = None,
+                      symbol_index: index.SymbolIndex = None,
+                      jobs: int = 1,
+                      timeout: float = None,
+                      parsed_sources: Dict[bytes, Any] = None
+                      ) -> Iterator[PyTestGenParsedFile]:
+    """Parse the files in an input set one at a time, so a caller that stops
+    early never parses the rest. Files without testable functions are skipped,
+    and files that can't be parsed are skipped and recorded in the report.
+
+    A file with the same source as one already parsed, i.e. a vendored copy of
+    a module, isn't parsed again. It reuses the testable functions parsed from
+    the first file, and only the module they're rendered for differs. Only
+    what reusing them needs is kept, see _get_reusable_testable_funcs().
+
+    Files are parsed in this process, unless 'jobs' is more than 1 or a
+    'timeout' is given. Then they're parsed in worker processes, and a worker
+    taking longer than 'timeout' on a file is killed, so one pathological file
+    can't stall the run.
+
+    A file with a class whose inherited __init__() can't be found is only
+    yielded once every file has been parsed, as its base class might be in a
+    file later in the input set, i.e. 'pkg/z.py' after 'pkg/a.py' in an
+    archive. Its __init__() is then looked up again.
+
+    Args:
+        input_set: The input set to parse.
+        report: If given, the sizes of the parsed and reused files and the
+            errors of the files that couldn't be parsed are added to it.
+        symbol_index: If given, parsed files are added to it, and it's used to
+            find the __init__() inherited by classes without their own.
+        jobs: The number of worker processes to parse files in.
+        timeout: The number of seconds a worker process can spend parsing a
+            single file.
+        parsed_sources: What parsing each source gave, by its digest. Share
+            one dict between calls to only parse each source once across
+            input sets.
+
+    Returns:
+        Iterator[PyTestGenParsedFile]: Each parsed file with testable
+            functions, in the order of the input set apart from the files
+            yielded last.
+
+    Raises:
+        ValueError: If 'jobs' or 'timeout' weren't positive.
+    """
+    if jobs < 1:
+        raise ValueError(f"Jobs must be at least 1, was {jobs}")
+    if timeout is not None and timeout <= 0:
+        raise ValueError(f"Timeout must be positive, was {timeout}")
+    report = PyTestGenParseReport() if report is None else report
+    # source digest -> what parsing the source gave, see _reuse_parsed_source()
+    parsed_sources = {} if parsed_sources is None else parsed_sources
+    if jobs > 1 or timeout is not None:
+        parsed_files = _iter_parsed_files_in_workers(input_set.input_files,
+                                                     report, symbol_index,
+                                                     jobs, timeout,
+                                                     parsed_sources)
+    else:
+        parsed_files = _iter_parsed_files_in_process(input_set.input_files,
+                                                     report, symbol_index,
+                                                     parsed_sources)
+
+    # files with inits that weren't found yet -> the files yielded after them
+    unresolved_files = []
+    for parsed_file in parsed_files:
+        if symbol_index is not None \
+                and len(_get_unresolved_classes(parsed_file)) > 0:
+            unresolved_files.append(parsed_file)
+            continue
+        _warn_unresolved_inits(parsed_file)
+        yield parsed_file
+
+    # every file of the input set is in the symbol index now
+    for parsed_file in unresolved_files:
+        _resolve_inherited_inits(parsed_file.testable_funcs,
+                                 parsed_file.input_file, symbol_index)
+        _warn_unresolved_inits(parsed_file)
+        yield parsed_file
+
+
+def _iter_parsed_files_in_process(input_files: List[load.PyTestGenInputFile],
+                                  report: PyTestGenParseReport,
+                                  symbol_index: index.SymbolIndex,
+                                  parsed_sources: Dict[bytes, Any]
+                                  ) -> Iterator[PyTestGenParsedFile]:
+    """Parse files one at a time in this process. See iter_parsed_files()."""
+    for src_file in input_files:
+        start = time.perf_counter() if observe.OBSERVERS else None
+        try:
+            parsed_file = _parse_source_file(src_file, report, symbol_index,
+                                             parsed_sources)
+        except PARSE_ERRORS as err:
+            _record_failure(src_file, err, report)
             continue
-        parsed_files.append(parsed_file)
-    return PyTestGenParsedSet(parsed_files, input_set)
+        if observe.OBSERVERS:
+            observe.notify(observe.FILE_PARSED, src_file,
+                           time.perf_counter() - start)
+        if _has_testable_funcs(parsed_file):
+            yield parsed_file
+
+
+def _iter_parsed_files_in_workers(input_files: List[load.PyTestGenInputFile],
+                                  report: PyTestGenParseReport,
+                                  symbol_index: index.SymbolIndex, jobs: int,
+                                  timeout: float,
+                                  parsed_sources: Dict[bytes, Any] = None,
+                                  worker: Callable = None
+                                  ) -> Iterator[PyTestGenParsedFile]:
+    """Parse files in a pool of worker processes. See iter_parsed_files().
+
+    A worker that times out is killed along with the rest of the pool, and the
+    files the others were parsing are started again in a new pool. If a worker
+    crashes it's unknown which file crashed it, so each of the files being
+    parsed is started again on its own.
+
+    Each file's source is hashed before it's sent to a worker, and a file with
+    the same source as an earlier one isn't sent at all, as the outcome of the
+    earlier file is reused once it's known.
+
+    Args:
+        input_files: The files to parse.
+        report: The report to add to.
+        symbol_index: The index to add parsed files to, or None.
+        jobs: The number of worker processes.
+        timeout: The number of seconds a worker can spend on a file, or None.
+        parsed_sources: What parsing each source gave, by its digest.
+        worker: The function to call in a worker for each file. Defaults to
+            _parse_in_worker().
+
+    Returns:
+        Iterator[PyTestGenParsedFile]: Each parsed file with testable
+            functions, in the order of 'input_files'.
+    """
+    worker = _parse_in_worker if worker is None else worker
+    queue = deque(enumerate(input_files))
+    # files that were being parsed when a worker crashed, parsed one at a time
+    suspects = deque()
+    # the outcome of each file by index, until it's its turn to be yielded
+    outcomes = {}
+    next_index = 0
+    # future -> (index, input file, start time, whether it's a suspect)
+    running = {}
+    # index -> (source digest, source size), and source digest -> the index of
+    # the first file with it
+    digests = {}
+    first_indexes = {}
+    parsed_sources = {} if parsed_sources is None else parsed_sources
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        while len(queue) > 0 or len(suspects) > 0 or len(running) > 0:
+            while not any([suspect for *_, suspect in running.values()]):
+                if len(suspects) > 0:
+                    if len(running) > 0:
+                        break
+                    (i, src_file), suspect = suspects.popleft(), True
+                elif len(queue) > 0 and len(running) < jobs:
+                    (i, src_file), suspect = queue.popleft(), False
+                    if i not in digests:
+                        try:
+                            source = src_file.read_signature_source()
+                        except OSError as err:
+                            outcomes[i] = (src_file, err)
+                            continue
+                        digests[i] = (_get_source_digest(source), len(source))
+                    if digests[i][0] in parsed_sources or \
+                            first_indexes.setdefault(digests[i][0], i) != i:
+                        # reused when it's this file's turn to be yielded
+                        outcomes[i] = (src_file, None)
+                        continue
+                else:
+                    break
+                future = executor.submit(worker, src_file,
+                                         symbol_index is not None)
+                running[future] = (i, src_file, time.monotonic(), suspect)
+
+            # every file left may have been a duplicate, so nothing is running
+            done = set()
+            if len(running) > 0:
+                wait_timeout = None
+                if timeout is not None:
+                    first_start = min(
+                        [start for _, _, start, _ in running.values()])
+                    wait_timeout = max(
+                        first_start + timeout - time.monotonic(), 0)
+                done, _ = wait(running.keys(),
+                               timeout=wait_timeout,
+                               return_when=FIRST_COMPLETED)
+
+            crashed = False
+            for future in done:
+                i, src_file, _, suspect = running.pop(future)
+                try:
+                    outcomes[i] = (src_file, future.result())
+                except BrokenProcessPool:
+                    crashed = True
+                    if suspect:
+                        outcomes[i] = (src_file,
+                                       WorkerCrashedError(
+                                           "The worker process parsing the "
+                                           "file crashed"))
+                    else:
+                        suspects.append((i, src_file))
+                except PARSE_ERRORS as err:
+                    outcomes[i] = (src_file, err)
+
+            timed_out = [] if timeout is None else [
+                future for future, (_, _, start, _) in running.items()
+                if time.monotonic() - start >= timeout
+            ]
+            for future in timed_out:
+                i, src_file, _, _ = running.pop(future)
+                outcomes[i] = (src_file,
+                               ParseTimeoutError(
+                                   f"Parsing took longer than {timeout}s"))
+
+            if crashed or len(timed_out) > 0:
+                # ProcessPoolExecutor can't cancel a running task, so start
+                # the files the other workers were parsing again in a new pool
+                for i, src_file, _, suspect in running.values():
+                    if crashed or suspect:
+                        suspects.append((i, src_file))
+                    else:
+                        queue.appendleft((i, src_file))
+                running = {}
+                _kill_workers(executor)
+                executor = ProcessPoolExecutor(max_workers=jobs)
+
+            while next_index in outcomes:
+                src_file, outcome = outcomes.pop(next_index)
+                digest, size = digests.get(next_index, (None, 0))
+                next_index += 1
+                if outcome is None:
+                    parsed_file = _finish_reused_outcome(
+                        src_file, parsed_sources[digest], size, report,
+                        symbol_index)
+                else:
+                    parsed_file = _finish_worker_outcome(
+                        src_file, outcome, report, symbol_index,
+                        parsed_sources, digest)
+                if parsed_file is not None:
+                    yield parsed_file
+    finally:
+        _kill_workers(executor)
+
+
+def _parse_in_worker(src_file: load.PyTestGenInputFile, with_symbols: bool
+                     ) -> Tuple[PyTestGenParsedFile, "PyTestGenParseReport",
+                                index.ModuleSymbols, float]:
+    """Parse a file in a worker process. Inherited __init__()s are resolved
+    by the parent process, as the symbol index is there.
+
+    Returns:
+        Tuple[PyTestGenParsedFile, PyTestGenParseReport, ModuleSymbols, float]:
+            The parsed file, the report of parsing it, the symbols of its
+            module if 'with_symbols' is set, and how long parsing took in
+            seconds.
+    """
+    start = time.perf_counter()
+    report = PyTestGenParseReport()
+    syntax_tree = _read_syntax_tree(src_file, report)
+    parsed_file = PyTestGenParsedFile(_get_ast_testable_funcs(syntax_tree),
+                                      src_file)
+    module_symbols = index.ModuleSymbols.from_module(
+        src_file.get_module(), syntax_tree) if with_symbols else None
+    return parsed_file, report, module_symbols, time.perf_counter() - start
+
+
+def _finish_worker_outcome(src_file: load.PyTestGenInputFile,
+                           outcome: Any,
+                           report: PyTestGenParseReport,
+                           symbol_index: index.SymbolIndex,
+                           parsed_sources: Dict[bytes, Any] = None,
+                           digest: bytes = None) -> PyTestGenParsedFile:
+    """Add the outcome of parsing a file in a worker process to the report and
+    symbol index, and to 'parsed_sources' under the digest of its source if
+    given. Returns the parsed file, or None if it was skipped."""
+    if isinstance(outcome, BaseException):
+        if parsed_sources is not None and digest is not None:
+            parsed_sources[digest] = outcome
+        _record_failure(src_file, outcome, report)
+        return None
+
+    parsed_file, file_report, module_symbols, duration = outcome
+    report.merge(file_report)
+    if symbol_index is not None:
+        symbol_index.add_module_symbols(module_symbols)
+    if parsed_sources is not None and digest is not None:
+        parsed_sources[digest] = (_get_reusable_testable_funcs(
+            parsed_file.testable_funcs), module_symbols)
+    _resolve_inherited_inits(parsed_file.testable_funcs,
+                             parsed_file.input_file, symbol_index)
+    if observe.OBSERVERS:
+        observe.notify(observe.FILE_PARSED, parsed_file.input_file, duration)
+    return parsed_file if _has_testable_funcs(parsed_file) else None
+
+
+def _finish_reused_outcome(src_file: load.PyTestGenInputFile,
+                           parsed_source: Any, source_size: int,
+                           report: PyTestGenParseReport,
+                           symbol_index: index.SymbolIndex
+                           ) -> PyTestGenParsedFile:
+    """Reuse the outcome of parsing an earlier file with the same source as a
+    file. Returns the parsed file, or None if it was skipped."""
+    start = time.perf_counter() if observe.OBSERVERS else None
+    try:
+        parsed_file = _reuse_parsed_source(src_file, parsed_source,
+                                           source_size, report, symbol_index)
+    except PARSE_ERRORS + (ParseTimeoutError, WorkerCrashedError) as err:
+        _record_failure(src_file, err, report)
+        return None
+    if observe.OBSERVERS:
+        observe.notify(observe.FILE_PARSED, src_file,
+                       time.perf_counter() - start)
+    return parsed_file if _has_testable_funcs(parsed_file) else None
+
+
+def _kill_workers(executor: ProcessPoolExecutor) -> None:
+    """Shut down a process pool without waiting for running tasks."""
+    # there's no public way to stop a running task, so kill the processes
+    for process in list((executor._processes or {}).values()):
+        process.kill()
+    executor.shutdown(wait=True)
+
+
+def _has_testable_funcs(parsed_file: PyTestGenParsedFile) -> bool:
+    """Check whether a parsed file has testable functions, telling observers
+    it was skipped if not."""
+    if len(parsed_file.testable_funcs) > 0:
+        return True
+    if observe.OBSERVERS:
+        observe.notify(observe.FILE_SKIPPED, parsed_file.input_file,
+                       "no_testable_funcs")
+    return False
+
+
+def _record_failure(src_file: load.PyTestGenInputFile, err: BaseException,
+                    report: PyTestGenParseReport) -> None:
+    """Record that a file couldn't be parsed, so the run can carry on."""
+    message = f"{type(err).__name__}: {err}"
+    logging.warning("Could not parse '%s': %s", src_file.full_path, message)
+    report.failures[src_file.full_path] = message
+    if observe.OBSERVERS:
+        observe.notify(
+            observe.FILE_SKIPPED, src_file, "parse_timeout"
+            if isinstance(err, ParseTimeoutError) else "parse_error")
 
 
 def get_existing_test_functions(test_file_path: str) -> List[str]:
     """Get the existing test_* functions from a test file."""
     with open(test_file_path, "r", encoding="utf-8") as test_file:
-        syntax_tree = ast.parse(test_file.read())
-        for node in ast.walk(syntax_tree):
-            if isinstance(node, ast.Module):
-                # get functions that start with "test_"
-                return [
-                    fname for fname in _get_module_function_names(node)
-                    if fname.startswith("test_")
-                ]
+        return get_test_functions(test_file.read())
+
+
+def get_test_functions(test_source: str) -> List[str]:
+    """Get the test_* functions from the source code of a test file."""
+    # get functions that start with "test_"
+    return [
+        fname for fname in get_defined_functions(test_source)
+        if fname.startswith("test_")
+    ]
+
+
+def get_defined_functions(test_source: str) -> List[str]:
+    """Get all of the functions defined in module scope in the source code of a
+    test file, i.e. tests and fixtures."""
+    syntax_tree = ast.parse(test_source)
+    for node in ast.walk(syntax_tree):
+        if isinstance(node, ast.Module):
+            return _get_module_function_names(node)
 
 
 def _get_module_function_names(module_node: ast.Module) -> List[str]:
@@ -166,19 +657,173 @@ def _get_module_function_names(module_node: ast.Module) -> List[str]:
     module scope."""
     result = []
     for node in ast.iter_child_nodes(module_node):
-        if isinstance(node, ast.FunctionDef):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
             result.append(node.name)
     return result
 
 
-def _parse_source_file(src: load.PyTestGenInputFile) -> PyTestGenParsedFile:
-    """Parse a single source file to get its testable functions."""
-    with open(src.full_path, "r", encoding="utf-8") as src_file:
-        # parse the file into an AST and get testable functions by iterating
-        # through the tree's nodes
-        syntax_tree = ast.parse(src_file.read())
-        testable_funcs = _get_ast_testable_funcs(syntax_tree)
-        return PyTestGenParsedFile(testable_funcs, src)
+def _parse_source_file(src: load.PyTestGenInputFile,
+                       report: PyTestGenParseReport = None,
+                       symbol_index: index.SymbolIndex = None,
+                       parsed_sources: Dict[bytes, Any] = None
+                       ) -> PyTestGenParsedFile:
+    """Parse a single source file to get its testable functions, using its
+    .pyi stub instead if it has one. If 'parsed_sources' is given, a source
+    that was parsed before isn't parsed again, see _reuse_parsed_source()."""
+    if parsed_sources is None:
+        syntax_tree = _read_syntax_tree(src, report)
+    else:
+        source = src.read_signature_source()
+        digest = _get_source_digest(source)
+        if digest in parsed_sources:
+            return _reuse_parsed_source(src, parsed_sources[digest],
+                                        len(source), report, symbol_index)
+        try:
+            syntax_tree = _parse_syntax_tree(src, source, report)
+        except PARSE_ERRORS as err:
+            # without its traceback, which would keep the source alive
+            parsed_sources[digest] = copy.copy(err)
+            raise
+
+    testable_funcs = _get_ast_testable_funcs(syntax_tree)
+    module_symbols = None
+    if symbol_index is not None:
+        module_symbols = index.ModuleSymbols.from_module(
+            src.get_module(), syntax_tree)
+        symbol_index.add_module_symbols(module_symbols)
+    if parsed_sources is not None:
+        parsed_sources[digest] = (
+            _get_reusable_testable_funcs(testable_funcs), module_symbols)
+    _resolve_inherited_inits(testable_funcs, src, symbol_index)
+    return PyTestGenParsedFile(testable_funcs, src)
+
+
+def _reuse_parsed_source(src: load.PyTestGenInputFile, parsed_source: Any,
+                         source_size: int, report: PyTestGenParseReport,
+                         symbol_index: index.SymbolIndex = None
+                         ) -> PyTestGenParsedFile:
+    """Get the parsed file of a file with the same source as one that was
+    already parsed, without parsing it.
+
+    Args:
+        src: The file to get the parsed file of.
+        parsed_source: What parsing the source gave: a tuple of the testable
+            functions from it (before inherited __init__()s were resolved, as
+            they're resolved for each module) and its module symbols (or None),
+            or the error parsing it raised.
+        source_size: The size of the source in bytes.
+        report: If given, the file is added to it as reused.
+        symbol_index: If given, the module of the file is added to it, and
+            it's used to find inherited __init__()s.
+
+    Returns:
+        PyTestGenParsedFile: The parsed file.
+
+    Raises:
+        The error parsing the source raised, if it couldn't be parsed.
+    """
+    if isinstance(parsed_source, BaseException):
+        raise parsed_source
+    testable_funcs, module_symbols = parsed_source
+    if report is not None:
+        report.files_reused += 1
+        report.bytes_reused += source_size
+    if symbol_index is not None and module_symbols is not None:
+        symbol_index.add_module_symbols(
+            module_symbols.for_module(src.get_module()))
+    testable_funcs = _copy_testable_funcs(testable_funcs)
+    _resolve_inherited_inits(testable_funcs, src, symbol_index)
+    return PyTestGenParsedFile(testable_funcs, src)
+
+
+def _copy_testable_funcs(
+        testable_funcs: List[TestableFunc]) -> List[TestableFunc]:
+    """Copy testable functions, sharing their ASTs, so resolving the inherited
+    __init__()s of one file's doesn't change another's."""
+    return [copy.copy(testable_func) for testable_func in testable_funcs]
+
+
+def _get_reusable_testable_funcs(
+        testable_funcs: List[TestableFunc]) -> List[TestableFunc]:
+    """Copy testable functions to reuse for other files with the same source.
+    The copies of module functions get a module of just the functions and
+    classes in it, so the rest of its AST isn't kept alive for them."""
+    copies = _copy_testable_funcs(testable_funcs)
+    module_funcs = [
+        testable_func for testable_func in copies
+        if isinstance(testable_func, ModuleTestableFunc)
+    ]
+    if len(module_funcs) > 0:
+        nodes = [
+            node for node in ast.iter_child_nodes(module_funcs[0].module)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                                 ast.ClassDef))
+        ]
+        module = ast.Module(body=nodes, type_ignores=[])
+        for testable_func in module_funcs:
+            testable_func.module = module
+    return copies
+
+
+def _get_source_digest(source: bytes) -> bytes:
+    """Hash source code, to find files with the same source."""
+    return hashlib.blake2b(source, digest_size=16).digest()
+
+
+def _read_syntax_tree(src: load.PyTestGenInputFile,
+                      report: PyTestGenParseReport = None) -> ast.Module:
+    """Read and parse the source code of a file to get functions from into an
+    AST, adding it to 'report' if it could be parsed."""
+    return _parse_syntax_tree(src, src.read_signature_source(), report)
+
+
+def _parse_syntax_tree(src: load.PyTestGenInputFile,
+                       source: bytes,
+                       report: PyTestGenParseReport = None) -> ast.Module:
+    """Parse the source code of a file to get functions from into an AST,
+    adding it to 'report' if it could be parsed."""
+    syntax_tree = ast.parse(source)
+    if report is not None:
+        report.files_parsed += 1
+        report.bytes_parsed += len(source)
+        if src.stub_path is not None:
+            report.stub_files += 1
+            report.stub_bytes_saved += src.get_source_size() - len(source)
+    return syntax_tree
+
+
+def _resolve_inherited_inits(testable_funcs: List[TestableFunc],
+                             src: load.PyTestGenInputFile,
+                             symbol_index: index.SymbolIndex = None) -> None:
+    """Find the __init__() of class functions whose class doesn't have its own
+    in the symbol index."""
+    if symbol_index is None:
+        return
+    for testable_func in testable_funcs:
+        if isinstance(testable_func, ClassTestableFunc) \
+                and testable_func.init_function_def is None:
+            testable_func.init_function_def = symbol_index.get_init(
+                src.get_module(), testable_func.class_def.name)
+
+
+def _get_unresolved_classes(parsed_file: PyTestGenParsedFile) -> List[str]:
+    """Get the names of the classes of a parsed file's class functions that
+    don't have an __init__(), in the order they're first found."""
+    unresolved_classes = []
+    for testable_func in parsed_file.testable_funcs:
+        if isinstance(testable_func, ClassTestableFunc) \
+                and testable_func.init_function_def is None \
+                and testable_func.class_def.name not in unresolved_classes:
+            unresolved_classes.append(testable_func.class_def.name)
+    return unresolved_classes
+
+
+def _warn_unresolved_inits(parsed_file: PyTestGenParsedFile) -> None:
+    """Warn once per class of a parsed file that has no __init__()."""
+    for class_name in _get_unresolved_classes(parsed_file):
+        logging.warning("Could not find __init__() of class '%s' in '%s', "
+                        "did the class have a constructor?", class_name,
+                        parsed_file.input_file.full_path)
 
 
 def _get_ast_testable_funcs(syntax_tree: ast.AST) -> List[TestableFunc]:
@@ -212,11 +857,10 @@ def _get_module_testable_funcs(module_node: ast.Module) -> List[TestableFunc]:
     Returns:
         List[TestableFunc]: A list of testable functions from the tree.
     """
-    testable_funcs = []
-    for node in ast.iter_child_nodes(module_node):
-        if isinstance(node, ast.FunctionDef):
-            testable_funcs.append(ModuleTestableFunc(node, module_node))
-    return testable_funcs
+    return [
+        ModuleTestableFunc(node, module_node)
+        for node in _get_function_defs(module_node)
+    ]
 
 
 def _get_class_testable_funcs(class_node: ast.ClassDef) -> List[TestableFunc]:
@@ -228,8 +872,45 @@ def _get_class_testable_funcs(class_node: ast.ClassDef) -> List[TestableFunc]:
     Returns:
         List[TestableFunc]: A list of testable functions from the tree.
     """
-    testable_funcs = []
-    for node in ast.iter_child_nodes(class_node):
-        if isinstance(node, ast.FunctionDef):
-            testable_funcs.append(ClassTestableFunc(node, class_node))
-    return testable_funcs
+    return [
+        ClassTestableFunc(node, class_node)
+        for node in _get_function_defs(class_node)
+    ]
+
+
+def _get_function_defs(scope_node: ast.AST) -> List[ast.FunctionDef]:
+    """Get the function defs declared directly in a module or class. The
+    @overload defs of a function are skipped, as they're all the same function:
+    its implementation is used, or the first of them if it has none, i.e. in a
+    .pyi stub."""
+    function_defs = [
+        node for node in ast.iter_child_nodes(scope_node)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+    ]
+    implemented = {
+        function_def.name
+        for function_def in function_defs if not _is_overload(function_def)
+    }
+    result = []
+    seen_overloads = set()
+    for function_def in function_defs:
+        if _is_overload(function_def):
+            if function_def.name in implemented \
+                    or function_def.name in seen_overloads:
+                continue
+            seen_overloads.add(function_def.name)
+        result.append(function_def)
+    return result
+
+
+def _is_overload(function_def: ast.FunctionDef) -> bool:
+    """Check whether a function def is decorated with @typing.overload."""
+    return any([
+        (index.get_dotted_name(decorator) or [None])[-1] == "overload"
+        for decorator in function_def.decorator_list
+    ])
+
+
+def _percentage(part: int, total: int) -> str:
+    """Format 'part' as a percentage of 'total'."""
+    return f"{100 * part / total:.1f}" if total > 0 else "0.0"
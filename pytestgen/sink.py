@@ -0,0 +1,235 @@
+"""sink.py
+
+Output sinks are where generated test files get written to, i.e. the local
+filesystem, memory, or an archive being streamed somewhere.
+
+Author:
+    Figglewatts <me@figglewatts.co.uk>
+"""
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+import fnmatch
+import glob
+import io
+import os
+from os import path
+import tarfile
+import threading
+import time
+from typing import BinaryIO, ContextManager, Dict, Iterator, List
+import zipfile
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, where test files aren't locked
+    fcntl = None
+
+ARCHIVE_FORMATS = ["tar", "zip"]
+"""The archive formats an ArchiveSink can write."""
+
+
+class OutputSink(ABC):
+    """An OutputSink is somewhere generated test files can be written to.
+
+    Sinks can be used as context managers, which will close them on exit.
+    """
+    @abstractmethod
+    def exists(self, file_path: str) -> bool:
+        """Check whether a test file already exists in the sink."""
+        raise NotImplementedError("Cannot call abstract method")
+
+    @abstractmethod
+    def read(self, file_path: str) -> str:
+        """Read the contents of an existing test file in the sink."""
+        raise NotImplementedError("Cannot call abstract method")
+
+    @abstractmethod
+    def glob(self, pattern: str) -> List[str]:
+        """Get the paths of the test files in the sink matching a glob pattern,
+        in sorted order."""
+        raise NotImplementedError("Cannot call abstract method")
+
+    @abstractmethod
+    def write(self, file_path: str, content: str) -> None:
+        """Write a new test file to the sink, replacing it if it existed."""
+        raise NotImplementedError("Cannot call abstract method")
+
+    @abstractmethod
+    def append(self, file_path: str, content: str) -> None:
+        """Append content to an existing test file in the sink."""
+        raise NotImplementedError("Cannot call abstract method")
+
+    def lock(self, file_path: str) -> ContextManager[None]:
+        """Lock a test file, so other runs writing to the same sink at the same
+        time can't change it between it being read and written. Does nothing
+        by default."""
+        return nullcontext()
+
+    def close(self) -> None:
+        """Finish writing to the sink."""
+
+    def __enter__(self) -> "OutputSink":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class FileSystemSink(OutputSink):
+    """Writes test files to the local filesystem. Test files are locked with
+    an advisory lock on a '.<name>.lock' file next to them, which is removed
+    again when they're unlocked."""
+    def exists(self, file_path: str) -> bool:
+        return path.exists(file_path)
+
+    def read(self, file_path: str) -> str:
+        with open(file_path, "r", encoding="utf-8") as test_file:
+            return test_file.read()
+
+    def glob(self, pattern: str) -> List[str]:
+        return sorted(glob.glob(pattern))
+
+    def write(self, file_path: str, content: str) -> None:
+        _ensure_dir(file_path)
+        with open(file_path, "w", encoding="utf-8") as test_file:
+            test_file.write(content)
+
+    def append(self, file_path: str, content: str) -> None:
+        with open(file_path, "a", encoding="utf-8") as test_file:
+            test_file.write(content)
+
+    @contextmanager
+    def lock(self, file_path: str) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+
+        lock_path = _lock_path(file_path)
+        _ensure_dir(lock_path)
+        while True:
+            lock_file = open(lock_path, "a")
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            # the run holding the lock before us may have removed the lock
+            # file, in which case we locked a file nobody else will see
+            try:
+                if os.fstat(lock_file.fileno()).st_ino == os.stat(
+                        lock_path).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+
+        try:
+            yield
+        finally:
+            # remove it before unlocking, so runs waiting on it try again
+            os.remove(lock_path)
+            lock_file.close()
+
+    def __repr__(self) -> str:
+        return "FileSystemSink()"
+
+
+class MemorySink(OutputSink):
+    """Keeps test files in memory.
+
+    Attributes:
+        files (Dict[str, str]): The contents of each test file, by path.
+    """
+    def __init__(self, files: Dict[str, str] = None) -> None:
+        self.files = {} if files is None else files
+
+    def exists(self, file_path: str) -> bool:
+        return file_path in self.files
+
+    def read(self, file_path: str) -> str:
+        return self.files[file_path]
+
+    def glob(self, pattern: str) -> List[str]:
+        return sorted(fnmatch.filter(self.files.keys(), pattern))
+
+    def write(self, file_path: str, content: str) -> None:
+        self.files[file_path] = content
+
+    def append(self, file_path: str, content: str) -> None:
+        self.files[file_path] += content
+
+    def __repr__(self) -> str:
+        return f"MemorySink({self.files})"
+
+
+class ArchiveSink(OutputSink):
+    """Streams test files into a tar or zip archive as they're written, i.e.
+    to stdout. The archive is write-only, so no test files ever exist in it
+    and each test file is written as a single archive member.
+
+    Attributes:
+        stream (BinaryIO): The stream the archive is written to.
+        archive_format (str): The format of the archive, 'tar' or 'zip'.
+    """
+    def __init__(self, stream: BinaryIO, archive_format: str = "tar") -> None:
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format '{archive_format}', "
+                             f"should be one of {ARCHIVE_FORMATS}")
+        self.stream = stream
+        self.archive_format = archive_format
+        self._lock = threading.Lock()
+        if archive_format == "tar":
+            self._archive = tarfile.open(fileobj=stream, mode="w|")
+        else:
+            self._archive = zipfile.ZipFile(stream,
+                                            mode="w",
+                                            compression=zipfile.ZIP_DEFLATED)
+
+    def exists(self, file_path: str) -> bool:
+        return False
+
+    def read(self, file_path: str) -> str:
+        raise ValueError(f"Cannot read '{file_path}' from an archive")
+
+    def glob(self, pattern: str) -> List[str]:
+        return []
+
+    def write(self, file_path: str, content: str) -> None:
+        member_name = _archive_member_name(file_path)
+        data = content.encode("utf-8")
+        with self._lock:
+            if self.archive_format == "tar":
+                member = tarfile.TarInfo(member_name)
+                member.size = len(data)
+                member.mtime = int(time.time())
+                member.mode = 0o644
+                self._archive.addfile(member, io.BytesIO(data))
+            else:
+                self._archive.writestr(member_name, data)
+
+    def append(self, file_path: str, content: str) -> None:
+        raise ValueError(f"Cannot append to '{file_path}' in an archive")
+
+    def close(self) -> None:
+        with self._lock:
+            self._archive.close()
+        self.stream.flush()
+
+    def __repr__(self) -> str:
+        return f"ArchiveSink({self.stream}, \"{self.archive_format}\")"
+
+
+def _archive_member_name(file_path: str) -> str:
+    """Get the name of the archive member for a test file path."""
+    member_name = path.normpath(file_path).replace(os.sep, "/")
+    return member_name.lstrip("/")
+
+
+def _lock_path(file_path: str) -> str:
+    """Get the path of the lock file of a test file."""
+    dir_path, file_name = path.split(file_path)
+    return path.join(dir_path, f".{file_name}.lock")
+
+
+def _ensure_dir(file_path: str) -> None:
+    """Ensures that the directory containing 'file_path' exists."""
+    dir_path = path.dirname(file_path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
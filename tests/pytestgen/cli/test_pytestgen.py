@@ -1,5 +1,10 @@
+import io
+import json
+import logging
 import os
 from os import path
+import tarfile
+import zipfile
 
 from click.testing import CliRunner
 import pytest
@@ -111,3 +116,294 @@ def test_cli_generate_tests_nonexistent():
     with runner.isolated_filesystem():
         result = runner.invoke(cli, ["nonexist", "-o", "output"])
         assert result.exit_code == 1
+
+
+def test_cli_generate_tests_targets():
+    """Make sure tests are output to every target."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        mock_existing_files("package_dir", "a_file.py")
+        result = runner.invoke(cli, [
+            "package_dir", "-o", "output", "--target",
+            "output_dir=contracts,include=testable_func,renderer=fast"
+        ])
+        assert result.exit_code == 0
+        assert path.exists(path.join("output", "package_dir",
+                                     "test_a_file.py"))
+        with open(path.join("contracts", "package_dir",
+                            "test_a_file.py")) as test_file:
+            contract_tests = test_file.read()
+        assert "def test_testable_func(" in contract_tests
+        assert "def test_testable_func_with_args(" not in contract_tests
+
+
+@pytest.mark.parametrize("spec", [("include=foo"), ("output_dir"),
+                                  ("output_dir=a,colour=blue"),
+                                  ("output_dir=a,renderer=slow")])
+def test_cli_bad_target(spec):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        mock_existing_files("package_dir", "a_file.py")
+        result = runner.invoke(cli, ["package_dir", "--target", spec])
+        assert result.exit_code == 2
+
+
+def test_cli_uncovered_only_no_coverage_file():
+    """Make sure we error if there was no coverage data to read."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        mock_existing_files("package_dir", "a_file.py")
+        result = runner.invoke(
+            cli, ["package_dir", "-o", "output", "--uncovered-only"])
+        assert result.exit_code == 1
+        assert not path.exists("output")
+
+
+@pytest.mark.parametrize(
+    "args,expected",
+    [([], True), (["--skip-generated"], False),
+     (["--max-file-size", "10"], False), (["--max-defs", "1"], True),
+     (["--max-defs", "0"], True)])
+def test_cli_guards(args, expected):
+    """Make sure guarded files are skipped without being parsed."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        os.makedirs("package_dir")
+        with open(path.join("package_dir", "a_pb2.py"), "w") as f:
+            f.write("# Generated by the protocol buffer compiler.  DO NOT "
+                    "EDIT!\ndef a():\n    pass\n")
+        result = runner.invoke(cli, ["package_dir", "-o", "output"] + args)
+        assert result.exit_code == 0
+        assert path.exists(path.join("output", "package_dir",
+                                     "test_a_pb2.py")) == expected
+
+
+def test_cli_check_guards(caplog):
+    """Make sure --check says which files it skipped because of a guard."""
+    caplog.set_level(logging.WARNING)
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        os.makedirs("package_dir")
+        with open(path.join("package_dir", "a_pb2.py"), "w") as f:
+            f.write("# Generated by the protocol buffer compiler.  DO NOT "
+                    "EDIT!\ndef a():\n    pass\n")
+        result = runner.invoke(
+            cli, ["package_dir", "-o", "output", "--check", "--skip-generated"])
+        assert result.exit_code == 0
+        assert "1 file(s) skipped by the guards weren't checked" in caplog.text
+
+
+@pytest.mark.parametrize("args,expected_exit_code",
+                         [([], 0), (["--fail-on-error"], 1),
+                          (["-j", "2", "--parse-timeout", "10"], 0)])
+def test_cli_parse_errors(args, expected_exit_code):
+    """Make sure a file that can't be parsed doesn't stop the others."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        mock_existing_files("package_dir", "a_file.py")
+        with open(path.join("package_dir", "b_file.py"), "w") as f:
+            f.write("def broken(:\n")
+        result = runner.invoke(cli, ["package_dir", "-o", "output"] + args)
+        assert result.exit_code == expected_exit_code
+        assert path.exists(path.join("output", "package_dir",
+                                     "test_a_file.py"))
+
+
+def test_cli_parse_timeout_invalid():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        mock_existing_files("package_dir", "a_file.py")
+        result = runner.invoke(cli, ["package_dir", "--parse-timeout", "0"])
+        assert result.exit_code == 2
+
+
+@pytest.mark.parametrize("marker,expected_exit_code", [("slow", 0),
+                                                        ("not slow", 2)])
+def test_cli_mark_slow(marker, expected_exit_code):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        os.makedirs("package_dir")
+        with open(path.join("package_dir", "a_file.py"), "w") as f:
+            f.write("def read(p):\n    return open(p).read()\n\n"
+                    "def double(x):\n    return x * 2\n")
+        result = runner.invoke(
+            cli, ["package_dir", "-o", "output", "--mark-slow", marker])
+        assert result.exit_code == expected_exit_code
+        if expected_exit_code == 0:
+            with open(path.join("output", "package_dir",
+                                "test_a_file.py")) as f:
+                assert f.read().count("@pytest.mark.slow\n") == 1
+
+
+def test_cli_mock_io():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        os.makedirs("package_dir")
+        with open(path.join("package_dir", "a_file.py"), "w") as f:
+            f.write("def read(p):\n    return open(p).read()\n")
+        result = runner.invoke(cli,
+                               ["package_dir", "-o", "output", "--mock-io"])
+        assert result.exit_code == 0
+        with open(path.join("output", "package_dir", "test_a_file.py")) as f:
+            assert "monkeypatch.setattr(\"package_dir.a_file.open\", " \
+                "mock_open, raising=False)" in f.read()
+
+
+def test_cli_check():
+    """Make sure --check fails without writing when tests are missing."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        mock_existing_files("package_dir", "a_file.py")
+        result = runner.invoke(cli, ["package_dir", "-o", "output", "--check"])
+        assert result.exit_code == 1
+        assert not path.exists("output")
+
+        mock_existing_files_tests_generated("package_dir", "output",
+                                            "a_file.py")
+        result = runner.invoke(cli, ["package_dir", "-o", "output", "--check"])
+        assert result.exit_code == 0
+
+
+def test_cli_check_class_without_init():
+    """Make sure methods of a class without an __init__(), which don't get
+    tests, aren't reported as missing them."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        os.makedirs("package_dir")
+        with open(path.join("package_dir", "a_file.py"), "w") as f:
+            f.write("def f(x):\n    return x\n\n\n"
+                    "class NoInit:\n    def m(self, x):\n        return x\n")
+        result = runner.invoke(cli, ["package_dir", "-o", "output"])
+        assert result.exit_code == 0
+        result = runner.invoke(cli, ["package_dir", "-o", "output", "--check"])
+        assert result.exit_code == 0
+
+
+def test_cli_check_report_json():
+    """Make sure --report json lists every missing test of each file."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        mock_existing_files("package_dir", "a_file.py")
+        mock_existing_files("package_dir", "b_file.py")
+        mock_existing_files_tests_generated("package_dir", "output",
+                                            "a_file.py")
+        result = runner.invoke(
+            cli, ["package_dir", "-o", "output", "--report", "json"])
+        assert result.exit_code == 1
+        assert json.loads(result.output) == {
+            "missing_tests": [{
+                "source_file":
+                path.join("package_dir", "b_file.py"),
+                "test_file":
+                path.join("output", "package_dir", "test_b_file.py"),
+                "tests": [
+                    "test_testable_func", "test_testable_func_with_args",
+                    "test_aclass_testable_func_in_class"
+                ]
+            }]
+        }
+        assert not path.exists(
+            path.join("output", "package_dir", "test_b_file.py"))
+
+
+def test_cli_check_archive():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        mock_existing_files("package_dir", "a_file.py")
+        result = runner.invoke(
+            cli, ["package_dir", "--check", "--archive", "zip"])
+        assert result.exit_code == 2
+
+
+@pytest.mark.parametrize("separator", [("\n"), ("\0")])
+def test_cli_generate_tests_stdin(separator):
+    """Make sure we can read the paths to generate tests for from stdin."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        mock_existing_files("package_dir", "a_file.py")
+        mock_existing_files("package_dir", "b_file.py")
+        paths = separator.join(
+            [path.join("package_dir", f) for f in ["a_file.py", "b_file.py"]])
+        result = runner.invoke(cli, ["-", "-o", "output"], input=paths)
+
+        assert result.exit_code == 0
+        for test_file in ["test_a_file.py", "test_b_file.py"]:
+            assert path.exists(path.join("output", "package_dir",
+                                         test_file)) == True
+
+
+def test_cli_generate_tests_argfile():
+    """Make sure we can read the paths to generate tests for from a file."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        mock_existing_files("package_dir", "a_file.py")
+        with open("paths.txt", "w") as f:
+            f.write(path.join("package_dir", "a_file.py") + "\n")
+        result = runner.invoke(cli, ["@paths.txt", "-o", "output"])
+
+        assert result.exit_code == 0
+        assert path.exists(path.join("output", "package_dir",
+                                     "test_a_file.py")) == True
+
+
+def test_cli_generate_tests_archive():
+    """Make sure we can write generated tests to an archive on stdout."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        mock_existing_files("package_dir", "a_file.py")
+        result = runner.invoke(cli,
+                               ["package_dir", "-o", "output", "--archive", "tar"])
+
+        assert result.exit_code == 0
+        assert path.exists("output") == False
+        with tarfile.open(fileobj=io.BytesIO(result.stdout_bytes)) as archive:
+            assert archive.getnames() == ["output/package_dir/test_a_file.py"]
+
+
+def test_cli_generate_tests_archive_async():
+    """Make sure the event loop fixture is only written to an archive once
+    when several paths have async functions."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        for dir_name in ["a_dir", "b_dir"]:
+            os.makedirs(dir_name)
+            with open(path.join(dir_name, "a_file.py"), "w") as f:
+                f.write("async def testable_func(a):\n    pass\n")
+        result = runner.invoke(
+            cli, ["a_dir", "b_dir", "-o", "output", "--archive", "zip"])
+
+        assert result.exit_code == 0
+        with zipfile.ZipFile(io.BytesIO(result.stdout_bytes)) as archive:
+            assert sorted(archive.namelist()) == [
+                "output/a_dir/test_a_file.py", "output/b_dir/test_a_file.py",
+                "output/conftest.py"
+            ]
+
+
+def test_cli_reuses_parse_across_paths(caplog):
+    """Make sure identical files are only parsed once, even when they're given
+    as separate paths."""
+    caplog.set_level(logging.INFO)
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        for dir_name in ["vendor_a", "vendor_b"]:
+            os.makedirs(dir_name)
+            with open(path.join(dir_name, "mod.py"), "w") as f:
+                f.write("def testable_func(a):\n    pass\n")
+        result = runner.invoke(cli, ["vendor_a", "vendor_b", "-o", "output"])
+
+        assert result.exit_code == 0
+        assert "Reused the parse of 1 file(s)" in caplog.text
+
+
+def test_cli_generate_tests_wheel():
+    """Make sure we can generate tests from the files in a wheel."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with zipfile.ZipFile("pkg-1.0-py3-none-any.whl", "w") as wheel:
+            wheel.writestr("pkg/a_file.py", "def testable_func():\n    pass\n")
+        result = runner.invoke(cli,
+                               ["pkg-1.0-py3-none-any.whl", "-o", "output"])
+
+        assert result.exit_code == 0
+        assert path.exists(path.join("output", "pkg", "test_a_file.py")) == True
@@ -0,0 +1,76 @@
+import asyncio
+from os import path
+
+from pyfakefs.pytest_plugin import fs
+import pytest
+
+import pytestgen.aio
+
+SOURCE = """def testable_func(arg_one):
+    pass
+"""
+
+
+async def collect(async_iterator, limit=None):
+    results = []
+    async for result in async_iterator:
+        results.append(result)
+        if limit is not None and len(results) == limit:
+            break
+    return results
+
+
+def test_generate_async(fs):
+    for f in ["a.py", "b.py", "sub/c.py", "empty.py"]:
+        fs.create_file(path.join("dir", f),
+                       contents="" if f == "empty.py" else SOURCE)
+
+    results = asyncio.run(
+        collect(pytestgen.aio.generate_async(["dir"], "output",
+                                             max_pending=2)))
+
+    assert len(results) == 4
+    for result in results:
+        if result.input_file.name == "empty.py":
+            assert result.parsed_file is None
+            assert path.exists(result.test_file_path) == False
+        else:
+            assert result.parsed_file.input_file == result.input_file
+            assert path.exists(result.test_file_path) == True
+
+
+def test_generate_async_skip_reason(fs):
+    fs.create_file(path.join("dir", "a.py"), contents=SOURCE)
+    fs.create_file(path.join("dir", "empty.py"))
+    fs.create_file(path.join("dir", "broken.py"), contents="def broken(:\n")
+
+    results = asyncio.run(
+        collect(pytestgen.aio.generate_async(["dir"], "output")))
+
+    results = {result.input_file.name: result for result in results}
+    assert results["a.py"].skip_reason is None
+    assert results["a.py"].error is None
+    assert results["empty.py"].skip_reason == "no_testable_funcs"
+    assert results["empty.py"].error is None
+    assert results["broken.py"].parsed_file is None
+    assert results["broken.py"].skip_reason == "parse_error"
+    assert results["broken.py"].error.startswith("SyntaxError: ")
+
+
+def test_generate_async_stops_early(fs):
+    for i in range(10):
+        fs.create_file(path.join("dir", f"file_{i}.py"), contents=SOURCE)
+
+    results = asyncio.run(
+        collect(pytestgen.aio.generate_async(["dir"], "output",
+                                             max_pending=1),
+                limit=2))
+
+    assert len(results) == 2
+    generated = [
+        i for i in range(10)
+        if path.exists(path.join("output", "dir", f"test_file_{i}.py"))
+    ]
+    # with one file in flight at a time, stopping after 2 results must not
+    # leave the remaining files processed
+    assert len(generated) <= 3
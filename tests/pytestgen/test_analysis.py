@@ -0,0 +1,79 @@
+import ast
+
+import pytest
+
+import pytestgen.analysis
+
+
+def get_function_def(source):
+    return ast.parse(source).body[0]
+
+
+@pytest.mark.parametrize(
+    "source,expected",
+    [("def a(x):\n    return x * 2\n", []),
+     ("def a(p):\n    with open(p) as f:\n        return f.read()\n", ["io"]),
+     ("def a(p):\n    return p.read_text()\n", ["io"]),
+     ("def a():\n    subprocess.run(['ls'])\n", ["subprocess"]),
+     ("def a():\n    time.sleep(1)\n", ["sleep"]),
+     ("def a():\n    sleep(1)\n", ["sleep"]),
+     ("def a(url):\n    return requests.get(url).json()\n", ["network"]),
+     ("def a(url):\n    return urllib.request.urlopen(url)\n", ["network"]),
+     ("def a(paths):\n    for p in paths:\n        open(p)\n",
+      ["io", "io_in_loop"]),
+     ("def a(urls):\n    return [requests.get(u) for u in urls]\n",
+      ["network", "io_in_loop"]),
+     ("def a(n):\n    return 1 if n == 0 else n * a(n - 1)\n",
+      ["recursion"]),
+     ("def a(n):\n    while n:\n        n = a(n - 1)\n", ["recursion"]),
+     ("def a():\n    def b():\n        open('x')\n    return b\n", []),
+     ("def a():\n    return lambda: time.sleep(1)\n", []),
+     ("def a(x): ...\n", [])])
+def test_find_costs(source, expected):
+    result = pytestgen.analysis.find_costs(get_function_def(source))
+    assert result == expected
+
+
+@pytest.mark.parametrize("source,expected",
+                         [("def a(self, n):\n    return self.a(n - 1)\n",
+                           ["recursion"]),
+                          ("def a(self, n):\n    return a(n - 1)\n", []),
+                          ("def a(self, other):\n    return other.a()\n", [])])
+def test_find_costs_method(source, expected):
+    result = pytestgen.analysis.find_costs(get_function_def(source), True)
+    assert result == expected
+
+
+@pytest.mark.parametrize(
+    "source,expected",
+    [("def a(x):\n    return x * 2\n", []),
+     ("def a(p):\n    with open(p) as f:\n        return open(p)\n",
+      [["open"]]),
+     ("def a(cmd):\n    time.sleep(1)\n    return subprocess.run(cmd)\n",
+      [["time", "sleep"], ["subprocess", "run"]]),
+     ("def a(p):\n    return p.read_text()\n", []),
+     ("def a(n):\n    return a(n - 1)\n", [])])
+def test_find_io_calls(source, expected):
+    result = pytestgen.analysis.find_io_calls(get_function_def(source))
+    assert result == expected
+
+
+@pytest.mark.parametrize(
+    "source,expected",
+    [("def open(self, p):\n    return open(p)\n", [["open"]]),
+     ("def open(self, p):\n    return self.open(p)\n", [])])
+def test_find_io_calls_method(source, expected):
+    result = pytestgen.analysis.find_io_calls(get_function_def(source), True)
+    assert result == expected
+
+
+@pytest.mark.parametrize(
+    "source,expected",
+    [("async def a():\n    await asyncio.sleep(1)\n", [["asyncio", "sleep"]]),
+     ("async def a(p):\n    await f(open(p))\n", []),
+     ("async def a():\n    time.sleep(1)\n    await asyncio.sleep(1)\n",
+      [["asyncio", "sleep"]]),
+     ("async def a():\n    await b()\n", [])])
+def test_find_awaited_io_calls(source, expected):
+    result = pytestgen.analysis.find_awaited_io_calls(get_function_def(source))
+    assert result == expected
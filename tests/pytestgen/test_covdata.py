@@ -0,0 +1,174 @@
+import ast
+from os import path
+import sqlite3
+
+import pytest
+
+from pytestgen.load import PyTestGenInputFile, PyTestGenInputSet
+import pytestgen.covdata
+import pytestgen.parse
+
+SOURCE = """def covered(x):
+    return x
+
+
+def uncovered(x):
+    return x
+
+
+class AClass:
+    def __init__(self):
+        self.value = 1
+
+    def a_method(self, y):
+        if y:
+            return y
+        return self.value
+"""
+
+
+def make_coverage_file(data_file, lines=None, arcs=None):
+    """Write a data file with the same tables as coverage.py's."""
+    connection = sqlite3.connect(str(data_file))
+    connection.executescript("""
+        create table file (id integer primary key, path text, unique (path));
+        create table line_bits (file_id integer, context_id integer,
+                                numbits blob);
+        create table arc (file_id integer, context_id integer,
+                          fromno integer, tono integer);
+    """)
+    for file_id, file_path in enumerate((lines or arcs).keys()):
+        connection.execute("insert into file values (?, ?)",
+                           (file_id, file_path))
+        if lines is not None:
+            numbits = bytearray(max(lines[file_path]) // 8 + 1)
+            for line in lines[file_path]:
+                numbits[line // 8] |= 1 << (line % 8)
+            connection.execute("insert into line_bits values (?, 0, ?)",
+                               (file_id, bytes(numbits)))
+        if arcs is not None:
+            for from_line, to_line in arcs[file_path]:
+                connection.execute("insert into arc values (?, 0, ?, ?)",
+                                   (file_id, from_line, to_line))
+    connection.commit()
+    connection.close()
+
+
+def test_read_coverage_data_lines(tmp_path):
+    data_file = tmp_path / ".coverage"
+    make_coverage_file(data_file, lines={str(tmp_path / "a.py"): [1, 2, 17]})
+    coverage_data = pytestgen.covdata.read_coverage_data(str(data_file))
+    assert coverage_data.get_executed_lines(str(tmp_path / "a.py")) == {
+        1, 2, 17
+    }
+    assert coverage_data.get_executed_lines(str(tmp_path / "b.py")) is None
+
+
+def test_read_coverage_data_relative_arcs(tmp_path):
+    data_file = tmp_path / ".coverage"
+    make_coverage_file(data_file, arcs={"a.py": [(-1, 1), (1, 2), (2, -1)]})
+    coverage_data = pytestgen.covdata.read_coverage_data(str(data_file))
+    assert coverage_data.get_executed_lines(str(tmp_path / "a.py")) == {1, 2}
+
+
+@pytest.mark.parametrize("contents", [None, "!coverage.py: This is a JSON file"])
+def test_read_coverage_data_bad_file(tmp_path, contents):
+    data_file = tmp_path / ".coverage"
+    if contents is not None:
+        data_file.write_text(contents)
+    with pytest.raises(ValueError):
+        pytestgen.covdata.read_coverage_data(str(data_file))
+
+
+@pytest.mark.parametrize("function_index,expected", [(0, True), (1, False)])
+def test_is_func_covered(function_index, expected):
+    function_def = ast.parse(SOURCE).body[function_index]
+    assert pytestgen.covdata.is_func_covered(function_def,
+                                             {1, 2, 5}) == expected
+
+
+@pytest.mark.parametrize("executed_lines,expected", [({1, 4}, True),
+                                                   ({1, 5}, False)])
+def test_is_func_covered_without_end_lineno(executed_lines, expected):
+    """end_lineno doesn't exist before Python 3.8."""
+    function_def = ast.parse("def a(x):\n    if x:\n        pass\n"
+                             "    return x\n").body[0]
+    for node in ast.walk(function_def):
+        if hasattr(node, "end_lineno"):
+            del node.end_lineno
+    assert pytestgen.covdata.is_func_covered(function_def,
+                                             executed_lines) == expected
+
+
+def test_is_func_covered_one_line():
+    function_def = ast.parse("def a(): return 1\n").body[0]
+    assert pytestgen.covdata.is_func_covered(function_def, {1}) == False
+
+
+def test_get_func_ranges():
+    source = SOURCE + """
+
+def multi_line(x,
+               y=(1, 2)) -> int:  # a comment
+    return x
+
+
+def one_line(): return 1
+"""
+    assert pytestgen.covdata.get_func_ranges(source) == {
+        "covered": (2, 4),
+        "uncovered": (6, 8),
+        "AClass.__init__": (11, 12),
+        "AClass.a_method": (14, 18),
+        "multi_line": (21, 23),
+        "one_line": None
+    }
+
+
+@pytest.mark.parametrize("executed_lines,expected",
+                         [({2, 6, 11, 15}, True), ({2, 11, 15}, False),
+                          (set(), False)])
+def test_is_source_covered(executed_lines, expected):
+    assert pytestgen.covdata.is_source_covered(SOURCE,
+                                               executed_lines) == expected
+
+
+def test_is_source_covered_unreliable_scan():
+    # the unbalanced bracket in the string hides the second function
+    source = 'def a(x="("):\n    return x\n\ndef b():\n    return 1\n'
+    assert pytestgen.covdata.is_source_covered(source, {2, 5}) == False
+
+
+def test_skip_covered(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "a.py").write_text(SOURCE)
+    (tmp_path / "pkg" / "b.py").write_text(SOURCE)
+    (tmp_path / "pkg" / "c.py").write_text(SOURCE)
+    make_coverage_file(tmp_path / ".coverage",
+                       lines={
+                           str(tmp_path / "pkg" / "a.py"): [2, 6, 11, 15],
+                           str(tmp_path / "pkg" / "b.py"): [2, 11, 15]
+                       })
+    coverage_data = pytestgen.covdata.read_coverage_data(".coverage")
+    input_set = PyTestGenInputSet("tests", [
+        PyTestGenInputFile("a.py", "pkg"),
+        PyTestGenInputFile("b.py", "pkg"),
+        PyTestGenInputFile("c.py", "pkg")
+    ])
+
+    # a.py is fully covered, so it shouldn't be parsed
+    pytestgen.covdata.skip_covered_files(input_set, coverage_data)
+    assert [f.name for f in input_set.input_files] == ["b.py", "c.py"]
+
+    # only the uncovered function of b.py should be left, and all of c.py
+    parsed_set = pytestgen.parse.parse_input_set(input_set)
+    pytestgen.covdata.skip_covered_funcs(parsed_set, coverage_data)
+    assert [[f.get_test_name() for f in parsed_file.testable_funcs]
+            for parsed_file in parsed_set.parsed_files] == [
+                ["test_uncovered"],
+                [
+                    "test_covered", "test_uncovered", "test_aclass_init",
+                    "test_aclass_a_method"
+                ]
+            ]
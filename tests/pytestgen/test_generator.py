@@ -1,3 +1,6 @@
+import ast
+import unittest.mock
+
 from munch import munchify, Munch
 import pytest
 
@@ -7,9 +10,14 @@ import pytestgen.generator
 from fixtures import mock_class_testable_func, mock_module_testable_func
 
 
-def test_generate_class_func(mock_class_testable_func):
+RENDERERS = [(None), (pytestgen.generator.JinjaRenderer()),
+             (pytestgen.generator.FastRenderer())]
+
+
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_class_func(mock_class_testable_func, renderer):
     result_without_return = pytestgen.generator.generate_class_func(
-        mock_class_testable_func(has_return=False), "module")
+        mock_class_testable_func(has_return=False), "module", renderer)
     assert result_without_return == """
 
 
@@ -27,7 +35,7 @@ def test_testclass_a_class_test_function(instance, a, b, expected):
     pass"""
 
     result_with_return = pytestgen.generator.generate_class_func(
-        mock_class_testable_func(has_return=True), "module")
+        mock_class_testable_func(has_return=True), "module", renderer)
     assert result_with_return == """
 
 
@@ -45,9 +53,10 @@ def test_testclass_a_class_test_function(instance, a, b, expected):
     pass"""
 
 
-def test_generate_module_func(mock_module_testable_func):
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_module_func(mock_module_testable_func, renderer):
     result_without_return = pytestgen.generator.generate_module_func(
-        mock_module_testable_func(has_return=False), "module")
+        mock_module_testable_func(has_return=False), "module", renderer)
     assert result_without_return == """
 
 
@@ -64,7 +73,7 @@ def test_a_test_function(a, b, expected):
     pass"""
 
     result_with_return = pytestgen.generator.generate_module_func(
-        mock_module_testable_func(has_return=True), "module")
+        mock_module_testable_func(has_return=True), "module", renderer)
     assert result_with_return == """
 
 
@@ -81,11 +90,445 @@ def test_a_test_function(a, b, expected):
     pass"""
 
 
-def test_generate_test_file():
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_test_file(renderer):
     result = pytestgen.generator.generate_test_file(["a", "b", "c"],
-                                                    "test_module")
+                                                    "test_module", renderer)
     assert result == """import a
 import b
 import c
 
-import test_module"""
\ No newline at end of file
+import test_module"""
+
+
+@pytest.mark.parametrize("arguments", [([]), (["a"]), (["a", "b", "c"])])
+@pytest.mark.parametrize("init_arguments", [([]), (["x", "y"])])
+@pytest.mark.parametrize("returns", [(True), (False)])
+def test_fast_renderer_matches_jinja(arguments, init_arguments, returns):
+    data = {
+        "arguments": arguments,
+        "name": "test_aclass_func",
+        "src_name": "func",
+        "module_path": "pkg.module",
+        "class_name": "AClass",
+        "init_arguments": init_arguments,
+        "returns": returns
+    }
+    jinja = pytestgen.generator.JinjaRenderer()
+    fast = pytestgen.generator.FastRenderer()
+    assert fast.render_module_func(data) == jinja.render_module_func(data)
+    assert fast.render_class_func(data) == jinja.render_class_func(data)
+
+    fixture_data = dict(data, scope="module", fixture_name="aclass_instance")
+    for kind in ["class_fixture", "class_fixture_test_func"]:
+        assert fast.render(kind, fixture_data) == \
+            jinja.render(kind, fixture_data)
+
+
+MOCKS = [{
+    "name": "mock_open",
+    "type": "MagicMock",
+    "target": "pkg.module.open",
+    "builtin": True
+}, {
+    "name": "mock_asyncio_sleep",
+    "type": "AsyncMock",
+    "target": "pkg.module.asyncio.sleep",
+    "builtin": False
+}]
+
+
+@pytest.mark.parametrize("arguments", [([]), (["a", "b"])])
+@pytest.mark.parametrize("returns", [(True), (False)])
+@pytest.mark.parametrize("event_loop,mocks", [("session_event_loop", []),
+                                              (None, MOCKS),
+                                              ("session_event_loop", MOCKS)])
+def test_fast_renderer_matches_jinja_async(arguments, returns, event_loop,
+                                           mocks):
+    data = {
+        "arguments": arguments,
+        "name": "test_aclass_func",
+        "src_name": "func",
+        "module_path": "pkg.module",
+        "class_name": "AClass",
+        "init_arguments": [],
+        "returns": returns,
+        "event_loop": event_loop,
+        "mocks": mocks,
+        "imports": ["unittest.mock"] if mocks else [],
+        "scope": "module",
+        "fixture_name": "aclass_instance"
+    }
+    jinja = pytestgen.generator.JinjaRenderer()
+    fast = pytestgen.generator.FastRenderer()
+    for kind in [
+            "module_test_func", "class_test_func", "class_fixture_test_func",
+            "event_loop_fixture"
+    ]:
+        assert fast.render(kind, data) == jinja.render(kind, data)
+
+
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_async_funcs(renderer):
+    module_node = ast.parse("async def a(x) -> int:\n    return x\n")
+    testable_func = ModuleTestableFunc(module_node.body[0], module_node)
+    result = pytestgen.generator.generate_test_funcs(
+        [testable_func], "module", renderer,
+        pytestgen.generator.GeneratorOptions(benchmark="also"))
+    assert "def test_a(session_event_loop, x, expected):\n" \
+        "    # result = session_event_loop.run_until_complete(module.a(x))\n" \
+        in result
+    assert "def test__benchmark_a(benchmark, session_event_loop, x):\n" \
+        in result
+    assert "benchmark(lambda: session_event_loop.run_until_complete(" \
+        "module.a(x)))" in result
+
+
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_test_funcs_mock_io(renderer):
+    module_node = ast.parse("import subprocess\n\n"
+                            "def a(p):\n    return open(p).read()\n\n"
+                            "def b(cmd):\n    subprocess.run(cmd)\n")
+    funcs = [
+        ModuleTestableFunc(node, module_node)
+        for node in module_node.body[1:]
+    ]
+    options = pytestgen.generator.GeneratorOptions(benchmark="also",
+                                                   mock_io=True)
+    result = pytestgen.generator.generate_test_funcs(funcs, "module",
+                                                     renderer, options)
+    assert """def test_a(monkeypatch, p, expected):
+    import unittest.mock
+    # TODO: set what the mocked I/O returns
+    mock_open = unittest.mock.MagicMock()
+    monkeypatch.setattr("module.open", mock_open, raising=False)
+    # TODO: create assertions for test_a
+""" in result
+    assert """    mock_subprocess_run = unittest.mock.MagicMock()
+    monkeypatch.setattr("module.subprocess.run", mock_subprocess_run)
+""" in result
+    # benchmarks measure the real I/O
+    assert "def test__benchmark_a(benchmark, p):\n    # TODO" in result
+
+
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_test_funcs_mock_awaited_io(renderer):
+    module_node = ast.parse("import asyncio, time\n\n"
+                            "async def a():\n    time.sleep(1)\n"
+                            "    await asyncio.sleep(1)\n")
+    funcs = [ModuleTestableFunc(module_node.body[1], module_node)]
+    options = pytestgen.generator.GeneratorOptions(mock_io=True)
+    result = pytestgen.generator.generate_test_funcs(funcs, "module",
+                                                     renderer, options)
+    assert "mock_time_sleep = unittest.mock.MagicMock()\n" in result
+    if hasattr(unittest.mock, "AsyncMock"):
+        assert "mock_asyncio_sleep = unittest.mock.AsyncMock()\n" in result
+    else:
+        assert "mock_asyncio_sleep" not in result
+
+
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_event_loop_fixture(renderer):
+    result = pytestgen.generator.generate_event_loop_fixture(renderer)
+    assert result == """
+
+
+@pytest.fixture(scope="session")
+def session_event_loop():
+    # one event loop shared by every test of an async function
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()"""
+
+
+@pytest.mark.parametrize("modules", [([]), (["pytest"]), (["a", "b"])])
+def test_fast_renderer_matches_jinja_test_file(modules):
+    jinja = pytestgen.generator.JinjaRenderer()
+    fast = pytestgen.generator.FastRenderer()
+    assert fast.render_test_file(modules, "pkg.module") == \
+        jinja.render_test_file(modules, "pkg.module")
+
+
+@pytest.mark.parametrize("name,expected", [("jinja", "JinjaRenderer()"),
+                                           ("fast", "FastRenderer()")])
+def test_get_renderer(name, expected):
+    assert repr(pytestgen.generator.get_renderer(name)) == expected
+
+
+def test_get_renderer_unknown():
+    with pytest.raises(ValueError):
+        pytestgen.generator.get_renderer("mako")
+
+
+def make_func_data(kind, name):
+    return {
+        "kind": kind,
+        "arguments": ["a"],
+        "name": f"test_{name}",
+        "src_name": name,
+        "module_path": "module",
+        "class_name": "AClass",
+        "init_arguments": ["x"],
+        "returns": True
+    }
+
+
+def test_template_dir_renderer_builtin(tmp_path):
+    renderer = pytestgen.generator.TemplateDirRenderer(
+        str(tmp_path / "templates"), str(tmp_path / "cache"))
+    jinja = pytestgen.generator.JinjaRenderer()
+    funcs = [
+        make_func_data("module_test_func", "one"),
+        make_func_data("class_test_func", "two"),
+        make_func_data("module_test_func", "three")
+    ]
+
+    assert renderer.render_test_funcs(funcs) == jinja.render_test_funcs(funcs)
+    assert renderer.render_test_file(["pytest"], "module") == \
+        jinja.render_test_file(["pytest"], "module")
+
+    # templates should have been compiled into the cache
+    assert len(list((tmp_path / "cache").iterdir())) > 0
+
+
+def test_template_dir_renderer_override(tmp_path):
+    template_dir = tmp_path / "templates"
+    template_dir.mkdir()
+    (template_dir / "module_test_func.py.j2").write_text(
+        "\n\ndef {{ data.name }}():\n    {{ data.module_path }}.{{ data.src_name }}()\n"
+    )
+    renderer = pytestgen.generator.TemplateDirRenderer(
+        str(template_dir), str(tmp_path / "cache"))
+    jinja = pytestgen.generator.JinjaRenderer()
+    class_func = make_func_data("class_test_func", "two")
+
+    result = renderer.render_test_funcs(
+        [make_func_data("module_test_func", "one"), class_func])
+    assert result == "\n\ndef test_one():\n    module.one()" + \
+        jinja.render_class_func(class_func)
+
+
+def test_generate_test_funcs(mock_module_testable_func,
+                             mock_class_testable_func):
+    funcs = [mock_module_testable_func(), mock_class_testable_func()]
+    result = pytestgen.generator.generate_test_funcs(funcs, "module")
+    assert result == "".join([
+        pytestgen.generator.generate_test_func(func, "module")
+        for func in funcs
+    ])
+
+
+
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_test_funcs_fixture(mock_class_testable_func, renderer):
+    options = pytestgen.generator.GeneratorOptions(fixture_scope="session")
+    funcs = [mock_class_testable_func(), mock_class_testable_func()]
+    result = pytestgen.generator.generate_test_funcs(funcs, "module", renderer,
+                                                     options)
+    test = """
+
+
+@pytest.mark.parametrize(
+    "a,b,expected",
+    [
+        # TODO: fill in test data for test_testclass_a_class_test_function
+        # pytest.param(, , expected, id="")
+    ]
+)
+def test_testclass_a_class_test_function(testclass_instance, a, b, expected):
+    # TODO: write test for test_testclass_a_class_test_function
+    # TODO: create assertions for test_testclass_a_class_test_function
+    # testclass_instance.a_class_test_function(a, b)
+    pass"""
+    assert result == """
+
+
+@pytest.fixture(scope="session")
+def testclass_instance():
+    # TODO: create the instance of TestClass to test
+    # return module.TestClass(one, two)
+    pass""" + test + test
+
+    # the fixture shouldn't be generated again if it already existed
+    result = pytestgen.generator.generate_test_funcs(
+        funcs[:1], "module", renderer, options, ["testclass_instance"])
+    assert result == test
+
+
+def test_generator_options_unknown_scope():
+    with pytest.raises(ValueError):
+        pytestgen.generator.GeneratorOptions(fixture_scope="forever")
+
+
+@pytest.mark.parametrize("layout,shard_size", [("everywhere", 100),
+                                               ("chunk", 0)])
+def test_generator_options_bad_layout(layout, shard_size):
+    with pytest.raises(ValueError):
+        pytestgen.generator.GeneratorOptions(layout=layout,
+                                             shard_size=shard_size)
+
+
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_test_funcs_xdist_groups(mock_module_testable_func,
+                                          mock_class_testable_func, renderer):
+    options = pytestgen.generator.GeneratorOptions(xdist_groups=True)
+    funcs = [mock_module_testable_func(), mock_class_testable_func()]
+    result = pytestgen.generator.generate_test_funcs(funcs, "module", renderer,
+                                                     options)
+    assert "\n\n\n@pytest.mark.xdist_group(name=\"module\")\n" \
+        "@pytest.mark.parametrize(\n    \"a,b,expected\"" in result
+    assert "\n\n\n@pytest.mark.xdist_group(name=\"module.TestClass\")\n" \
+        "@pytest.mark.parametrize(\n    \"instance,a,b,expected\"" in result
+
+
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_test_funcs_benchmark(mock_module_testable_func,
+                                       mock_class_testable_func, renderer):
+    options = pytestgen.generator.GeneratorOptions(benchmark="only")
+    funcs = [mock_module_testable_func(), mock_class_testable_func()]
+    result = pytestgen.generator.generate_test_funcs(funcs, "module", renderer,
+                                                     options)
+    assert result == """
+
+
+@pytest.mark.parametrize(
+    "a,b",
+    [
+        # TODO: fill in benchmark inputs for test__benchmark_a_test_function
+        # pytest.param(, , id="")
+    ]
+)
+def test__benchmark_a_test_function(benchmark, a, b):
+    # TODO: make sure the inputs of test__benchmark_a_test_function are representative
+    benchmark(module.a_test_function, a, b)
+
+
+@pytest.mark.parametrize(
+    "instance,a,b",
+    [
+        # TODO: fill in benchmark inputs for test__benchmark_testclass_a_class_test_function
+        # pytest.param(module.TestClass(one, two), , , id="")
+    ]
+)
+def test__benchmark_testclass_a_class_test_function(benchmark, instance, a, b):
+    # TODO: make sure the inputs of test__benchmark_testclass_a_class_test_function are representative
+    benchmark(instance.a_class_test_function, a, b)"""
+
+
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_test_funcs_benchmark_also(mock_class_testable_func,
+                                            renderer):
+    options = pytestgen.generator.GeneratorOptions(fixture_scope="module",
+                                                   benchmark="also")
+    funcs = [mock_class_testable_func()]
+    result = pytestgen.generator.generate_test_funcs(funcs, "module", renderer,
+                                                     options)
+    assert "def testclass_instance():" in result
+    assert "def test_testclass_a_class_test_function(testclass_instance, " \
+        "a, b, expected):" in result
+    assert "def test__benchmark_testclass_a_class_test_function(benchmark, " \
+        "testclass_instance, a, b):\n" in result
+    assert "benchmark(testclass_instance.a_class_test_function, a, b)" \
+        in result
+
+    # only the tests that don't exist yet should be generated
+    result = pytestgen.generator.generate_test_funcs(
+        funcs, "module", renderer, options,
+        ["testclass_instance", "test_testclass_a_class_test_function"])
+    assert result == pytestgen.generator.generate_test_funcs(
+        funcs, "module", renderer,
+        pytestgen.generator.GeneratorOptions(fixture_scope="module",
+                                             benchmark="only"),
+        ["testclass_instance"])
+
+
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_benchmark_no_arguments(renderer):
+    fake_function_def = munchify({
+        "name": "a_function",
+        "args": {
+            "args": []
+        },
+        "returns": None
+    })
+    options = pytestgen.generator.GeneratorOptions(benchmark="only")
+    result = pytestgen.generator.generate_test_funcs(
+        [ModuleTestableFunc(fake_function_def, None)], "module", renderer,
+        options)
+    assert result == """
+
+
+def test__benchmark_a_function(benchmark):
+    # TODO: make sure the inputs of test__benchmark_a_function are representative
+    benchmark(module.a_function)"""
+
+
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_test_file_deferred_import(renderer):
+    result = pytestgen.generator.generate_test_file(["pytest"], None,
+                                                    renderer)
+    assert result == "import pytest"
+
+
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_test_funcs_deferred_import(mock_module_testable_func,
+                                             mock_class_testable_func,
+                                             renderer):
+    options = pytestgen.generator.GeneratorOptions(benchmark="also")
+    funcs = [mock_module_testable_func(), mock_class_testable_func()]
+    result = pytestgen.generator.generate_test_funcs(funcs,
+                                                     "package.module",
+                                                     renderer,
+                                                     options,
+                                                     defer_import=True)
+    assert """
+def test_a_test_function(a, b, expected):
+    import package.module
+    # TODO: create assertions for test_a_test_function
+""" in result
+    assert """
+def test__benchmark_a_test_function(benchmark, a, b):
+    import package.module
+""" in result
+
+    # class tests create their instance in a fixture, which imports the module
+    assert """
+
+
+@pytest.fixture(scope="function")
+def testclass_instance():
+    import package.module
+    # TODO: create the instance of TestClass to test
+    # return package.module.TestClass(one, two)
+    pass""" in result
+    assert "def test_testclass_a_class_test_function(testclass_instance, " \
+        "a, b, expected):\n    # TODO" in result
+    assert "def test__benchmark_testclass_a_class_test_function(benchmark, " \
+        "testclass_instance, a, b):\n    # TODO" in result
+    assert result.count("import package.module") == 3
+
+
+@pytest.mark.parametrize("slow_marker", [(""), ("not slow"), ("slow()")])
+def test_generator_options_bad_slow_marker(slow_marker):
+    with pytest.raises(ValueError):
+        pytestgen.generator.GeneratorOptions(slow_marker=slow_marker)
+
+
+@pytest.mark.parametrize("renderer", RENDERERS)
+def test_generate_test_funcs_slow_marker(renderer):
+    module_node = ast.parse("def a(p):\n    return open(p).read()\n\n"
+                            "def b(x):\n    return x\n")
+    funcs = [ModuleTestableFunc(node, module_node) for node in module_node.body]
+    options = pytestgen.generator.GeneratorOptions(benchmark="also",
+                                                   slow_marker="slow")
+    result = pytestgen.generator.generate_test_funcs(funcs, "module",
+                                                     renderer, options)
+    assert result.count("@pytest.mark.slow\n") == 2
+    assert "@pytest.mark.slow\n@pytest.mark.parametrize(\n    \"p,expected\"" \
+        in result
+    assert "@pytest.mark.slow\n@pytest.mark.parametrize(\n    \"p\"" in result
+
+
+def test_generator_options_negative_import_time_threshold():
+    with pytest.raises(ValueError):
+        pytestgen.generator.GeneratorOptions(import_time_threshold=-1)
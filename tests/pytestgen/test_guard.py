@@ -0,0 +1,120 @@
+from os import path
+
+from pyfakefs.pytest_plugin import fs
+import pytest
+
+from pytestgen import load
+from pytestgen import observe
+from pytestgen.guard import InputGuards
+from pytestgen.parse import PyTestGenParseReport
+import pytestgen.guard
+
+PROTOBUF_HEADER = """# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: a.proto
+"""
+
+MYPY_PROTOBUF_HEADER = '''"""
+@generated by mypy-protobuf.  Do not edit manually!
+isort:skip_file
+"""
+'''
+
+
+@pytest.mark.parametrize(
+    "source,expected",
+    [(PROTOBUF_HEADER, True), (MYPY_PROTOBUF_HEADER, True),
+     ("# Generated by Django 3.2 on 2021-01-01 12:00\n", True),
+     ("def a():\n    pass\n", False),
+     ('"""Helpers for code generated by other tools."""\n', False),
+     ("# Helpers for tokens generated by the auth server.\n", False),
+     ("# Autogenerated IDs are checked here.\n", False),
+     ("# Autogenerated file, do not edit.\n", False),
+     ("# Do not edit the config below without asking ops\n", False),
+     ("# Generated helpers for the views below.\n", False),
+     ("# @generated\n", True),
+     ("# Generated by the gRPC Python protocol compiler plugin. DO NOT "
+      "EDIT!\n", True),
+     ("#\n# Autogenerated by Thrift Compiler (0.13.0)\n", True),
+     ("# Code generated by mytool. DO NOT EDIT.\n", True),
+     ("\n" * 10 + "# Generated by the protocol buffer compiler.\n", False)])
+def test_is_generated(source, expected):
+    assert pytestgen.guard.is_generated(source.encode("utf-8")) == expected
+
+
+@pytest.mark.parametrize("max_file_size,max_defs", [(0, None), (None, 0),
+                                                    (-1, None)])
+def test_inputguards_invalid(max_file_size, max_defs):
+    with pytest.raises(ValueError):
+        InputGuards(max_file_size=max_file_size, max_defs=max_defs)
+
+
+@pytest.mark.parametrize(
+    "guards,source,expected",
+    [(InputGuards(), PROTOBUF_HEADER, None),
+     (InputGuards(max_file_size=10), "def a():\n    pass\n", "too_large"),
+     (InputGuards(max_file_size=100), "def a():\n    pass\n", None),
+     (InputGuards(max_defs=2), "def a():\n    pass\n" * 3, "too_many_defs"),
+     (InputGuards(max_defs=2),
+      "def a():\n    pass\nclass B:\n    async def b(self):\n        pass\n",
+      None),
+     (InputGuards(skip_generated=True), PROTOBUF_HEADER, "generated")])
+def test_inputguards_check(guards, source, expected, fs):
+    fs.create_file("a.py", contents=source)
+    assert guards.check(load.PyTestGenInputFile("a.py", "")) == expected
+
+
+def test_inputguards_check_stub(fs):
+    # the stub is what would be parsed, so it's what is checked
+    fs.create_file("a.py", contents="def a():\n    pass\n" * 100)
+    fs.create_file("a.pyi", contents="def a() -> None: ...\n")
+    input_set = load.use_stubs(load.filename("a.py", "output"))
+    guards = InputGuards(max_file_size=100, max_defs=10)
+    assert guards.check(input_set.input_files[0]) is None
+
+
+def test_skip_guarded_files(fs):
+    fs.create_file("dir/a.py", contents="def a():\n    pass\n")
+    fs.create_file("dir/b_pb2.py", contents=PROTOBUF_HEADER)
+    fs.create_file("dir/c.py", contents="A = 1\n" * 100)
+    input_set = load.directory("dir", "output")
+    report = PyTestGenParseReport()
+    skipped = []
+
+    class SkipObserver(observe.Observer):
+        def on_file_skipped(self, input_file, reason):
+            skipped.append((input_file.name, reason))
+
+    observer = SkipObserver()
+    observe.register(observer)
+    try:
+        pytestgen.guard.skip_guarded_files(
+            input_set, InputGuards(max_file_size=200, skip_generated=True),
+            report)
+    finally:
+        observe.unregister(observer)
+
+    assert [input_file.name for input_file in input_set.input_files] == \
+        ["a.py"]
+    assert sorted(skipped) == [("b_pb2.py", "generated"),
+                               ("c.py", "too_large")]
+    assert report.skipped == {"generated": 1, "too_large": 1}
+    assert report.summary() == [
+        "Skipped 2 file(s) without parsing them (1 generated, 1 too_large)"
+    ]
+
+
+def test_skip_guarded_files_unreadable(fs):
+    fs.create_file("dir/a.py", contents="def a():\n    pass\n")
+    fs.create_symlink("dir/b.py", "dir/missing.py")
+    input_set = load.directory("dir", "output")
+    report = PyTestGenParseReport()
+
+    pytestgen.guard.skip_guarded_files(input_set,
+                                       InputGuards(max_file_size=200), report)
+
+    assert [input_file.name for input_file in input_set.input_files] == \
+        ["a.py"]
+    assert list(report.failures) == [path.join("dir", "b.py")]
+    assert report.failures[path.join("dir", "b.py")].startswith(
+        "FileNotFoundError")
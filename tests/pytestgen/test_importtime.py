@@ -0,0 +1,41 @@
+import pytest
+
+import pytestgen.importtime
+
+
+def test_measure_import_time(tmp_path):
+    (tmp_path / "slow_module.py").write_text(
+        "import time\nprint('imported')\ntime.sleep(0.2)\n")
+    result = pytestgen.importtime.measure_import_time("slow_module",
+                                                      str(tmp_path))
+    assert result >= 0.2
+
+
+def test_measure_import_time_timeout(tmp_path):
+    (tmp_path / "very_slow_module.py").write_text(
+        "import time\ntime.sleep(10)\n")
+    result = pytestgen.importtime.measure_import_time("very_slow_module",
+                                                      str(tmp_path),
+                                                      timeout=0.5)
+    assert result == 0.5
+
+
+def test_measure_import_time_error(tmp_path):
+    (tmp_path / "broken_module.py").write_text("raise ImportError()\n")
+    result = pytestgen.importtime.measure_import_time("broken_module",
+                                                      str(tmp_path))
+    assert result is None
+
+
+def test_import_times(monkeypatch):
+    measured = []
+
+    def measure_import_time(module_name, cwd, timeout):
+        measured.append(module_name)
+        return 1.0
+
+    monkeypatch.setattr(pytestgen.importtime, "measure_import_time",
+                        measure_import_time)
+    import_times = pytestgen.importtime.ImportTimes()
+    assert [import_times.get(m) for m in ["a", "b", "a"]] == [1.0, 1.0, 1.0]
+    assert measured == ["a", "b"]
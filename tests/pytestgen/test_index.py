@@ -0,0 +1,151 @@
+import ast
+
+from pyfakefs.pytest_plugin import fs
+import pytest
+
+from pytestgen.index import ModuleSymbols, SymbolIndex
+
+
+def get_init_args(init_function_def: ast.FunctionDef):
+    return [arg.arg for arg in init_function_def.args.args]
+
+
+@pytest.mark.parametrize(
+    "module_name,source,is_package,expected",
+    [("pkg.mod", "from .base import Base", False, "pkg.base.Base"),
+     ("pkg.mod", "from . import base", False, "pkg.base"),
+     ("pkg.sub.mod", "from ..base import Base", False, "pkg.base.Base"),
+     ("pkg.__init__", "from .base import Base", True, "pkg.base.Base"),
+     ("pkg", "from .base import Base", True, "pkg.base.Base"),
+     ("mod", "from pkg.base import Base as B", False, "pkg.base.Base")])
+def test_modulesymbols_imported_names(module_name, source, is_package,
+                                      expected):
+    module = ModuleSymbols(module_name, ast.parse(source), is_package)
+    assert list(module.imported_names.values()) == [expected]
+
+
+def test_modulesymbols_for_module():
+    module = ModuleSymbols.from_module(
+        "vendor_a.lib.mod",
+        ast.parse("import os\nfrom .base import Base\n\n"
+                  "class A(Base):\n    pass\n"))
+    copy = module.for_module("vendor_b.lib.mod")
+    assert copy.module_name == "vendor_b.lib.mod"
+    assert copy.imported_names == {"Base": "vendor_b.lib.base.Base"}
+    assert copy.imported_modules == {"os": "os"}
+    assert copy.classes == module.classes
+
+
+def test_symbolindex_get_init_own_init():
+    index = SymbolIndex()
+    index.add_module(
+        "mod", ast.parse("class A:\n    def __init__(self, x):\n        pass\n"))
+    assert get_init_args(index.get_init("mod", "A")) == ["self", "x"]
+
+
+def test_symbolindex_get_init_same_module():
+    index = SymbolIndex()
+    index.add_module(
+        "mod",
+        ast.parse("class A:\n    def __init__(self, x):\n        pass\n"
+                  "class B(A):\n    pass\n"
+                  "class C(B):\n    pass\n"))
+    assert get_init_args(index.get_init("mod", "C")) == ["self", "x"]
+
+
+def test_symbolindex_get_init_first_base_wins():
+    index = SymbolIndex()
+    index.add_module(
+        "mod",
+        ast.parse("class A:\n    pass\n"
+                  "class B:\n    def __init__(self, b):\n        pass\n"
+                  "class C:\n    def __init__(self, c):\n        pass\n"
+                  "class D(A, B, C):\n    pass\n"))
+    assert get_init_args(index.get_init("mod", "D")) == ["self", "b"]
+
+
+def test_symbolindex_get_init_across_modules(fs):
+    fs.create_file("pkg/__init__.py", contents="from .base import Base\n")
+    fs.create_file("pkg/base.py",
+                   contents="class Base:\n"
+                   "    def __init__(self, a):\n"
+                   "        pass\n")
+    fs.create_file("pkg/other.py",
+                   contents="import pkg.base\n\n"
+                   "class Other(pkg.base.Base):\n"
+                   "    pass\n")
+    index = SymbolIndex()
+    index.add_module(
+        "mod",
+        ast.parse("import pkg\nfrom pkg import other\n"
+                  "from pkg import Base as Renamed\n"
+                  "class A(pkg.Base):\n    pass\n"
+                  "class B(other.Other):\n    pass\n"
+                  "class C(Renamed):\n    pass\n"))
+    for class_name in ["A", "B", "C"]:
+        assert get_init_args(index.get_init("mod", class_name)) == \
+            ["self", "a"]
+
+
+def test_symbolindex_get_init_is_cached(fs, monkeypatch):
+    fs.create_file("base.py",
+                   contents="class Base:\n"
+                   "    def __init__(self):\n"
+                   "        pass\n")
+    index = SymbolIndex()
+    index.add_module("mod",
+                     ast.parse("from base import Base\n"
+                               "class A(Base):\n    pass\n"))
+    init_function_def = index.get_init("mod", "A")
+    monkeypatch.setattr(index, "_resolve_init", None)
+    assert index.get_init("mod", "A") is init_function_def
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        # base classes outside the project
+        "import collections\nclass A(collections.OrderedDict):\n    pass\n",
+        "from typing import Generic\nclass A(Generic[int]):\n    pass\n",
+        "class A(object):\n    pass\n",
+        # inheritance cycles
+        "class A(B):\n    pass\nclass B(A):\n    pass\n",
+        # modules that import each other
+        "from mod import A\n"
+    ])
+def test_symbolindex_get_init_unresolved(source, fs):
+    index = SymbolIndex()
+    index.add_module("mod", ast.parse(source))
+    assert index.get_init("mod", "A") is None
+
+
+def test_symbolindex_get_init_module_added_later(fs):
+    index = SymbolIndex()
+    index.add_module("pkg.a",
+                     ast.parse("from .z import B\nclass A(B):\n    pass\n"))
+    assert index.get_init("pkg.a", "A") is None
+
+    # the base class' module isn't on disk, but was parsed after all
+    index.add_module(
+        "pkg.z",
+        ast.parse("class B:\n    def __init__(self, b):\n        pass\n"))
+    assert get_init_args(index.get_init("pkg.a", "A")) == ["self", "b"]
+
+
+def test_symbolindex_get_init_src_layout(fs):
+    fs.create_file("src/pkg/__init__.py")
+    fs.create_file("src/pkg/base.py",
+                   contents="class Base:\n"
+                   "    def __init__(self, a):\n"
+                   "        pass\n")
+    index = SymbolIndex()
+    index.add_module(
+        "src.pkg.b",
+        ast.parse("class B:\n    def __init__(self, b):\n        pass\n"))
+    index.add_module(
+        "src.pkg.mod",
+        ast.parse("from pkg.base import Base\nfrom pkg.b import B\n"
+                  "class A(Base):\n    pass\n"
+                  "class C(B):\n    pass\n"))
+    assert get_init_args(index.get_init("src.pkg.mod", "A")) == ["self", "a"]
+    assert get_init_args(index.get_init("src.pkg.mod", "C")) == ["self", "b"]
@@ -1,4 +1,9 @@
 from contextlib import nullcontext as does_not_raise
+import io
+import pickle
+import tarfile
+import zipfile
+from os import path
 from os.path import sep
 
 import pytest
@@ -75,6 +80,24 @@ def test_pytestgeninputfile_get_test_file_path(instance, output_dir, expected):
     assert result == expected
 
 
+def test_pytestgeninputfile_get_test_file_path_shard():
+    instance = PyTestGenInputFile("a.py", "dir")
+    result = instance.get_test_file_path("output", "myclass")
+    assert result == f"output{sep}dir{sep}test_a__myclass.py"
+
+
+def test_pytestgeninputfile_get_test_file_shard_pattern():
+    instance = PyTestGenInputFile("a.py", "dir")
+    result = instance.get_test_file_shard_pattern("output")
+    assert result == f"output{sep}dir{sep}test_a__*.py"
+
+
+def test_pytestgeninputfile_get_test_file_shard():
+    instance = PyTestGenInputFile("a.py", "dir")
+    result = instance.get_test_file_shard(f"output{sep}dir{sep}test_a__1.py")
+    assert result == "1"
+
+
 def test_pytestgeninputfile_has_test_file(fs):
     fs.create_file("output/dir/test_b.py")
     instance = PyTestGenInputFile("b.py", "dir")
@@ -83,4 +106,183 @@ def test_pytestgeninputfile_has_test_file(fs):
 
 def test_pytestgeninputfile_not_has_test_file(fs):
     instance = PyTestGenInputFile("b.py", "dir")
-    assert instance.has_test_file("output") == False
\ No newline at end of file
+    assert instance.has_test_file("output") == False
+
+def test_from_path_directory(fs):
+    fs.create_file("dir/a.py")
+    result = load.from_path("dir", "output")
+    assert result == PyTestGenInputSet("output",
+                                       [PyTestGenInputFile("a.py", "dir")])
+
+
+def test_from_path_file(fs):
+    fs.create_file("dir/a.py")
+    result = load.from_path(f"dir{sep}a.py", "output")
+    assert result == PyTestGenInputSet("output",
+                                       [PyTestGenInputFile("a.py", "dir")])
+
+
+def test_from_paths(fs):
+    for f in ["a.py", "b.py", "c.py", "dir/d.py"]:
+        fs.create_file(f)
+    result = load.from_paths(["a.py", "b.py", "c.py", "dir", "a.py"],
+                             "output",
+                             batch_size=2)
+    # consecutive files are batched, directories are loaded on their own
+    assert [[f.name for f in input_set.input_files]
+            for input_set in result] == [["a.py", "b.py"], ["c.py"],
+                                         ["d.py"], ["a.py"]]
+
+
+def test_from_paths_invalid(fs):
+    fs.create_file("a.txt")
+    with pytest.raises(ValueError):
+        list(load.from_paths(["a.txt"], "output"))
+    with pytest.raises(ValueError):
+        list(load.from_paths([], "output", batch_size=0))
+
+
+@pytest.mark.parametrize("path_list", [("a.py\nb.py\n\nc d.py\n"),
+                                       ("a.py\r\nb.py\r\nc d.py"),
+                                       ("a.py\0b.py\0c d.py\0")])
+def test_expand_paths_stdin(path_list):
+    result = list(load.expand_paths(["x.py", "-"], io.StringIO(path_list)))
+    assert result == ["x.py", "a.py", "b.py", "c d.py"]
+
+
+def test_expand_paths_argfile(fs):
+    fs.create_file("paths.txt", contents="a.py\nb.py\n")
+    result = list(load.expand_paths(["@paths.txt", "c.py"]))
+    assert result == ["a.py", "b.py", "c.py"]
+
+
+def test_read_path_list_across_chunks(monkeypatch):
+    monkeypatch.setattr(load, "PATH_LIST_CHUNK_SIZE", 3)
+    result = list(load._read_path_list(io.StringIO("abc.py\0de.py\0f.py")))
+    assert result == ["abc.py", "de.py", "f.py"]
+
+
+def make_zip(file_path, member_names):
+    with zipfile.ZipFile(file_path, "w") as archive:
+        for member_name in member_names:
+            archive.writestr(member_name, "def func():\n    pass\n")
+
+
+def make_tar(file_path, member_names):
+    with tarfile.open(file_path, "w:gz") as archive:
+        for member_name in member_names:
+            data = b"def func():\n    pass\n"
+            member = tarfile.TarInfo(member_name)
+            member.size = len(data)
+            archive.addfile(member, io.BytesIO(data))
+
+
+@pytest.mark.parametrize(
+    "archive_name,make_archive,member_names,expected_modules",
+    [("pkg-1.0-py3-none-any.whl", make_zip, [
+        "pkg/__init__.py", "pkg/mod.py", "pkg-1.0.dist-info/METADATA",
+        "pkg-1.0.data/purelib/extra.py", "pkg-1.0.data/scripts/script.py"
+    ], ["pkg.__init__", "pkg.mod", "extra"]),
+     ("pkg-1.0.tar.gz", make_tar,
+      ["pkg-1.0/setup.py", "pkg-1.0/src/pkg/__init__.py", "pkg-1.0/src/pkg/mod.py"
+       ], ["setup", "pkg.__init__", "pkg.mod"]),
+     ("pkg-1.0.tar.gz", make_tar, [
+         "pkg-1.0/setup.py", "pkg-1.0/pkg/__init__.py", "pkg-1.0/pkg/mod.py",
+         "pkg-1.0/tests/test_a.py", "pkg-1.0/docs/conf.py"
+     ], ["setup", "pkg.__init__", "pkg.mod"]),
+     ("pkg.zip", make_zip, ["pkg/__init__.py", "pkg/sub/mod.py"],
+      ["pkg.__init__", "pkg.sub.mod"])])
+def test_archive(tmp_path, archive_name, make_archive, member_names,
+                 expected_modules):
+    archive_path = str(tmp_path / archive_name)
+    make_archive(archive_path, member_names)
+
+    result = load.archive(archive_path, "output")
+    assert [f.get_module() for f in result.input_files] == expected_modules
+    for input_file in result.input_files:
+        assert input_file.archive_path == archive_path
+        assert input_file.read_source() == b"def func():\n    pass\n"
+        assert input_file.get_source_size() == len(input_file.read_source())
+
+
+def test_archive_wrong_filetype():
+    with pytest.raises(ValueError):
+        load.archive("not_an_archive.txt", "output")
+
+
+def test_archive_test_file_path(tmp_path):
+    archive_path = str(tmp_path / "pkg-1.0.tar.gz")
+    make_tar(archive_path, ["pkg-1.0/pkg/__init__.py", "pkg-1.0/pkg/mod.py"])
+    result = load.archive(archive_path, "output")
+    assert result.input_files[1].get_test_file_path("output") == \
+        f"output{sep}pkg{sep}test_mod.py"
+
+
+@pytest.mark.parametrize("archive_name,make_archive,module",
+                         [("pkg-1.0-py3-none-any.whl", make_zip, zipfile),
+                          ("pkg-1.0.tar.gz", make_tar, tarfile)])
+def test_archive_reader(tmp_path, monkeypatch, archive_name, make_archive,
+                        module):
+    archive_path = str(tmp_path / archive_name)
+    make_archive(archive_path, ["pkg/__init__.py", "pkg/a.py", "pkg/b.py"])
+    opened = []
+    open_archive = module.ZipFile if module is zipfile else module.open
+
+    def counting_open(*args, **kwargs):
+        opened.append(args[0])
+        return open_archive(*args, **kwargs)
+
+    monkeypatch.setattr(module,
+                        "ZipFile" if module is zipfile else "open",
+                        counting_open)
+    input_files = load.archive(archive_path, "output").input_files
+    opened.clear()
+
+    # reading every file in order only opens the archive once
+    for input_file in input_files + input_files[-1:]:
+        assert input_file.read_source() == b"def func():\n    pass\n"
+    assert len(opened) == 1
+
+    # going back only has to start a tar stream again
+    input_files[0].read_source()
+    assert len(opened) == (1 if module is zipfile else 2)
+
+
+def test_archive_reader_pickle(tmp_path):
+    archive_path = str(tmp_path / "pkg-1.0.tar.gz")
+    make_tar(archive_path, ["pkg/__init__.py", "pkg/a.py"])
+    input_files = load.archive(archive_path, "output").input_files
+
+    # a worker process keeps reading from the same reader
+    a, b = [pickle.loads(pickle.dumps(f)) for f in input_files]
+    assert a.reader is b.reader
+    assert b.read_source() == b"def func():\n    pass\n"
+
+
+def test_use_stubs(fs):
+    for f in ["dir/a.py", "dir/a.pyi", "dir/b.py", "stubs/dir/b.pyi"]:
+        fs.create_file(f)
+
+    input_set = load.directory("dir", "output")
+    stub_paths = {
+        f.name: f.stub_path
+        for f in load.use_stubs(input_set).input_files
+    }
+    assert stub_paths == {"a.py": f"dir{sep}a.pyi", "b.py": None}
+
+    input_set = load.directory("dir", "output")
+    stub_paths = {
+        f.name: f.stub_path
+        for f in load.use_stubs(input_set, "stubs").input_files
+    }
+    assert stub_paths == {"a.py": None, "b.py": f"stubs{sep}dir{sep}b.pyi"}
+
+
+def test_pytestgeninputfile_read_signature_source(fs):
+    fs.create_file("dir/a.py", contents="def a():\n    return 1\n")
+    fs.create_file("dir/a.pyi", contents="def a(): ...\n")
+    instance = PyTestGenInputFile("a.py", "dir")
+    assert instance.read_signature_source() == b"def a():\n    return 1\n"
+
+    instance.stub_path = path.join("dir", "a.pyi")
+    assert instance.read_signature_source() == b"def a(): ...\n"
@@ -0,0 +1,108 @@
+import io
+
+from pyfakefs.pytest_plugin import fs
+import pytest
+
+from pytestgen.sink import MemorySink
+import pytestgen.load
+import pytestgen.observe
+import pytestgen.output
+import pytestgen.parse
+from pytestgen.observe import (Histogram, MetricsObserver, ProgressObserver,
+                               PrometheusTextfileExporter)
+
+
+@pytest.fixture
+def metrics():
+    observer = MetricsObserver()
+    pytestgen.observe.register(observer)
+    yield observer
+    pytestgen.observe.unregister(observer)
+
+
+def test_histogram():
+    histogram = Histogram([0.1, 1.0])
+    for value in [0.05, 0.1, 0.5, 2.0]:
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.cumulative_counts() == [2, 3, 4]
+    assert histogram.sum == pytest.approx(2.65)
+    assert histogram.count == 4
+
+
+def test_metrics_observer(fs, metrics):
+    fs.create_file("a_dir/a.py", contents="def a_function(x):\n    pass\n")
+    fs.create_file("a_dir/b.py", contents="A_CONSTANT = 1\n")
+
+    input_set = pytestgen.load.from_path("a_dir", "output")
+    parsed_set = pytestgen.parse.parse_input_set(input_set)
+    pytestgen.output.output_tests(parsed_set, sink=MemorySink())
+
+    assert metrics.counters == {
+        pytestgen.observe.FILE_DISCOVERED: 2,
+        pytestgen.observe.FILE_PARSED: 2,
+        pytestgen.observe.FILE_SKIPPED: 1,
+        pytestgen.observe.TEST_EMITTED: 1,
+        pytestgen.observe.FILE_WRITTEN: 1
+    }
+    assert metrics.skipped == {"no_testable_funcs": 1}
+    assert metrics.parse_durations.count == 2
+    assert metrics.write_durations.count == 1
+
+
+def test_unregister():
+    observer = MetricsObserver()
+    pytestgen.observe.register(observer)
+    pytestgen.observe.unregister(observer)
+    assert pytestgen.observe.OBSERVERS == []
+
+    pytestgen.observe.notify(pytestgen.observe.FILE_DISCOVERED, None)
+    assert observer.counters[pytestgen.observe.FILE_DISCOVERED] == 0
+
+
+def test_prometheus_textfile_exporter(tmp_path):
+    metrics_path = tmp_path / "metrics" / "pytestgen.prom"
+    exporter = PrometheusTextfileExporter(str(metrics_path), [0.1])
+    exporter.on_file_parsed(None, 0.05)
+    exporter.on_file_skipped(None, "no_testable_funcs")
+    exporter.on_test_emitted("test_a", "module")
+    exporter.close()
+
+    assert metrics_path.read_text() == """# TYPE pytestgen_files_discovered_total counter
+pytestgen_files_discovered_total 0
+# TYPE pytestgen_files_parsed_total counter
+pytestgen_files_parsed_total 1
+# TYPE pytestgen_files_skipped_total counter
+pytestgen_files_skipped_total{reason="no_testable_funcs"} 1
+# TYPE pytestgen_tests_emitted_total counter
+pytestgen_tests_emitted_total 1
+# TYPE pytestgen_files_written_total counter
+pytestgen_files_written_total 0
+# TYPE pytestgen_parse_duration_seconds histogram
+pytestgen_parse_duration_seconds_bucket{le="0.1"} 1
+pytestgen_parse_duration_seconds_bucket{le="+Inf"} 1
+pytestgen_parse_duration_seconds_sum 0.05
+pytestgen_parse_duration_seconds_count 1
+# TYPE pytestgen_write_duration_seconds histogram
+pytestgen_write_duration_seconds_bucket{le="0.1"} 0
+pytestgen_write_duration_seconds_bucket{le="+Inf"} 0
+pytestgen_write_duration_seconds_sum 0.0
+pytestgen_write_duration_seconds_count 0
+"""
+    # the file should have been written atomically
+    assert [path.name for path in metrics_path.parent.iterdir()
+            ] == ["pytestgen.prom"]
+
+
+def test_progress_observer():
+    stream = io.StringIO()
+    progress = ProgressObserver(stream, interval=60)
+    progress.on_file_parsed(None, 0.01)
+    progress.on_test_emitted("test_a", "module")
+    progress.on_file_parsed(None, 0.01)
+    progress.close()
+
+    lines = stream.getvalue().split("\r")
+    assert lines[1].startswith("1 files, 0 tests (")
+    assert lines[2].startswith("2 files, 1 tests (")
+    assert lines[2].endswith(" files/s)\n")
@@ -1,3 +1,4 @@
+import ast
 from ast import FunctionDef
 from os import path
 
@@ -6,7 +7,11 @@ from pyfakefs.pytest_plugin import fs
 import pytest
 
 from pytestgen.load import PyTestGenInputFile
-from pytestgen.parse import PyTestGenParsedSet, PyTestGenParsedFile, get_existing_test_functions
+from pytestgen.parse import PyTestGenParsedSet, PyTestGenParsedFile, get_defined_functions, get_existing_test_functions, get_test_functions
+from pytestgen.sink import MemorySink
+from pytestgen.generator import GeneratorOptions
+import pytestgen.generator
+import pytestgen.importtime
 import pytestgen.output
 
 from fixtures import mock_module_testable_func, mock_class_testable_func
@@ -92,12 +97,281 @@ def test_output_parsed_file_exists(fs, mock_parsed_file, monkeypatch):
     ]
 
 
-def test_ensure_dir_non_exist(fs):
-    pytestgen.output._ensure_dir(path.join("test_dir", "test_name.py"))
-    assert path.exists("test_dir") == True
+def test_output_tests_memory_sink(mock_parsed_set, monkeypatch):
+    sink = MemorySink()
+    pytestgen.output.output_tests(mock_parsed_set, sink=sink)
+    test_file_path = path.join("output", "a_dir", "test_a_file.py")
+    assert list(sink.files.keys()) == [test_file_path]
+
+    # we need to patch FunctionDef back in, see above
+    monkeypatch.setattr(pytestgen.parse.ast, "FunctionDef", FunctionDef)
+
+    outputted_funcs = get_test_functions(sink.files[test_file_path])
+    assert outputted_funcs == [
+        "test_a_test_function", "test_testclass_a_class_test_function"
+    ]
+
+
+def test_output_to_existing_memory_sink(mock_parsed_file, monkeypatch):
+    test_file_path = path.join("output", "a_dir", "test_a_file.py")
+    existing = "def test_a_test_function():\n    pass\n"
+    sink = MemorySink({test_file_path: existing})
+
+    # get_test_functions() needs the real FunctionDef, see above
+    monkeypatch.setattr(pytestgen.parse.ast, "FunctionDef", FunctionDef)
+    pytestgen.output._output_parsed_file(mock_parsed_file, "output", sink=sink)
+
+    assert sink.files[test_file_path].startswith(existing)
+    outputted_funcs = get_test_functions(sink.files[test_file_path])
+    assert outputted_funcs == [
+        "test_a_test_function", "test_testclass_a_class_test_function"
+    ]
+
+
+def test_output_tests_class_layout(mock_parsed_set, monkeypatch):
+    sink = MemorySink()
+    options = GeneratorOptions(layout="class")
+    pytestgen.output.output_tests(mock_parsed_set, sink=sink, options=options)
+    test_file_path = path.join("output", "a_dir", "test_a_file.py")
+    class_file_path = path.join("output", "a_dir", "test_a_file__testclass.py")
+    assert sorted(sink.files.keys()) == [test_file_path, class_file_path]
+
+    # we need to patch FunctionDef back in, see above
+    monkeypatch.setattr(pytestgen.parse.ast, "FunctionDef", FunctionDef)
+
+    assert get_test_functions(
+        sink.files[test_file_path]) == ["test_a_test_function"]
+    assert get_test_functions(sink.files[class_file_path]) == [
+        "test_testclass_a_class_test_function"
+    ]
+
+
+def test_output_tests_chunk_layout(mock_parsed_set, monkeypatch):
+    sink = MemorySink()
+    options = GeneratorOptions(layout="chunk", shard_size=1)
+    pytestgen.output.output_tests(mock_parsed_set, sink=sink, options=options)
+    test_file_path = path.join("output", "a_dir", "test_a_file.py")
+    chunk_file_path = path.join("output", "a_dir", "test_a_file__1.py")
+    assert sorted(sink.files.keys()) == [test_file_path, chunk_file_path]
+
+    # we need to patch FunctionDef back in, see above
+    monkeypatch.setattr(pytestgen.parse.ast, "FunctionDef", FunctionDef)
+
+    assert get_test_functions(
+        sink.files[test_file_path]) == ["test_a_test_function"]
+    assert get_test_functions(sink.files[chunk_file_path]) == [
+        "test_testclass_a_class_test_function"
+    ]
+
+
+def test_output_tests_chunk_layout_existing(mock_parsed_file, monkeypatch):
+    test_file_path = path.join("output", "a_dir", "test_a_file.py")
+    chunk_file_path = path.join("output", "a_dir", "test_a_file__1.py")
+    existing = "def test_a_test_function():\n    pass\n"
+    sink = MemorySink({chunk_file_path: existing, test_file_path: ""})
+    options = GeneratorOptions(layout="chunk", shard_size=2)
+
+    # get_test_functions() needs the real FunctionDef, see above
+    monkeypatch.setattr(pytestgen.parse.ast, "FunctionDef", FunctionDef)
+    pytestgen.output._output_parsed_file(mock_parsed_file,
+                                         "output",
+                                         sink=sink,
+                                         options=options)
+
+    # the existing test isn't duplicated, and the last chunk is filled up
+    assert sink.files[test_file_path] == ""
+    assert get_test_functions(sink.files[chunk_file_path]) == [
+        "test_a_test_function", "test_testclass_a_class_test_function"
+    ]
+
+
+def test_output_tests_benchmark_existing(mock_parsed_file, monkeypatch):
+    test_file_path = path.join("output", "a_dir", "test_a_file.py")
+    existing = "def test_a_test_function():\n    pass\n"
+    sink = MemorySink({test_file_path: existing})
+    options = GeneratorOptions(benchmark="also")
+
+    # get_test_functions() needs the real FunctionDef, see above
+    monkeypatch.setattr(pytestgen.parse.ast, "FunctionDef", FunctionDef)
+    pytestgen.output._output_parsed_file(mock_parsed_file,
+                                         "output",
+                                         sink=sink,
+                                         options=options)
+
+    # the benchmark is added next to the existing test without duplicating it
+    assert get_test_functions(sink.files[test_file_path]) == [
+        "test_a_test_function", "test__benchmark_a_test_function",
+        "test_testclass_a_class_test_function",
+        "test__benchmark_testclass_a_class_test_function"
+    ]
+
+
+@pytest.mark.parametrize("import_time,deferred", [(1.0, True), (0.1, False),
+                                                  (None, False)])
+def test_output_tests_deferred_import(mock_parsed_set, monkeypatch,
+                                      import_time, deferred):
+    monkeypatch.setattr(pytestgen.importtime, "measure_import_time",
+                        lambda module_name, cwd, timeout: import_time)
+    sink = MemorySink()
+    options = GeneratorOptions(import_time_threshold=0.5)
+    pytestgen.output.output_tests(mock_parsed_set, sink=sink, options=options)
+    test_file = sink.files[path.join("output", "a_dir", "test_a_file.py")]
+
+    assert ("import pytest\n\nimport a_dir.a_file\n" in test_file) != deferred
+    assert ("    import a_dir.a_file\n" in test_file) == deferred
+
+
+def test_output_targets(mock_parsed_set, monkeypatch):
+    sink = MemorySink()
+    targets = [
+        pytestgen.output.OutputTarget("output"),
+        pytestgen.output.OutputTarget("contracts",
+                                      include=["a_test_function"],
+                                      options=GeneratorOptions(
+                                          benchmark="only"))
+    ]
+    pytestgen.output.output_targets(mock_parsed_set, targets, sink=sink)
+
+    # we need to patch FunctionDef back in, see above
+    monkeypatch.setattr(pytestgen.parse.ast, "FunctionDef", FunctionDef)
+
+    assert get_test_functions(
+        sink.files[path.join("output", "a_dir", "test_a_file.py")]) == [
+            "test_a_test_function", "test_testclass_a_class_test_function"
+        ]
+    assert get_test_functions(
+        sink.files[path.join("contracts", "a_dir", "test_a_file.py")]) == [
+            "test__benchmark_a_test_function"
+        ]
+
+
+def test_output_targets_error(mock_parsed_set):
+    # errors from any target should be raised
+    class BrokenRenderer(pytestgen.generator.FastRenderer):
+        def render_test_funcs(self, funcs):
+            raise RuntimeError("broken")
+
+    targets = [
+        pytestgen.output.OutputTarget("output"),
+        pytestgen.output.OutputTarget("broken", renderer=BrokenRenderer())
+    ]
+    with pytest.raises(RuntimeError):
+        pytestgen.output.output_targets(mock_parsed_set,
+                                        targets,
+                                        sink=MemorySink())
+
+
+def test_find_missing_tests(mock_parsed_file, monkeypatch):
+    # we need to patch FunctionDef back in, see above
+    monkeypatch.setattr(pytestgen.parse.ast, "FunctionDef", FunctionDef)
+
+    sink = MemorySink()
+    sink.write(path.join("output", "a_dir", "test_a_file.py"),
+               "def test_a_test_function():\n    pass\n")
+    assert pytestgen.output.find_missing_tests(
+        mock_parsed_file, "output",
+        sink=sink) == ["test_testclass_a_class_test_function"]
+    assert pytestgen.output.find_missing_tests(
+        mock_parsed_file,
+        "output",
+        sink=sink,
+        options=GeneratorOptions(benchmark="also")) == [
+            "test__benchmark_a_test_function",
+            "test_testclass_a_class_test_function",
+            "test__benchmark_testclass_a_class_test_function"
+        ]
+    assert len(sink.files) == 1
+
+
+def test_find_missing_tests_other_module(mock_parsed_file, monkeypatch):
+    monkeypatch.setattr(pytestgen.parse.ast, "FunctionDef", FunctionDef)
+
+    sink = MemorySink()
+    sink.write(path.join("output", "a_dir", "test_a_file__testclass.py"),
+               "def test_testclass_a_class_test_function():\n    pass\n")
+    # the test file of module 'a_file__other.py', not a shard of 'a_file.py'
+    sink.write(path.join("output", "a_dir", "test_a_file__other.py"),
+               "def test_a_test_function():\n    pass\n")
+    assert pytestgen.output.find_missing_tests(
+        mock_parsed_file, "output", sink=sink) == ["test_a_test_function"]
+
+    sink.write(path.join("output", "a_dir", "test_a_file__1.py"),
+               "def test_a_test_function():\n    pass\n")
+    assert pytestgen.output.find_missing_tests(mock_parsed_file,
+                                               "output",
+                                               sink=sink) == []
+
+
+def test_check_targets(mock_parsed_set, monkeypatch):
+    # we need to patch FunctionDef back in, see above
+    monkeypatch.setattr(pytestgen.parse.ast, "FunctionDef", FunctionDef)
+
+    targets = [
+        pytestgen.output.OutputTarget("output"),
+        pytestgen.output.OutputTarget("contracts",
+                                      include=["a_test_function"])
+    ]
+    missing_tests = pytestgen.output.check_targets(mock_parsed_set,
+                                                   targets,
+                                                   sink=MemorySink())
+    assert [(missing.test_file_path, missing.test_names)
+            for missing in missing_tests] == [
+                (path.join("output", "a_dir", "test_a_file.py"), [
+                    "test_a_test_function",
+                    "test_testclass_a_class_test_function"
+                ]),
+                (path.join("contracts", "a_dir", "test_a_file.py"),
+                 ["test_a_test_function"])
+            ]
+
+    missing_tests = pytestgen.output.check_targets(mock_parsed_set,
+                                                   targets,
+                                                   sink=MemorySink(),
+                                                   fail_fast=True)
+    assert len(missing_tests) == 1
+
+
+def test_output_tests_concurrent_write(mock_parsed_set, monkeypatch):
+    # we need to patch FunctionDef back in, see above
+    monkeypatch.setattr(pytestgen.parse.ast, "FunctionDef", FunctionDef)
+
+    test_file_path = path.join("output", "a_dir", "test_a_file.py")
+
+    class RacingSink(MemorySink):
+        """Another run writes the test file just before it's locked."""
+        def lock(self, file_path):
+            self.write(file_path,
+                       "import pytest\n\ndef test_a_test_function():\n"
+                       "    pass\n")
+            return super().lock(file_path)
+
+    sink = RacingSink()
+    pytestgen.output.output_tests(mock_parsed_set, sink=sink)
+
+    # the file is appended to instead of replaced, without duplicating tests
+    assert get_test_functions(sink.files[test_file_path]) == [
+        "test_a_test_function", "test_testclass_a_class_test_function"
+    ]
+
+
+@pytest.mark.parametrize("existing", [(None), ("import os\n")])
+def test_output_tests_async(existing):
+    source = "async def a(x):\n    return x\n"
+    parsed_file = PyTestGenParsedFile(
+        pytestgen.parse._get_module_testable_funcs(ast.parse(source)),
+        PyTestGenInputFile("a_file.py", "a_dir"))
+    parsed_set = PyTestGenParsedSet([parsed_file],
+                                    munchify({"output_dir": "output"}))
+    conftest_path = path.join("output", "conftest.py")
+    sink = MemorySink({} if existing is None else {conftest_path: existing})
 
+    pytestgen.output.output_tests(parsed_set, sink=sink)
+    conftest = sink.files[conftest_path]
+    assert conftest.startswith(existing or "import asyncio\nimport pytest")
+    assert get_defined_functions(conftest) == ["session_event_loop"]
+    assert "def test_a(session_event_loop, x, expected):" in sink.files[
+        path.join("output", "a_dir", "test_a_file.py")]
 
-def test_ensure_dir_exist(fs):
-    fs.create_dir("test_dir")
-    pytestgen.output._ensure_dir(path.join("test_dir", "test_name.py"))
-    assert path.exists("test_dir") == True
\ No newline at end of file
+    # the fixture is only output once for the whole session
+    pytestgen.output.output_tests(parsed_set, sink=sink)
+    assert sink.files[conftest_path] == conftest
@@ -1,8 +1,16 @@
+import ast
+import os
+from os import path
+import time
 from typing import List
+import zipfile
 
 from munch import munchify, Munch
+from pyfakefs.pytest_plugin import fs
 import pytest
 
+from pytestgen import load
+from pytestgen.index import SymbolIndex
 import pytestgen.parse
 from pytestgen.parse import PyTestGenParsedSet, PyTestGenParsedFile
 
@@ -59,6 +67,27 @@ def test_moduletestablefunc_get_test_name(function_name, expected):
     assert result == expected
 
 
+def test_testablefunc_get_benchmark_name():
+    fake_class_def = munchify({"name": "TestClass", "body": []})
+    fake_function_def = munchify({"name": "__a_function__"})
+    module_func = pytestgen.parse.ModuleTestableFunc(fake_function_def, None)
+    class_func = pytestgen.parse.ClassTestableFunc(fake_function_def,
+                                                   fake_class_def)
+    assert module_func.get_benchmark_name() == "test__benchmark_a_function"
+    assert class_func.get_benchmark_name() == \
+        "test__benchmark_testclass_a_function"
+
+
+def test_testablefunc_get_benchmark_name_collision():
+    benchmarked = munchify({"name": "a_function"})
+    tested = munchify({"name": "benchmark_a_function"})
+    benchmark_name = pytestgen.parse.ModuleTestableFunc(
+        benchmarked, None).get_benchmark_name()
+    test_name = pytestgen.parse.ModuleTestableFunc(tested,
+                                                   None).get_test_name()
+    assert benchmark_name != test_name
+
+
 @pytest.mark.parametrize("has_init,expected", [(True, "__init__"),
                                                (False, None)])
 def test_classtestablefunc_find_init_function(has_init, expected, monkeypatch):
@@ -91,4 +120,314 @@ def test_classtestablefunc_get_test_name(class_name, function_name, expected):
     cls_instance = pytestgen.parse.ClassTestableFunc(fake_function_def,
                                                      fake_class_def)
     result = cls_instance.get_test_name()
-    assert result == expected
\ No newline at end of file
+    assert result == expected
+
+def test_parse_input_set_stubs(fs):
+    source = "def a(x: int) -> int:\n    return x * 2\n"
+    stub = "def a(x: int) -> int: ...\n"
+    fs.create_file("dir/a.py", contents=source)
+    fs.create_file("dir/a.pyi", contents=stub)
+    input_set = load.use_stubs(load.directory("dir", "output"))
+
+    parsed_set = pytestgen.parse.parse_input_set(input_set)
+    result, missing = has_functions(parsed_set.parsed_files[0], ["a"])
+    assert result == True, f"Missing function(s) in parsed set: {missing}"
+    assert parsed_set.report.files_parsed == 1
+    assert parsed_set.report.stub_files == 1
+    assert parsed_set.report.bytes_parsed == len(stub)
+    assert parsed_set.report.stub_bytes_saved == len(source) - len(stub)
+
+
+def test_parse_input_set_stub_overloads(fs):
+    fs.create_file("dir/a.py", contents="def f(x):\n    return x\n")
+    fs.create_file("dir/a.pyi",
+                   contents="from typing import overload\n"
+                   "import typing\n"
+                   "@overload\n"
+                   "def f(x: int) -> int: ...\n"
+                   "@overload\n"
+                   "def f(x: str) -> str: ...\n"
+                   "class A:\n"
+                   "    @typing.overload\n"
+                   "    def m(self, x: int) -> int: ...\n"
+                   "    @typing.overload\n"
+                   "    def m(self, x: str) -> str: ...\n"
+                   "    def m(self, x): ...\n")
+    input_set = load.use_stubs(load.directory("dir", "output"))
+
+    parsed_set = pytestgen.parse.parse_input_set(input_set)
+    testable_funcs = parsed_set.parsed_files[0].testable_funcs
+    assert [func.get_test_name() for func in testable_funcs] == \
+        ["test_f", "test_a_m"]
+    # the implementation is used if there is one
+    assert testable_funcs[1].function_def.decorator_list == []
+
+
+def test_parse_input_set_inherited_init(fs):
+    fs.create_file("pkg/__init__.py", contents="")
+    fs.create_file("pkg/base.py",
+                   contents="class Base:\n"
+                   "    def __init__(self, a, b):\n"
+                   "        pass\n")
+    fs.create_file("pkg/child.py",
+                   contents="from .base import Base\n\n"
+                   "class Child(Base):\n"
+                   "    def method(self):\n"
+                   "        pass\n")
+    input_set = load.filename("pkg/child.py", "output")
+
+    parsed_set = pytestgen.parse.parse_input_set(input_set)
+    assert parsed_set.parsed_files[0].testable_funcs[
+        0].init_function_def is None
+
+    parsed_set = pytestgen.parse.parse_input_set(input_set,
+                                                 SymbolIndex("."))
+    init_function_def = parsed_set.parsed_files[0].testable_funcs[
+        0].init_function_def
+    assert [arg.arg for arg in init_function_def.args.args] == \
+        ["self", "a", "b"]
+
+
+@pytest.mark.parametrize("jobs", [(1), (2)])
+def test_parse_input_set_base_parsed_later(jobs, tmp_path, caplog):
+    archive_path = str(tmp_path / "pkg.zip")
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("pkg/__init__.py", "")
+        archive.writestr(
+            "pkg/a.py", "from .z import B\n\nclass A(B):\n"
+            "    def method(self):\n        pass\n")
+        archive.writestr("pkg/z.py",
+                         "class B:\n    def __init__(self, b):\n"
+                         "        pass\n")
+    input_set = load.archive(archive_path, "output")
+
+    parsed_set = pytestgen.parse.parse_input_set(input_set,
+                                                 SymbolIndex(str(tmp_path)),
+                                                 jobs=jobs)
+    testable_func = [
+        testable_func for parsed_file in parsed_set.parsed_files
+        for testable_func in parsed_file.testable_funcs
+        if testable_func.get_test_name() == "test_a_method"
+    ][0]
+    assert [arg.arg for arg in testable_func.init_function_def.args.args] \
+        == ["self", "b"]
+    assert "Could not find __init__()" not in caplog.text
+
+
+def test_parse_input_set_async(fs):
+    fs.create_file("dir/a.py",
+                   contents="async def a(x):\n    return x\n\n"
+                   "def b(x):\n    return x\n\n"
+                   "class C:\n"
+                   "    async def c(self):\n        pass\n")
+    input_set = load.filename("dir/a.py", "output")
+
+    parsed_set = pytestgen.parse.parse_input_set(input_set)
+    testable_funcs = parsed_set.parsed_files[0].testable_funcs
+    assert [(tf.get_test_name(), tf.is_async()) for tf in testable_funcs] == [
+        ("test_a", True), ("test_b", False), ("test_c_c", True)
+    ]
+
+
+VENDORED_BASE = "class Base:\n    def __init__(self, {}):\n        pass\n"
+VENDORED_CHILD = "from .base import Base\n\nclass Child(Base):\n" \
+    "    def method(self):\n        pass\n"
+
+
+def make_vendored_copies(root):
+    """Make byte-identical copies of a module in two packages, whose base
+    classes differ."""
+    for package, arg in [("vendor_a", "a"), ("vendor_b", "b")]:
+        os.makedirs(path.join(root, package))
+        for name, source in [("__init__.py", ""),
+                             ("base.py", VENDORED_BASE.format(arg)),
+                             ("child.py", VENDORED_CHILD)]:
+            with open(path.join(root, package, name), "w") as f:
+                f.write(source)
+    return load.PyTestGenInputSet("output", [
+        load.PyTestGenInputFile("child.py", package)
+        for package in ["vendor_a", "vendor_b"]
+    ])
+
+
+@pytest.mark.parametrize("jobs", [(1), (2)])
+def test_parse_input_set_reuses_same_source(jobs, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    input_set = make_vendored_copies(".")
+
+    parsed_set = pytestgen.parse.parse_input_set(input_set,
+                                                 SymbolIndex("."),
+                                                 jobs=jobs)
+    report = parsed_set.report
+    assert report.files_parsed == 1
+    assert report.files_reused == 1
+    assert report.bytes_reused == len(VENDORED_CHILD)
+    assert report.summary() == [
+        f"Reused the parse of 1 file(s) with the same source as another "
+        f"file, saving parsing {len(VENDORED_CHILD)} bytes"
+    ]
+
+    # only the module differs, so each copy's base class is its own
+    a, b = [
+        parsed_file.testable_funcs[0]
+        for parsed_file in parsed_set.parsed_files
+    ]
+    assert parsed_set.parsed_files[1].input_file.get_module() == \
+        "vendor_b.child"
+    assert a.function_def is b.function_def
+    assert [arg.arg for arg in a.init_function_def.args.args] == ["self", "a"]
+    assert [arg.arg for arg in b.init_function_def.args.args] == ["self", "b"]
+
+
+def test_parse_input_set_shared_parsed_sources(fs):
+    fs.create_file("a/mod.py", contents="def f(x):\n    return x\n")
+    fs.create_file("b/mod.py", contents="def f(x):\n    return x\n")
+    parsed_sources = {}
+
+    reports = [
+        pytestgen.parse.parse_input_set(load.directory(dir_path, "output"),
+                                        parsed_sources=parsed_sources).report
+        for dir_path in ["a", "b"]
+    ]
+    assert [(report.files_parsed, report.files_reused)
+            for report in reports] == [(1, 0), (0, 1)]
+
+
+def test_get_reusable_testable_funcs():
+    syntax_tree = ast.parse("import os\nA = [1, 2, 3]\n"
+                            "def f(x):\n    return x\n"
+                            "class B:\n    def g(self):\n        pass\n")
+    testable_funcs = pytestgen.parse._get_ast_testable_funcs(syntax_tree)
+    reusable = pytestgen.parse._get_reusable_testable_funcs(testable_funcs)
+
+    # only the functions and classes of the module are kept
+    assert [type(node) for node in reusable[0].module.body] == \
+        [ast.FunctionDef, ast.ClassDef]
+    assert reusable[0].function_def is testable_funcs[0].function_def
+    assert testable_funcs[0].module is syntax_tree
+
+
+def test_iter_parsed_files_reuses_failures(fs):
+    fs.create_file("a/broken.py", contents="def f(:\n")
+    fs.create_file("b/broken.py", contents="def f(:\n")
+    report = pytestgen.parse.PyTestGenParseReport()
+
+    parsed_files = list(
+        pytestgen.parse.iter_parsed_files(load.directory(".", "output"),
+                                          report))
+    assert parsed_files == []
+    assert report.files_parsed == 0
+    assert sorted(report.failures.keys()) == [
+        path.join(".", "a", "broken.py"),
+        path.join(".", "b", "broken.py")
+    ]
+
+
+def test_iter_parsed_files(fs):
+    fs.create_file("dir/a.py", contents="def a():\n    pass\n")
+    fs.create_file("dir/b.py", contents="A = 1\n")
+    fs.create_file("dir/c.py", contents="def c(:\n")
+    input_set = load.directory("dir", "output")
+    input_set.input_files.sort(key=lambda input_file: input_file.name)
+    report = pytestgen.parse.PyTestGenParseReport()
+
+    # files are only parsed as they're needed, so stopping early never reaches
+    # the file with a syntax error
+    parsed_files = pytestgen.parse.iter_parsed_files(input_set, report)
+    assert next(parsed_files).input_file.name == "a.py"
+    assert report.files_parsed == 1
+    assert report.failures == {}
+
+    # a file that can't be parsed is recorded instead of ending the run
+    with pytest.raises(StopIteration):
+        next(parsed_files)
+    assert report.files_parsed == 2
+    assert list(report.failures.keys()) == [path.join("dir", "c.py")]
+    assert report.failures[path.join("dir", "c.py")].startswith(
+        "SyntaxError: ")
+
+
+def parse_slowly_or_crash(src_file, with_symbols):
+    """Parses files in a worker, except 'slow.py' hangs and 'crash.py' crashes
+    the worker process."""
+    if src_file.name == "slow.py":
+        time.sleep(60)
+    elif src_file.name == "crash.py":
+        os._exit(1)
+    return pytestgen.parse._parse_in_worker(src_file, with_symbols)
+
+
+@pytest.fixture
+def worker_input_set(tmp_path):
+    def _worker_input_set(file_names):
+        for file_name in file_names:
+            # each file has its own source, so none of them are reused
+            contents = "def f(:\n" if file_name == "error.py" \
+                else f"def {file_name[:-3]}():\n    pass\n"
+            (tmp_path / file_name).write_text(contents)
+        return load.PyTestGenInputSet("output", [
+            load.PyTestGenInputFile(file_name, str(tmp_path))
+            for file_name in file_names
+        ])
+
+    return _worker_input_set
+
+
+@pytest.mark.parametrize("jobs", [(1), (3)])
+def test_iter_parsed_files_in_workers(jobs, worker_input_set):
+    input_set = worker_input_set(
+        ["a.py", "slow.py", "b.py", "crash.py", "error.py", "c.py"])
+    report = pytestgen.parse.PyTestGenParseReport()
+
+    start = time.monotonic()
+    parsed_files = list(
+        pytestgen.parse._iter_parsed_files_in_workers(
+            input_set.input_files,
+            report,
+            None,
+            jobs,
+            timeout=1.0,
+            worker=parse_slowly_or_crash))
+    assert time.monotonic() - start < 30
+
+    # every other file is still parsed, in order
+    assert [parsed_file.input_file.name for parsed_file in parsed_files] == \
+        ["a.py", "b.py", "c.py"]
+    assert report.files_parsed == 3
+    assert {
+        path.basename(file_path): message.split(":")[0]
+        for file_path, message in report.failures.items()
+    } == {
+        "slow.py": "ParseTimeoutError",
+        "crash.py": "WorkerCrashedError",
+        "error.py": "SyntaxError"
+    }
+
+
+def test_parse_input_set_in_workers(tmp_path, monkeypatch):
+    (tmp_path / "base.py").write_text(
+        "class Base:\n    def __init__(self, a):\n        pass\n")
+    (tmp_path / "child.py").write_text(
+        "from base import Base\n\nclass Child(Base):\n"
+        "    def method(self):\n        pass\n")
+    monkeypatch.chdir(tmp_path)
+    input_set = load.directory(".", "output")
+    input_set.input_files = [
+        input_file for input_file in input_set.input_files
+        if input_file.name == "child.py"
+    ]
+
+    parsed_set = pytestgen.parse.parse_input_set(input_set,
+                                                 SymbolIndex("."),
+                                                 jobs=2)
+    init_function_def = parsed_set.parsed_files[0].testable_funcs[
+        0].init_function_def
+    assert [arg.arg for arg in init_function_def.args.args] == ["self", "a"]
+
+
+@pytest.mark.parametrize("jobs,timeout", [(0, None), (1, 0)])
+def test_parse_input_set_invalid(jobs, timeout):
+    with pytest.raises(ValueError):
+        pytestgen.parse.parse_input_set(load.PyTestGenInputSet("output", []),
+                                        jobs=jobs,
+                                        timeout=timeout)
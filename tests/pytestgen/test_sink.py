@@ -0,0 +1,111 @@
+import io
+from os import path
+import tarfile
+import threading
+import time
+import zipfile
+
+from pyfakefs.pytest_plugin import fs
+import pytest
+
+import pytestgen.sink
+from pytestgen.sink import ArchiveSink, FileSystemSink, MemorySink
+
+
+def test_filesystem_sink(fs):
+    sink = FileSystemSink()
+    file_path = path.join("output", "dir", "test_a.py")
+    assert sink.exists(file_path) == False
+
+    sink.write(file_path, "import a\n")
+    sink.append(file_path, "import b\n")
+    assert sink.exists(file_path) == True
+    assert sink.read(file_path) == "import a\nimport b\n"
+
+
+def test_filesystem_sink_lock(tmp_path):
+    sink = FileSystemSink()
+    file_path = str(tmp_path / "output" / "test_a.py")
+    sink.write(file_path, "")
+
+    def append_slowly():
+        with sink.lock(file_path):
+            content = sink.read(file_path)
+            time.sleep(0.01)
+            sink.write(file_path, content + "x")
+
+    threads = [threading.Thread(target=append_slowly) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # no write was lost, and the lock file was removed
+    assert sink.read(file_path) == "x" * 8
+    assert sorted(p.name for p in (tmp_path / "output").iterdir()) == \
+        ["test_a.py"]
+
+
+def test_memory_sink():
+    sink = MemorySink()
+    assert sink.exists("test_a.py") == False
+
+    sink.write("test_a.py", "import a\n")
+    sink.append("test_a.py", "import b\n")
+    assert sink.exists("test_a.py") == True
+    assert sink.read("test_a.py") == "import a\nimport b\n"
+    assert sink.files == {"test_a.py": "import a\nimport b\n"}
+
+
+def test_archive_sink_tar():
+    stream = io.BytesIO()
+    with ArchiveSink(stream, "tar") as sink:
+        sink.write(path.join("output", "test_a.py"), "import a\n")
+        assert sink.exists(path.join("output", "test_a.py")) == False
+
+    stream.seek(0)
+    with tarfile.open(fileobj=stream, mode="r") as archive:
+        assert archive.getnames() == ["output/test_a.py"]
+        assert archive.extractfile("output/test_a.py").read() == b"import a\n"
+
+
+def test_archive_sink_zip():
+    stream = io.BytesIO()
+    with ArchiveSink(stream, "zip") as sink:
+        sink.write(path.join("output", "test_a.py"), "import a\n")
+
+    with zipfile.ZipFile(stream) as archive:
+        assert archive.namelist() == ["output/test_a.py"]
+        assert archive.read("output/test_a.py") == b"import a\n"
+
+
+def test_archive_sink_unknown_format():
+    with pytest.raises(ValueError):
+        ArchiveSink(io.BytesIO(), "rar")
+
+
+def test_ensure_dir_non_exist(fs):
+    pytestgen.sink._ensure_dir(path.join("test_dir", "test_name.py"))
+    assert path.exists("test_dir") == True
+
+
+def test_ensure_dir_exist(fs):
+    fs.create_dir("test_dir")
+    pytestgen.sink._ensure_dir(path.join("test_dir", "test_name.py"))
+    assert path.exists("test_dir") == True
+
+
+def test_filesystem_sink_glob(fs):
+    sink = FileSystemSink()
+    fs.create_file(path.join("output", "test_a__2.py"))
+    fs.create_file(path.join("output", "test_a__1.py"))
+    fs.create_file(path.join("output", "test_b.py"))
+    assert sink.glob(path.join("output", "test_a__*.py")) == [
+        path.join("output", "test_a__1.py"),
+        path.join("output", "test_a__2.py")
+    ]
+
+
+def test_memory_sink_glob():
+    sink = MemorySink({"test_a__2.py": "", "test_a__1.py": "", "test_b.py": ""})
+    assert sink.glob("test_a__*.py") == ["test_a__1.py", "test_a__2.py"]